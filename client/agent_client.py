@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Remote Agent Client
+# ==============================================================================
+# Pushes remote_agent.py to the server once (only when its checksum changed),
+# starts it on a single long-lived SSH channel and exchanges line-delimited
+# JSON requests with it. Callers fall back to plain shell commands whenever
+# the agent is unavailable.
+# ==============================================================================
+
+
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+
+LOCAL_AGENT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "remote_agent.py")
+REMOTE_AGENT_DIR = "/root/.hlsmanager"
+REMOTE_AGENT_PATH = f"{REMOTE_AGENT_DIR}/remote_agent.py"
+AGENT_TIMEOUT = 20
+AGENT_RETRY_INTERVAL = 300
+
+
+def push_if_changed(session, local_path, remote_path):
+    # Uploads a helper script only when the server copy is missing or differs.
+    with open(local_path, "rb") as f:
+        source = f.read()
+    digest = hashlib.sha256(source).hexdigest()
+    out, _ = session.execute(f"sha256sum {remote_path} 2>/dev/null")
+    if out.split()[:1] == [digest]:
+        return
+    session.execute(f"mkdir -p {os.path.dirname(remote_path)}")
+    with session.sftp() as sftp, sftp.file(remote_path, "wb") as f:
+        f.write(source)
+
+
+class AgentUnavailable(Exception):
+    pass
+
+
+class AgentError(Exception):
+    pass
+
+
+class AgentClient:
+    def __init__(self, session):
+        self.session = session
+        self.channel = None
+        self._reader = None
+        self._writer = None
+        self._ids = itertools.count(1)
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        # A server without python3 should not cost a failed start on every call.
+        if self._failed_at and time.monotonic() - self._failed_at < AGENT_RETRY_INTERVAL:
+            raise AgentUnavailable("Remote agent is not available; using shell commands.")
+        self._close_channel()
+        try:
+            push_if_changed(self.session, LOCAL_AGENT_PATH, REMOTE_AGENT_PATH)
+            channel = self.session.open_channel()
+            channel.settimeout(AGENT_TIMEOUT)
+            channel.exec_command(f"exec python3 -u {REMOTE_AGENT_PATH}")
+            self.channel = channel
+            self._reader = channel.makefile("rb")
+            self._writer = channel.makefile_stdin("wb")
+            self._request("ping")
+            self._failed_at = None
+        except Exception as e:
+            self._close_channel()
+            self._failed_at = time.monotonic()
+            raise AgentUnavailable(f"Remote agent failed to start: {e}")
+
+    def _close_channel(self):
+        if self.channel:
+            try:
+                self.channel.close()
+            except Exception:
+                pass
+        self.channel = self._reader = self._writer = None
+
+    def _request(self, op, **args):
+        request_id = next(self._ids)
+        self._writer.write((json.dumps({"id": request_id, "op": op, "args": args}) + "\n").encode())
+        self._writer.flush()
+        while True:
+            line = self._reader.readline()
+            if not line:
+                raise EOFError("Remote agent closed its channel.")
+            response = json.loads(line)
+            if response.get("id") == request_id:
+                break
+        if not response.get("ok"):
+            raise AgentError(response.get("error", "Unknown agent error"))
+        return response.get("result")
+
+    def is_running(self):
+        return bool(self.channel and not self.channel.closed)
+
+    def call(self, op, **args):
+        # One request at a time on the shared channel; a dead channel is restarted once.
+        with self._lock:
+            for attempt in range(2):
+                if not self.is_running():
+                    self._start()
+                try:
+                    return self._request(op, **args)
+                except AgentError:
+                    raise
+                except Exception as e:
+                    self._close_channel()
+                    if attempt:
+                        raise AgentUnavailable(f"Remote agent connection failed: {e}")
+
+    def close(self):
+        with self._lock:
+            self._close_channel()
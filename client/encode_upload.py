@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Encode-While-Uploading Engine
+# ==============================================================================
+# For sources far above the streaming bitrate (raw screen recordings and the
+# like): a local ffmpeg encodes the file to one rendition of the ABR ladder on
+# every local core and writes a fragmented MP4 to its stdout. The output is cut
+# into fixed-size pieces as it is produced, and several SFTP channels write the
+# pieces at their offsets, so encoding and transfer overlap instead of running
+# one after the other. A bounded piece queue holds ffmpeg back whenever the
+# uplink is the slower side.
+#
+# The output is hashed while it streams and checked against a SHA-256 computed
+# on the server. An encode cannot be resumed, so unlike ParallelUploader there
+# is no journal; instead finished encodes are remembered per source file and
+# profile, and uploading the same file again reuses the library copy.
+# ==============================================================================
+
+
+import hashlib
+import json
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+
+from media_probe import HLS_FRAGMENT_SECONDS
+from sftp_upload import UPLOAD_BLOCK_SIZE, UPLOAD_WORKERS, UploadError
+
+LOCAL_FFMPEG_PATH = "ffmpeg"
+ENCODE_PIECE_SIZE = 8 * 1024 * 1024
+ENCODE_QUEUE_PIECES = 8
+ENCODE_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".hlsmanager", "encodes.json")
+STDERR_TAIL_LINES = 20
+INPUT_DURATION = re.compile(r"^\s*Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def encode_command(source, rung, ffmpeg_path=LOCAL_FFMPEG_PATH):
+    # Same rate control and keyframe grid as the live ABR encoders, so the server can stream and
+    # package the result as-is. The fragmented MP4 starts with its moov, so no faststart is needed.
+    kbps = rung["video_kbps"]
+    return [ffmpeg_path, "-hide_banner", "-nostdin", "-nostats", "-progress", "pipe:2", "-i", source,
+            "-map", "0:v:0", "-map", "0:a:0?", "-vf", f"scale=-2:'min({rung['height']},ih)'",
+            "-c:v", "libx264", "-preset", "veryfast", "-threads", "0", "-pix_fmt", "yuv420p",
+            "-b:v", f"{kbps}k", "-maxrate", f"{kbps * 107 // 100}k", "-bufsize", f"{kbps * 3 // 2}k",
+            "-force_key_frames", f"expr:gte(t,n_forced*{HLS_FRAGMENT_SECONDS})", "-sc_threshold", "0",
+            "-c:a", "aac", "-b:a", f"{rung['audio_kbps']}k", "-ar", "48000",
+            "-movflags", "+frag_keyframe+empty_moov+default_base_moof", "-f", "mp4", "pipe:1"]
+
+
+# --- Encode cache ---
+def _source_key(source, rung):
+    stat = os.stat(source)
+    return f"{os.path.abspath(source)}|{stat.st_size}|{stat.st_mtime}|{rung['name']}"
+
+
+def cached_encode(source, rung):
+    # Library path of an earlier encode of this exact file and profile, if any.
+    try:
+        with open(ENCODE_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f).get(_source_key(source, rung))
+    except (OSError, ValueError):
+        return None
+
+
+def remember_encode(source, rung, library_path):
+    try:
+        with open(ENCODE_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache[_source_key(source, rung)] = library_path
+    os.makedirs(os.path.dirname(ENCODE_CACHE_PATH), exist_ok=True)
+    tmp_path = ENCODE_CACHE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, ENCODE_CACHE_PATH)
+
+
+class EncodingUploader:
+    # `callback(encoded_seconds, duration, encode_speed, bytes_uploaded, upload_rate)` reports both
+    # sides: how far and how fast (x real time) the encode is, and how much has reached the server
+    # at what rate (bytes/s). `duration` is None until ffmpeg has read the source header.
+    def __init__(self, session, local_path, remote_path, rung, callback=None, workers=UPLOAD_WORKERS,
+                 piece_size=ENCODE_PIECE_SIZE, ffmpeg_path=LOCAL_FFMPEG_PATH, is_cancelled=None):
+        self.session = session
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.rung = rung
+        self.callback = callback
+        self.workers = workers
+        self.piece_size = piece_size
+        self.ffmpeg_path = ffmpeg_path
+        self.is_cancelled = is_cancelled or (lambda: False)
+        self.duration = None
+        self.encoded_seconds = 0.0
+        self.encode_speed = 0.0
+        self.bytes_uploaded = 0
+        self.started = None
+        self.lock = threading.Lock()
+        self._stderr_tail = []
+
+    def _report(self, nbytes=0):
+        with self.lock:
+            self.bytes_uploaded += nbytes
+            uploaded = self.bytes_uploaded
+        if self.callback:
+            rate = uploaded / max(time.monotonic() - self.started, 1e-6)
+            self.callback(self.encoded_seconds, self.duration, self.encode_speed, uploaded, rate)
+
+    def _read_progress(self, stderr):
+        # ffmpeg's `-progress` blocks and its regular log share stderr; the log tail is kept for errors.
+        for raw in stderr:
+            line = raw.decode(errors="replace").rstrip()
+            key, _, value = line.partition("=")
+            if key == "out_time_us" and value.isdigit():
+                self.encoded_seconds = int(value) / 1e6
+            elif key == "speed" and value.endswith("x"):
+                try:
+                    self.encode_speed = float(value[:-1])
+                except ValueError:
+                    pass
+            elif key == "progress":
+                self._report()
+            else:
+                match = INPUT_DURATION.match(line)
+                if match and self.duration is None:
+                    hours, minutes, seconds = match.groups()
+                    self.duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                self._stderr_tail = (self._stderr_tail + [line])[-STDERR_TAIL_LINES:]
+
+    def _worker(self, pieces, errors):
+        # Pieces arrive in order but are written at their own offsets, so workers never wait on each other.
+        # Closing the pipelined file waits until every write has been acknowledged.
+        sftp, finished = None, False
+        try:
+            sftp = self.session.open_sftp()
+            with sftp.open(self.remote_path, "r+b") as remote_file:
+                remote_file.set_pipelined(True)
+                while not finished:
+                    piece = pieces.get()
+                    finished = piece is None
+                    if finished or errors: continue
+                    offset, data = piece
+                    remote_file.seek(offset)
+                    for start in range(0, len(data), UPLOAD_BLOCK_SIZE):
+                        remote_file.write(data[start:start + UPLOAD_BLOCK_SIZE])
+                    self._report(len(data))
+        except Exception as e:
+            errors.append(e)
+            # Keep draining up to this worker's end marker, so the reader never blocks on a full queue.
+            while not finished:
+                finished = pieces.get() is None
+        finally:
+            if sftp: sftp.close()
+
+    def _remote_sha256(self):
+        out, err = self.session.execute(f"sha256sum '{self.remote_path}'")
+        if not out:
+            raise UploadError(f"Could not checksum remote file: {err}")
+        return out.split()[0]
+
+    def upload(self):
+        # Returns the SHA-256 of the encoded file, which now sits at `remote_path`.
+        sftp = self.session.open_sftp()
+        try:
+            sftp.open(self.remote_path, "wb").close()
+        finally:
+            sftp.close()
+        try:
+            encoder = subprocess.Popen(encode_command(self.local_path, self.rung, self.ffmpeg_path),
+                                       stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            raise UploadError(f"Local ffmpeg could not be started ({e}). Install ffmpeg or upload the original.")
+        self.started = time.monotonic()
+        progress = threading.Thread(target=self._read_progress, args=(encoder.stderr,), daemon=True)
+        progress.start()
+        pieces, errors = queue.Queue(maxsize=ENCODE_QUEUE_PIECES), []
+        threads = [threading.Thread(target=self._worker, args=(pieces, errors), daemon=True)
+                   for _ in range(self.workers)]
+        for thread in threads: thread.start()
+        digest, offset = hashlib.sha256(), 0
+        try:
+            while not errors:
+                if self.is_cancelled():
+                    raise UploadError("Upload cancelled. The encode starts over next time.")
+                data = encoder.stdout.read(self.piece_size)
+                if not data:
+                    break
+                digest.update(data)
+                pieces.put((offset, data))
+                offset += len(data)
+            if errors:
+                encoder.kill()
+        except BaseException:
+            encoder.kill()
+            raise
+        finally:
+            for _ in threads: pieces.put(None)
+            for thread in threads: thread.join()
+            encoder.stdout.close()
+            encoder.wait()
+            progress.join()
+        if errors:
+            raise errors[0]
+        if encoder.returncode != 0 or not offset:
+            raise UploadError(f"Local encode failed (exit code {encoder.returncode}): "
+                              + " / ".join(self._stderr_tail[-3:]))
+        self._report()
+        if self._remote_sha256() != digest.hexdigest():
+            raise UploadError("Checksum mismatch after upload. Please upload the file again.")
+        return digest.hexdigest()
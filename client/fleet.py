@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Server Fleet
+# ==============================================================================
+# A saved inventory of streaming servers, and a fan-out that runs the same
+# engine operation on several of them at once, one Engine and SSH session per
+# server, reporting a result or an error per server.
+#
+# Every server has a role:
+#   standalone  ingests and serves its own streams (the default)
+#   origin      the one server that ingests; edges pull from it
+#   edge        a caching pull edge of the origin; it never gets uploads,
+#               schedules or streams, only viewers
+#
+# So publishing work (uploads, schedules, pages) goes to the origin when the
+# fleet has one, plus any standalone servers, and a source file crosses the
+# uplink once per ingesting server rather than once per box. Edges are set up
+# by applying the nginx profile with the origin's URL (see nginx_conf.py).
+#
+# Passwords come from HLSMANAGER_PASSWORD_<NAME> (name upper-cased, other
+# characters as '_'), then HLSMANAGER_PASSWORD; servers without either are
+# prompted for by the front end. Several local sshd instances on different
+# ports make a test fleet: every entry has its own port.
+# ==============================================================================
+
+
+import json
+import os
+import re
+
+from task_executor import TaskExecutor
+
+FLEET_PATH = os.path.join(os.path.expanduser("~"), ".hlsmanager", "fleet.json")
+FLEET_ROLES = ("standalone", "origin", "edge")
+PUBLISHING_ROLES = ("standalone", "origin")
+SERVER_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,32}$")
+
+
+class FleetError(Exception):
+    pass
+
+
+def load_inventory(path=FLEET_PATH):
+    # Returns the saved servers in inventory order; a missing file is an empty fleet.
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            servers = json.load(f).get("servers", [])
+    except OSError:
+        return []
+    except ValueError as e:
+        raise FleetError(f"{path} is not valid JSON: {e}")
+    return [dict({"port": 22, "user": "root", "role": "standalone", "url": ""}, **server) for server in servers]
+
+
+def save_inventory(servers, path=FLEET_PATH):
+    check_inventory(servers)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"servers": servers}, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def check_inventory(servers):
+    names = [server["name"] for server in servers]
+    for server in servers:
+        if not SERVER_NAME_PATTERN.match(server["name"]):
+            raise FleetError(f"Server names may only contain letters, digits, '.', '-' and '_': {server['name']!r}")
+        if server["role"] not in FLEET_ROLES:
+            raise FleetError(f"{server['name']}: role must be one of {', '.join(FLEET_ROLES)}")
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise FleetError(f"Duplicate server names: {', '.join(duplicates)}")
+    roles = [server["role"] for server in servers]
+    if roles.count("origin") > 1:
+        raise FleetError("A fleet has at most one origin.")
+    if "edge" in roles and "origin" not in roles:
+        raise FleetError("Edges need an origin to pull from; give one server the origin role.")
+
+
+def origin_url(server):
+    # Where edges pull from: the server's public URL if set (e.g. https://stream.example.com), else plain HTTP.
+    return server.get("url") or f"http://{server['host']}"
+
+
+def password_for(server):
+    name = re.sub(r"[^A-Z0-9]", "_", server["name"].upper())
+    return os.environ.get(f"HLSMANAGER_PASSWORD_{name}", os.environ.get("HLSMANAGER_PASSWORD"))
+
+
+class Fleet:
+    # `make_engine(server)` builds the Engine for one inventory entry, so front ends choose the callbacks.
+    def __init__(self, servers, make_engine):
+        check_inventory(servers)
+        self.servers = list(servers)
+        self.make_engine = make_engine
+        self.engines = {}
+        self.origin_url = None
+
+    @property
+    def origin(self):
+        return next((server for server in self.servers if server["role"] == "origin"), None)
+
+    def publishers(self):
+        # Servers that take uploads, schedules and pages; edges only ever serve what the origin has.
+        return [server for server in self.servers if server["role"] in PUBLISHING_ROLES]
+
+    def resolve_origin_url(self):
+        # Without a saved URL the origin itself is asked: a TLS origin only redirects on port 80, so
+        # edges must pull from https://<its domain>. Needs the origin to be connected.
+        origin = self.origin
+        if origin is None: return None
+        self.origin_url = origin_url(origin)
+        engine = self.engines.get(origin["name"])
+        if not origin.get("url") and engine:
+            self.origin_url = engine.edge_url() or self.origin_url
+        return self.origin_url
+
+    def edge_origin(self, server):
+        # The --origin value for this server's nginx profile: the origin's URL for edges, "" for the rest.
+        if server["role"] != "edge": return ""
+        return self.origin_url or origin_url(self.origin)
+
+    def run(self, func, servers=None, expected_errors=()):
+        # Calls `func(server, engine)` on every connected server (default: all) at the same time.
+        # Returns [(server, result, error)] in inventory order; one failing server never stops the others.
+        # Errors of the `expected_errors` types are only returned, others also print a traceback.
+        servers = [server for server in (servers or self.servers) if server["name"] in self.engines]
+        if not servers: return []
+        outcomes = {}
+
+        def call(server):
+            outcomes[server["name"]] = func(server, self.engines[server["name"]])
+
+        call.__name__ = getattr(func, "__name__", call.__name__)  # names the task in the metrics
+
+        executor = TaskExecutor(workers=len(servers), max_pending=len(servers), expected_errors=expected_errors)
+        tasks = [(server, executor.submit(call, server)) for server in servers]
+        for _, task in tasks: task.wait()
+        executor.shutdown()
+        return [(server, outcomes.get(server["name"]), task.error) for server, task in tasks]
+
+    def connect(self, passwords, servers=None):
+        # Connects to the given servers (default: all) concurrently; returns [(server, error)] for those that failed.
+        # Engines of other servers stay connected; a server that already had one gets a fresh engine.
+        from ssh_session import CONNECT_ERRORS
+        for server in servers or self.servers:
+            previous = self.engines.get(server["name"])
+            if previous: previous.close()
+            self.engines[server["name"]] = self.make_engine(server)
+
+        def connect_one(server, engine):
+            engine.connect(server["host"], server["port"], server["user"], passwords[server["name"]])
+
+        results = self.run(connect_one, servers, CONNECT_ERRORS)
+        failed = [(server, error) for server, _, error in results if error]
+        for server, _ in failed: del self.engines[server["name"]]
+        return failed
+
+    def close(self):
+        for engine in self.engines.values(): engine.close()
+        self.engines = {}
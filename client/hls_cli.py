@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Command Line Client
+# ==============================================================================
+# Scriptable front end to the headless engine (hls_core.py), for servers without
+# a display and for bulk work such as scheduling a whole semester of lectures:
+#
+#   python hls_cli.py --host 203.0.113.5 status
+#   python hls_cli.py --host 203.0.113.5 upload week01.mp4 [--encode 720p]
+#   python hls_cli.py --host 203.0.113.5 start week01.mp4 --channel physics [--abr] [--low-latency]
+#   python hls_cli.py --host 203.0.113.5 schedule week01.mp4 "2026-02-01 10:00" --channel physics
+#   python hls_cli.py --host 203.0.113.5 schedule news.mp4 "2026-02-01 20:00" --repeat daily --until "2026-03-01 00:00"
+#   python hls_cli.py --host 203.0.113.5 queue [--channel physics] [--from ...] [--to ...] [--offset 100]
+#   python hls_cli.py --host 203.0.113.5 cancel <job id> | stop <channel>
+#   python hls_cli.py --host 203.0.113.5 template idle offline.html
+#   python hls_cli.py --host 203.0.113.5 tune --viewers 5000 --latency standard --ram-mb 1024
+#   python hls_cli.py --host 203.0.113.5 batch semester.csv --jobs 4
+#
+# With --fleet a command runs on the saved servers (fleet.py) at the same time
+# and prints its output per server; --servers a,b picks servers by name instead:
+#
+#   python hls_cli.py fleet add origin 203.0.113.5 --role origin
+#   python hls_cli.py fleet add edge1 198.51.100.7 --role edge
+#   python hls_cli.py --fleet status
+#   python hls_cli.py --fleet tune --viewers 20000 --ram-mb 1024
+#   python hls_cli.py --fleet batch semester.csv
+#
+# Uploads, schedules, templates, queue listings and stops go to the servers
+# that ingest (the origin and standalone servers); status and tune go to every
+# server, and tune configures edges to pull from the origin. Cancel takes the
+# job ids of one server, so it needs --servers with a single name.
+#
+# A batch manifest is a CSV file (or a JSON list of objects) with one video per row:
+#
+#   file,start,channel,title,abr,low_latency,repeat
+#   lectures/week01.mp4,2026-02-01 10:00,physics,Week 1,,,
+#
+# Relative paths are resolved against the manifest. An empty `start` only uploads
+# and prepares the video; `repeat` is empty, daily or weekly. A row that overlaps
+# another job on its channel fails unless --force is given. Rows are validated before connecting.
+# Then every distinct file is uploaded and checked once, concurrently, and the rows are
+# scheduled. Times are in --timezone (Tehran by default). A failed row, upload or
+# connection is reported in one line and the rest carry on.
+# --metrics FILE writes the run's operation timings on exit (Prometheus text for
+# .prom, otherwise appended JSON lines), and --profile-slow SECONDS keeps a
+# cProfile dump of every operation that takes at least that long.
+# The password is read from HLSMANAGER_PASSWORD (per fleet server also
+# HLSMANAGER_PASSWORD_<NAME>) or prompted for. Only argparse and the engine's
+# constants are loaded at start-up; paramiko is imported when a command connects.
+# ==============================================================================
+
+
+import argparse
+import os
+import sys
+
+from hls_core import DEFAULT_CHANNEL, ENCODE_PROFILES, LOCAL_TIMEZONE, RECURRENCES
+
+BATCH_FIELDS = ("file", "start", "channel", "title", "abr", "low_latency", "repeat")
+ENCODE_HELP = "encode locally to this profile while uploading (for sources far above the streaming bitrate)"
+TRUE_VALUES = {"1", "true", "yes", "y", "x"}
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+DEFAULT_BATCH_JOBS = 2
+
+
+def parse_time(text):
+    from datetime import datetime
+    try:
+        return datetime.strptime(text.strip(), TIME_FORMAT)
+    except ValueError:
+        raise ValueError(f"'{text}' is not a time like 2026-02-01 10:00")
+
+
+def load_manifest(path):
+    # Returns validated rows: file (absolute), start (naive datetime or None), channel, title, abr, low_latency.
+    import csv
+    import json
+    from hls_core import CHANNEL_KEY_PATTERN
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        raw_rows = json.load(f) if path.lower().endswith(".json") else list(csv.DictReader(f))
+    base_dir = os.path.dirname(os.path.abspath(path))
+    rows, problems = [], []
+    for number, raw in enumerate(raw_rows, 1):
+        raw = {key.strip().lower(): str(value if value is not None else "").strip()
+               for key, value in raw.items() if key}
+        unknown = set(raw) - set(BATCH_FIELDS)
+        file_path = os.path.join(base_dir, os.path.expanduser(raw.get("file", "")))
+        row = {"line": number, "file": file_path, "channel": raw.get("channel") or DEFAULT_CHANNEL,
+               "title": raw.get("title") or os.path.basename(file_path), "start": None,
+               "abr": raw.get("abr", "").lower() in TRUE_VALUES,
+               "low_latency": raw.get("low_latency", "").lower() in TRUE_VALUES,
+               "repeat": raw.get("repeat", "").lower()}
+        if unknown:
+            problems.append(f"row {number}: unknown columns {', '.join(sorted(unknown))}")
+        if not raw.get("file") or not os.path.isfile(file_path):
+            problems.append(f"row {number}: file '{raw.get('file', '')}' not found")
+        if not CHANNEL_KEY_PATTERN.match(row["channel"]):
+            problems.append(f"row {number}: invalid channel '{row['channel']}'")
+        if row["repeat"] and row["repeat"] not in RECURRENCES:
+            problems.append(f"row {number}: repeat must be empty, {' or '.join(RECURRENCES)}")
+        if raw.get("start"):
+            try:
+                row["start"] = parse_time(raw["start"])
+            except ValueError as e:
+                problems.append(f"row {number}: {e}")
+        rows.append(row)
+    if problems:
+        raise SystemExit("The manifest has problems:\n  " + "\n  ".join(problems))
+    return rows
+
+
+def operation_errors():
+    # Failures reported in one line rather than with a traceback: engine refusals, failed uploads
+    # and refused, failed or lost connections (paramiko's errors, socket errors, missing files).
+    from hls_core import EngineError
+    from sftp_upload import UploadError
+    from ssh_session import CONNECT_ERRORS, ConnectionLost
+    return (EngineError, UploadError, ConnectionLost) + CONNECT_ERRORS
+
+
+def make_engine(args, label=""):
+    from hls_core import Engine
+
+    def notice(level, title, message):
+        print(f"{label}{level.upper()}: {title}: {message}", file=sys.stderr)
+
+    def status(text):
+        if args.verbose: print(f"{label}{text.strip()}", file=sys.stderr)
+
+    return Engine(on_status=status, on_notice=notice, local_timezone=args.timezone)
+
+
+def ask_password(user, host):
+    import getpass
+    return getpass.getpass(f"Password for {user}@{host}: ")
+
+
+def connect(args):
+    engine = make_engine(args)
+    password = os.environ.get("HLSMANAGER_PASSWORD")
+    if password is None:
+        password = ask_password(args.user, args.host)
+    engine.connect(args.host, args.port, args.user, password)
+    return engine
+
+
+def library_video(engine, path, encode=None):
+    # Uploads and prepares a local file, encoding it locally on the way when `encode` names a
+    # profile; a path already in the server library is used as-is.
+    from hls_core import REMOTE_LIBRARY_DIR, EngineError
+    from media_probe import PLAN_UNREADABLE
+    if path.startswith(f"{REMOTE_LIBRARY_DIR}/"):
+        return path
+    library_path = engine.upload_encoded(path, encode) if encode else engine.upload(path)
+    report = engine.prepare_video(library_path, os.path.basename(path))
+    if report and report["plan"] == PLAN_UNREADABLE:
+        raise EngineError(f"'{path}' cannot be streamed: {'; '.join(report['reasons'])}")
+    return library_path
+
+
+def cmd_status(engine, args):
+    live = engine.scan_live_channels()
+    if live is None: return 1
+    for key in sorted(engine.channels):
+        print(f"{key}\t{'LIVE' if key in live else 'idle'}", file=args.out)
+
+
+def cmd_upload(engine, args):
+    for path in args.files:
+        print(f"{path}\t{library_video(engine, path, args.encode)}", file=args.out)
+
+
+def cmd_start(engine, args):
+    video = library_video(engine, args.file, args.encode)
+    scheduled = args.command == "schedule"
+    local_dt = engine.local_time(parse_time(args.time)) if scheduled else None
+    until_dt = engine.local_time(parse_time(args.until)) if scheduled and args.until else None
+    engine.start_or_schedule(engine.get_channel(args.channel), video, args.title or os.path.basename(args.file),
+                             local_dt, args.abr, args.low_latency, scheduled and args.repeat or "", until_dt,
+                             scheduled and args.force)
+
+
+def cmd_queue(engine, args):
+    start_dt, end_dt = (engine.local_time(parse_time(value)) if value else None for value in (args.start, args.end))
+    snapshot = engine.fetch_queue_snapshot(args.offset, args.limit, args.channel, start_dt, end_dt)
+    if snapshot is None: return 1
+    jobs, total = snapshot
+    for job_id, server_dt, title, channel, repeat in jobs:
+        local_dt = server_dt.astimezone(engine.local_timezone)
+        print(f"{job_id}\t{local_dt:{TIME_FORMAT}}\t{channel}\t{repeat or '-'}\t{title}", file=args.out)
+    print(f"{args.label}{len(jobs)} of {total} jobs shown (from {args.offset + 1 if jobs else 0}).", file=sys.stderr)
+
+
+def cmd_cancel(engine, args):
+    for job_id in args.job_ids:
+        engine.cancel_job(job_id)
+
+
+def cmd_stop(engine, args):
+    engine.scan_live_channels()
+    engine.stop_stream(engine.get_channel(args.channel))
+
+
+def cmd_template(engine, args):
+    applied = engine.set_template(args.page, args.file)
+    if args.page == "idle":
+        print(f"Idle page applied to {', '.join(channel.key for channel in applied) or 'no idle channels'}.", file=args.out)
+
+
+def cmd_tune(engine, args):
+    applied, output = engine.apply_nginx_profile(args.viewers, args.latency, args.ram_mb, args.origin)
+    print(output, file=args.out)
+    return 0 if applied else 1
+
+
+def distinct_sources(paths):
+    # Maps every path to the one path its content is uploaded from. The same file under several
+    # names, or an identical copy, lands on the same library path, so uploading both at once would
+    # share a .part file and resume journal. Only files of equal size are hashed to find copies.
+    from sftp_upload import file_sha256
+    by_size = {}
+    for path in dict.fromkeys(os.path.realpath(path) for path in paths):
+        by_size.setdefault(os.path.getsize(path), []).append(path)
+    source = {}
+    for same_size in by_size.values():
+        by_digest = {}
+        for path in same_size:
+            source[path] = by_digest.setdefault(file_sha256(path), path) if len(same_size) > 1 else path
+    return {path: source[os.path.realpath(path)] for path in paths}
+
+
+def cmd_batch(engine, args):
+    # Uploads first, each distinct source once, then schedules the rows that use them.
+    from task_executor import TaskExecutor
+    rows = args.rows
+    sources = distinct_sources([row["file"] for row in rows])
+    executor = TaskExecutor(workers=args.jobs, max_pending=max(1, len(rows)), expected_errors=operation_errors())
+    videos = {}
+
+    def upload(path):
+        videos[path] = library_video(engine, path, args.encode)
+
+    uploads = {path: executor.submit(upload, path) for path in dict.fromkeys(sources.values())}
+    for task in uploads.values(): task.wait()
+
+    def process(row):
+        upload_error = uploads[sources[row["file"]]].error
+        if upload_error:
+            raise upload_error
+        if row["start"]:
+            engine.start_or_schedule(engine.get_channel(row["channel"]), videos[sources[row["file"]]], row["title"],
+                                     engine.local_time(row["start"]), row["abr"], row["low_latency"], row["repeat"],
+                                     force=args.force)
+        print(f"{args.label}row {row['line']}: {'scheduled' if row['start'] else 'uploaded'} '{row['title']}'",
+              file=sys.stderr)
+
+    tasks = [(row, executor.submit(process, row)) for row in rows]
+    for _, task in tasks: task.wait()
+    executor.shutdown()
+    failed = [(row, task.error) for row, task in tasks if task.error]
+    for row, error in failed:
+        print(f"{args.label}row {row['line']} ({row['file']}) failed: {error}", file=sys.stderr)
+    print(f"{len(rows) - len(failed)} of {len(rows)} rows done.", file=args.out)
+    return 1 if failed else 0
+
+
+def cmd_fleet(args):
+    # Inventory edits need no connection.
+    from fleet import load_inventory, save_inventory
+    servers = load_inventory()
+    if args.action == "add":
+        servers = [server for server in servers if server["name"] != args.name]
+        servers.append({"name": args.name, "host": args.host_address, "port": args.port, "user": args.user,
+                        "role": args.role, "url": args.url or ""})
+        save_inventory(servers)
+    elif args.action == "remove":
+        if not any(server["name"] == args.name for server in servers):
+            raise SystemExit(f"No server named '{args.name}' in the fleet.")
+        save_inventory([server for server in servers if server["name"] != args.name])
+    else:
+        for server in servers:
+            url = f"\t{server['url']}" if server["url"] else ""
+            print(f"{server['name']}\t{server['user']}@{server['host']}:{server['port']}\t{server['role']}{url}")
+        if not servers: print("The fleet is empty; add servers with 'fleet add'.", file=sys.stderr)
+
+
+def fleet_targets(fleet, args, parser):
+    if args.servers:
+        names = [name.strip() for name in args.servers.split(",") if name.strip()]
+        unknown = sorted(set(names) - {server["name"] for server in fleet.servers})
+        if unknown: parser.error(f"unknown servers: {', '.join(unknown)}")
+        targets = [server for server in fleet.servers if server["name"] in names]
+    else:
+        targets = fleet.servers if args.targets == "all" else fleet.publishers()
+    if args.targets == "one" and len(targets) != 1:
+        parser.error(f"{args.command} works on one server at a time; name it with --servers")
+    if not targets: parser.error("no servers to run on; add them with 'fleet add'")
+    return targets
+
+
+def run_fleet(args, parser):
+    # Runs the command on every target server at once; each server's output is printed as one block.
+    import io
+    from fleet import Fleet, FleetError, load_inventory, origin_url, password_for
+    try:
+        fleet = Fleet(load_inventory(), lambda server: make_engine(args, f"{server['name']}: "))
+    except FleetError as e:
+        raise SystemExit(str(e))
+    targets = fleet_targets(fleet, args, parser)
+    passwords = {server["name"]: password_for(server) or ask_password(server["user"], server["host"])
+                 for server in targets}
+    failures = fleet.connect(passwords, targets)
+    if args.command == "tune" and args.origin is None and any(server["role"] == "edge" for server in targets):
+        from hls_core import EngineError
+        try:
+            fleet.resolve_origin_url()
+        except EngineError as e:
+            print(f"Could not ask the origin for its URL ({e}); edges use {origin_url(fleet.origin)}.",
+                  file=sys.stderr)
+
+    def run_on(server, engine):
+        host_args = argparse.Namespace(**dict(vars(args), out=io.StringIO(), label=f"{server['name']}: "))
+        if args.command == "tune" and args.origin is None:
+            host_args.origin = fleet.edge_origin(server)
+        code = args.run(engine, host_args) or 0
+        return code, host_args.out.getvalue()
+
+    try:
+        results = fleet.run(run_on, targets, operation_errors())
+    finally:
+        fleet.close()
+    code = 1 if failures else 0
+    for server, error in failures:
+        print(f"== {server['name']} ({server['host']}:{server['port']}): connection failed: {error}")
+    for server, outcome, error in results:
+        status = f"failed: {error}" if error else ("ok" if outcome[0] == 0 else "failed")
+        print(f"== {server['name']} ({server['host']}:{server['port']}): {status}")
+        if outcome and outcome[1]: sys.stdout.write(outcome[1])
+        if error or outcome[0]: code = 1
+    return code
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Command line client for an HLSManager streaming server.")
+    parser.add_argument("--host", default=os.environ.get("HLSMANAGER_HOST"), help="server address")
+    parser.add_argument("--port", type=int, default=22)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--timezone", default=LOCAL_TIMEZONE, help="timezone of the times you enter and see")
+    parser.add_argument("--verbose", action="store_true", help="print progress messages")
+    parser.add_argument("--metrics", metavar="FILE", help="write operation timings here on exit (.prom or JSON lines)")
+    parser.add_argument("--profile-slow", type=float, metavar="SECONDS",
+                        help="save a cProfile dump of operations at least this slow (~/.hlsmanager/profiles)")
+    parser.add_argument("--fleet", action="store_true", help="run on the saved fleet of servers at the same time")
+    parser.add_argument("--servers", help="run on these fleet servers (comma-separated names)")
+    parser.set_defaults(targets="publishers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    status = commands.add_parser("status", help="list channels and whether they are live")
+    status.set_defaults(run=cmd_status, targets="all")
+    upload = commands.add_parser("upload", help="upload and prepare videos, print their library paths")
+    upload.add_argument("files", nargs="+")
+    upload.add_argument("--encode", choices=ENCODE_PROFILES, help=ENCODE_HELP)
+    upload.set_defaults(run=cmd_upload)
+    for name, help_text in (("start", "stream a video now"), ("schedule", "schedule a video")):
+        start = commands.add_parser(name, help=help_text)
+        start.add_argument("file", help="local file, or a path in the server library")
+        if name == "schedule":
+            start.add_argument("time", help="start time, e.g. '2026-02-01 10:00'")
+            start.add_argument("--repeat", choices=RECURRENCES, help="run again every day or week")
+            start.add_argument("--until", help="last time a repeating job may start")
+            start.add_argument("--force", action="store_true", help="schedule even if it overlaps other jobs")
+        start.add_argument("--channel", default=DEFAULT_CHANNEL)
+        start.add_argument("--title")
+        start.add_argument("--encode", choices=ENCODE_PROFILES, help=ENCODE_HELP)
+        start.add_argument("--abr", action="store_true", help="encode the adaptive bitrate ladder")
+        start.add_argument("--low-latency", action="store_true", help="use 1 s fragments")
+        start.set_defaults(run=cmd_start)
+    queue = commands.add_parser("queue", help="list scheduled jobs by start time, one page at a time")
+    queue.add_argument("--channel")
+    queue.add_argument("--from", dest="start", help="only jobs starting at or after this time")
+    queue.add_argument("--to", dest="end", help="only jobs starting before this time")
+    queue.add_argument("--limit", type=int, default=100)
+    queue.add_argument("--offset", type=int, default=0)
+    queue.set_defaults(run=cmd_queue)
+    cancel = commands.add_parser("cancel", help="cancel scheduled jobs")
+    cancel.add_argument("job_ids", nargs="+")
+    cancel.set_defaults(run=cmd_cancel, targets="one")
+    stop = commands.add_parser("stop", help="hard-stop the stream on a channel")
+    stop.add_argument("channel")
+    stop.set_defaults(run=cmd_stop)
+    template = commands.add_parser("template", help="set a custom player or idle page")
+    template.add_argument("page", choices=("player", "idle"))
+    template.add_argument("file")
+    template.set_defaults(run=cmd_template)
+    tune = commands.add_parser("tune", help="apply an nginx audience profile")
+    tune.add_argument("--viewers", type=int, required=True)
+    tune.add_argument("--latency", choices=("standard", "low"), default="standard")
+    tune.add_argument("--ram-mb", type=int, required=True)
+    tune.add_argument("--origin", metavar="URL", help="make the server a pull edge of this origin ('' = standalone; "
+                                                      "with --fleet taken from the server roles)")
+    tune.set_defaults(run=cmd_tune, targets="all")
+    batch = commands.add_parser("batch", help="upload and schedule every row of a CSV/JSON manifest")
+    batch.add_argument("manifest")
+    batch.add_argument("--jobs", type=int, default=DEFAULT_BATCH_JOBS, help="rows processed at the same time")
+    batch.add_argument("--encode", choices=ENCODE_PROFILES, help=ENCODE_HELP)
+    batch.add_argument("--force", action="store_true", help="schedule rows even if they overlap other jobs")
+    batch.set_defaults(run=cmd_batch)
+    fleet = commands.add_parser("fleet", help="list, add or remove saved fleet servers")
+    fleet_actions = fleet.add_subparsers(dest="action", required=True)
+    fleet_actions.add_parser("list", help="show the saved servers")
+    add = fleet_actions.add_parser("add", help="add a server, or replace the one with this name")
+    add.add_argument("name")
+    add.add_argument("host_address", metavar="host")
+    add.add_argument("--port", type=int, default=22)
+    add.add_argument("--user", default="root")
+    add.add_argument("--role", choices=("standalone", "origin", "edge"), default="standalone")
+    add.add_argument("--url", help="public URL edges pull from (origin only; default: asked from the origin)")
+    remove = fleet_actions.add_parser("remove", help="forget a server")
+    remove.add_argument("name")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.metrics or args.profile_slow:
+        from metrics import METRICS
+        if args.profile_slow: METRICS.enable_profiling(args.profile_slow)
+        try:
+            return run(args, parser)
+        finally:
+            if args.metrics: METRICS.export(args.metrics)
+    return run(args, parser)
+
+
+def run(args, parser):
+    if args.command == "fleet":
+        from fleet import FleetError
+        try:
+            return cmd_fleet(args) or 0
+        except FleetError as e:
+            raise SystemExit(str(e))
+    if args.command == "batch":
+        args.rows = load_manifest(args.manifest)
+    if args.fleet or args.servers:
+        return run_fleet(args, parser)
+    if not args.host:
+        parser.error("--host (or HLSMANAGER_HOST) is required")
+    args.out, args.label = sys.stdout, ""
+    errors = operation_errors()
+    try:
+        engine = connect(args)
+    except errors as e:
+        raise SystemExit(f"Could not connect to {args.user}@{args.host}:{args.port}: {e or type(e).__name__}")
+    try:
+        return args.run(engine, args) or 0
+    except errors as e:
+        raise SystemExit(f"{args.command} failed: {e or type(e).__name__}")
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
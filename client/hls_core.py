@@ -0,0 +1,924 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Headless Core Engine
+# ==============================================================================
+# Everything the client does on the server (connection, upload and pre-flight,
+# start scripts, scheduling, queue, channel status, page templates and nginx
+# tuning) without any GUI dependency. The Tk client and the command line
+# (hls_cli.py) are thin front ends over Engine; paramiko is only imported when a
+# connection is made.
+# ==============================================================================
+
+
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from sftp_upload import ParallelUploader, file_sha256
+from encode_upload import EncodingUploader, cached_encode, remember_encode
+from page_deploy import PageStager, swap_command
+from task_executor import current_task
+from metrics import METRICS, THROUGHPUT_BUCKETS
+from agent_client import AgentClient, AgentUnavailable, AgentError, REMOTE_AGENT_DIR, REMOTE_AGENT_PATH, push_if_changed
+from media_probe import (analyse, package_playlist, parse_probe, prepare_command, probe_command, HLS_FRAGMENT_SECONDS,
+                         PLAN_COPY, PLAN_FASTSTART, PLAN_UNREADABLE, PROBE_SUFFIX, PROBE_WINDOW_SECONDS, READY_SUFFIX)
+
+# --- Paths on the server ---
+REMOTE_VIDEO_DIR = "/var/videos"
+REMOTE_LIBRARY_DIR = f"{REMOTE_VIDEO_DIR}/library"
+REMOTE_PACKAGE_DIR = f"{REMOTE_VIDEO_DIR}/hls"
+REMOTE_PLAYER_HTML_PATH = "/var/www/player/index.html"
+REMOTE_PLAYER_TEMPLATE_PATH = "/var/www/player_template.html"
+REMOTE_IDLE_TEMPLATE_PATH = "/var/www/idle_template.html"
+REMOTE_CHANNELS_DIR = "/root/.hlsmanager/channels"
+FFMPEG_PATH = "/usr/bin/ffmpeg"
+FFPROBE_PATH = "/usr/bin/ffprobe"
+
+# --- Stream channels ---
+# Every channel is an independent broadcast with its own stream key, start scripts,
+# logs, HLS playlist and player page. The default channel keeps the original
+# single-stream paths so existing players and bookmarks keep working.
+DEFAULT_CHANNEL = "stream"
+CHANNEL_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+
+# --- Video library ---
+# Uploaded videos are stored under REMOTE_LIBRARY_DIR named by their SHA-256, so a
+# file that is already on the server is never transferred again. Played files are
+# kept, and the least-recently-streamed ones are evicted once the quota is exceeded.
+# Derived files (<hash>.probe.json, <hash>.ready.mp4 and the HLS package under
+# REMOTE_PACKAGE_DIR) count towards the quota and are evicted with their source.
+DEFAULT_LIBRARY_QUOTA_GB = 50
+
+# --- Server tuning ---
+# scripts/nginx_conf.py renders nginx.conf from an audience profile. The client pushes it
+# next to the remote agent and runs it with --apply, which validates before reloading.
+LOCAL_NGINX_CONF_GENERATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts",
+                                          "nginx_conf.py")
+REMOTE_NGINX_CONF_GENERATOR = f"{REMOTE_AGENT_DIR}/nginx_conf.py"
+LATENCY_TARGETS = ("standard", "low")
+
+# --- Adaptive bitrate ---
+# With ABR enabled, one ffmpeg decodes the input once and encodes every rung of the
+# ladder in parallel, each to <key>_<name>. nginx-rtmp's `hls_variant` entries (which
+# must list the same names) turn those into a master playlist at /hls/<key>.m3u8.
+# Keyframes are forced on every HLS fragment in all rungs, so switching is seamless.
+ABR_LADDER = [
+    {"name": "1080p", "height": 1080, "video_kbps": 5000, "audio_kbps": 128},
+    {"name": "720p", "height": 720, "video_kbps": 2800, "audio_kbps": 128},
+    {"name": "480p", "height": 480, "video_kbps": 1400, "audio_kbps": 96},
+    {"name": "audio", "height": None, "video_kbps": 0, "audio_kbps": 64},
+]
+# Video rungs a source can also be encoded to locally while it uploads (see encode_upload.py).
+ENCODE_PROFILES = [rung["name"] for rung in ABR_LADDER if rung["height"]]
+ABR_SUFFIX = "(?:_(?:" + "|".join(re.escape(rung["name"]) for rung in ABR_LADDER) + "))?"
+# The same suffix with plain groups, for patterns that pkill and grep -E (POSIX ERE) also read.
+ABR_SUFFIX_ERE = "(_(" + "|".join(rung["name"] for rung in ABR_LADDER) + "))?"
+
+# --- Low-latency mode ---
+# Low-latency streams publish to a second nginx-rtmp application that cuts 1 s fragments
+# into a 6 s playlist under /hls/ll/. Fragments can only start on keyframes, so these
+# streams are always encoded with a keyframe forced on every fragment (in every ABR rung),
+# and their player page follows the live edge closely. Pre-packaged videos are not used.
+LOW_LATENCY_APP = "lowlatency"
+LOW_LATENCY_FRAGMENT_SECONDS = 1
+# Rewrites of DEFAULT_PLAYER_HTML (and of a custom player template using the same lines).
+LOW_LATENCY_PLAYER_SETTINGS = {
+    "trackingThreshold: 20": "trackingThreshold: 0",
+    "liveTolerance: 15": "liveTolerance: 3",
+    "var catchUpSeconds = 0;": "var catchUpSeconds = 4;",
+}
+
+# A channel is live while ffmpeg publishes to its RTMP key (or to ABR rungs of it) or the
+# agent publishes a pre-packaged playlist for it. The bracketed first letters keep `grep`
+# from matching itself.
+STREAM_PROCESS_PATTERN = rf"[f]fmpeg.*rtmp://localhost/(live|{LOW_LATENCY_APP})/|[r]emote_agent\.py publish "
+STREAM_KEY_IN_COMMAND = re.compile(rf"rtmp://localhost/(?:live|{LOW_LATENCY_APP})/([A-Za-z0-9_-]+?)" + ABR_SUFFIX +
+                                   r"\s*$|remote_agent\.py publish ([A-Za-z0-9_-]+) ")
+
+# --- Scheduling ---
+# Times are entered and shown in this timezone; `at` jobs are queued in the server's.
+LOCAL_TIMEZONE = "Asia/Tehran"
+# Scheduled jobs go to the agent's SQLite job store; `at` is only used when the agent is
+# unavailable. Store job ids are shown with a prefix so they never clash with `at` ids.
+RECURRENCES = ("daily", "weekly")
+QUEUE_PAGE_SIZE = 100
+STORE_JOB_PREFIX = "S"
+
+# --- Playlist playout ---
+# A playlist is played by a single ffmpeg per channel reading an ffconcat list, so
+# the RTMP publish session, the HLS playlist and the player page stay up across items.
+# Without ABR the streams are copied as-is, so every item must share the same codecs.
+PLAYLIST_HEADER = "ffconcat version 1.0"
+
+# --- Batched queue snapshot ---
+# Lists every `at` job together with the video it plays in a single remote
+# invocation. Each job becomes one tab-separated `JOB` line: the video title,
+# the channel, the video path (the first `pick` argument: the ffmpeg input, or
+# the first playlist entry) and the raw `atq` line. The server timezone is
+# prepended as a `TZ` line only when the client has not cached it yet.
+QUEUE_SNAPSHOT_TZ_CMD = "printf 'TZ\\t%s\\n' \"$(cat /etc/timezone 2>/dev/null)\"; "
+QUEUE_SNAPSHOT_CMD = (
+    "atq | while IFS= read -r line; do "
+    "id=${line%%[[:space:]]*}; "
+    "job=$(at -c \"$id\" 2>/dev/null); "
+    "title=$(printf '%s\\n' \"$job\" | sed -n 's|^# video: ||p' | head -n 1); "
+    "channel=$(printf '%s\\n' \"$job\" | sed -n 's|^# channel: ||p' | head -n 1); "
+    "video=$(printf '%s\\n' \"$job\" | sed -n 's|.*pick \\\\\\{0,1\\}\"\\(" + REMOTE_VIDEO_DIR + "/[^\"\\\\]*\\).*|\\1|p' | head -n 1); "
+    "printf 'JOB\\t%s\\t%s\\t%s\\t%s\\n' \"$title\" \"${channel:-" + DEFAULT_CHANNEL + "}\" \"$video\" \"$line\"; "
+    "done"
+)
+
+# --- Default HTML templates ---
+DEFAULT_PLAYER_HTML = """
+<!DOCTYPE html>
+<html lang="fa" dir="rtl">
+<head>
+    <meta charset="UTF-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+    <title>پخش زنده آنلاین</title>
+    <link href="https://vjs.zencdn.net/8.10.0/video-js.css" rel="stylesheet" />
+    <link rel="preconnect" href="https://fonts.googleapis.com">
+    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+    <link href="https://fonts.googleapis.com/css2?family=Vazirmatn:wght@400;700&display=swap" rel="stylesheet">
+    <style>
+        :root {
+            --bg-color: #121212;
+            --text-color: #e0e0e0;
+            --card-bg: #1e1e1e;
+            --header-color: #ffffff;
+            --shadow: 0 8px 30px rgba(0, 0, 0, 0.25);
+        }
+        body {
+            margin: 0;
+            font-family: 'Vazirmatn', sans-serif;
+            background-color: var(--bg-color);
+            color: var(--text-color);
+            display: flex;
+            justify-content: center;
+            align-items: center;
+            min-height: 100vh;
+        }
+        .container {
+            display: flex;
+            flex-direction: column;
+            align-items: center;
+            padding: 2vw 4vw;
+            max-width: 1200px;
+            width: 100%;
+            margin: 0 auto;
+        }
+        .class-info {
+            width: 100%;
+            text-align: center;
+            margin-bottom: 30px;
+            padding: 20px;
+            background: var(--card-bg);
+            border-radius: 15px;
+            box-shadow: var(--shadow);
+        }
+        .class-info h1 {
+            font-size: clamp(1.5rem, 4vw, 2.5rem);
+            margin: 0 0 10px;
+            color: var(--header-color);
+        }
+        .class-info .description {
+            font-size: clamp(0.9rem, 2vw, 1.1rem);
+            line-height: 1.7;
+            max-width: 800px;
+            margin: 0 auto;
+            opacity: 0.8;
+        }
+        .video-wrapper {
+            position: relative;
+            width: 100%;
+            max-width: 1000px;
+            aspect-ratio: 16/9;
+            background: #000;
+            border-radius: 15px;
+            overflow: hidden;
+            box-shadow: var(--shadow);
+        }
+        .video-js {
+            width: 100%;
+            height: 100%;
+        }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="class-info">
+            <h1>پخش زنده آنلاین</h1>
+            <div class="description">به پخش زنده خوش آمدید. استریم به زودی آغاز خواهد شد.</div>
+        </div>
+        <div class="video-wrapper">
+            <video id="live-video" class="video-js vjs-big-play-centered" controls playsinline></video>
+        </div>
+    </div>
+
+    <script src="https://vjs.zencdn.net/8.10.0/video.min.js"></script>
+    <script>
+        var player = videojs("live-video", {
+            liveui: true,
+            fluid: true,
+            autoplay: true,
+            muted: true,
+            liveTracker: {
+                trackingThreshold: 20,
+                liveTolerance: 15
+            },
+            html5: {
+                vhs: {
+                    overrideNative: !videojs.browser.IS_SAFARI,
+                    enableLowInitialPlaylist: true
+                }
+            }
+        });
+
+        player.src({
+            src: "/hls/stream.m3u8",
+            type: "application/x-mpegURL"
+        });
+
+        // Seconds behind the live edge after which playback jumps forward (0 = never).
+        var catchUpSeconds = 0;
+        player.on("timeupdate", function() {
+            var tracker = player.liveTracker;
+            if (catchUpSeconds && tracker && tracker.isLive() && tracker.liveCurrentTime() - player.currentTime() > catchUpSeconds) {
+                tracker.seekToLiveEdge();
+            }
+        });
+
+        player.ready(function() {
+            var playPromise = this.play();
+            if (playPromise !== undefined) {
+                playPromise.then(() => {
+                    this.muted(false);
+                    this.volume(1.0);
+                }).catch(error => {
+                    console.log("پخش خودکار توسط مرورگر ممکن نشد. کاربر باید برای شروع روی دکمه پلی کلیک کند.");
+                });
+            }
+        });
+    </script>
+</body>
+</html>
+"""
+DEFAULT_IDLE_HTML = """
+<!DOCTYPE html>
+<html lang="fa" dir="rtl">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>آفلاین</title>
+    <style>
+        body, html { margin: 0; padding: 0; height: 100%; display: flex; justify-content: center; align-items: center; background-color: #1f2937; color: #f9fafb; font-family: sans-serif; text-align: center; }
+        .container { max-width: 600px; padding: 2rem; }
+        h1 { font-size: 2.5rem; margin-bottom: 1rem; }
+        p { font-size: 1.2rem; color: #d1d5db; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <h1>پخش زنده‌ای وجود ندارد</h1>
+        <p>لطفاً بعداً مراجعه کنید.</p>
+    </div>
+</body>
+</html>
+"""
+
+
+class StreamChannel:
+    def __init__(self, key):
+        self.key = key
+        self.rtmp_url = f"rtmp://localhost/live/{key}"
+        self.hls_url = f"/hls/{key}.m3u8"
+        self.low_latency_rtmp_url = f"rtmp://localhost/{LOW_LATENCY_APP}/{key}"
+        self.low_latency_hls_url = f"/hls/ll/{key}.m3u8"
+        self.script_dir = f"{REMOTE_CHANNELS_DIR}/{key}"
+        self.process_pattern = (f"({FFMPEG_PATH}.*rtmp://localhost/(live|{LOW_LATENCY_APP})/{key}{ABR_SUFFIX_ERE}$"
+                                f"|remote_agent\\.py publish {key} )")
+        if key == DEFAULT_CHANNEL:
+            self.log_file = "/tmp/ffmpeg.log"
+            self.progress_file = "/tmp/ffmpeg.progress"
+            self.player_html_path = REMOTE_PLAYER_HTML_PATH
+        else:
+            self.log_file = f"/tmp/ffmpeg_{key}.log"
+            self.progress_file = f"/tmp/ffmpeg_{key}.progress"
+            self.player_html_path = f"{os.path.dirname(REMOTE_PLAYER_HTML_PATH)}/{key}/index.html"
+
+    def new_script_path(self):
+        # Every start gets its own script, so overlapping jobs never rewrite each other's file.
+        return f"{self.script_dir}/stream_starter-{datetime.now():%Y%m%d%H%M%S%f}.sh"
+
+    def playlist_path(self, script_path):
+        return f"{os.path.splitext(script_path)[0]}.ffconcat"
+
+    def page_replacements(self, low_latency=False):
+        # Substrings of the player page (template or default) to rewrite for this channel.
+        if not low_latency:
+            return {"/hls/stream.m3u8": self.hls_url}
+        return dict(LOW_LATENCY_PLAYER_SETTINGS, **{"/hls/stream.m3u8": self.low_latency_hls_url})
+
+    def render_player_html(self, low_latency=False):
+        html = DEFAULT_PLAYER_HTML
+        for old, new in self.page_replacements(low_latency).items():
+            html = html.replace(old, new)
+        return html
+
+
+class EngineError(Exception):
+    pass
+
+
+class ServerUnreachable(EngineError):
+    # The SSH session gave up on the server: reconnecting or re-authenticating failed, or it was closed.
+    pass
+
+
+class ScheduleConflict(EngineError):
+    # Raised when a new job overlaps others on its channel; `conflicts` holds (title, local start).
+    def __init__(self, message, conflicts):
+        super().__init__(message)
+        self.conflicts = conflicts
+
+
+class Engine:
+    # Everything the client does on the server, without any GUI. Front ends pass callbacks:
+    #   on_status(text)                   - one-line progress for a status bar or log
+    #   on_notice(level, title, message)  - "info", "warning" or "error" worth showing to the user
+    #   on_channel_added(channel)         - a channel seen for the first time (from the queue, a scan, ...)
+    def __init__(self, on_status=None, on_notice=None, on_channel_added=None, local_timezone=LOCAL_TIMEZONE):
+        self.session = None
+        self.agent = None
+        self.pages = None
+        self.page_templates = {}
+        self.server_tz_name = None
+        self.local_timezone = pytz.timezone(local_timezone)
+        self.library_quota_gb = DEFAULT_LIBRARY_QUOTA_GB
+        self.channels = {DEFAULT_CHANNEL: StreamChannel(DEFAULT_CHANNEL)}
+        self.live_channels = set()
+        self.video_durations = {}
+        self.on_status = on_status or (lambda text: None)
+        self.on_notice = on_notice or (lambda level, title, message: None)
+        self.on_channel_added = on_channel_added or (lambda channel: None)
+        self._channels_lock = threading.Lock()
+
+    # --- Connection ---
+    def connect(self, host, port, user, password):
+        # paramiko is only imported once a connection is actually made.
+        from ssh_session import SSHSession
+        session = SSHSession(host, port, user, password, on_state_change=self.on_status)
+        session.connect()
+        self.session = session
+        self.agent = AgentClient(session)
+        self.pages = PageStager(session)
+        self.page_templates = {}
+        self.server_tz_name = None
+
+    def close(self):
+        if self.agent: self.agent.close()
+        if self.session: self.session.close()
+        self.agent = self.session = self.pages = None
+
+    def execute_command(self, command, check=False):
+        # Returns (stdout, stderr). A lost connection is reported to the user and then returns
+        # ("", reason), or raises ServerUnreachable with `check`, for callers that must stop.
+        from ssh_session import ConnectionLost
+        try:
+            if not self.session:
+                raise ConnectionLost("SSH connection lost.")
+            with METRICS.timer("ssh_command_seconds"):
+                out, err_output = self.session.execute(command)
+            if err_output:
+                if "not found" not in err_output.lower():
+                    print(f"SSH Command Error: {err_output}")
+            return out, err_output
+        except ConnectionLost as e:
+            # The session already retried with backoff; keep the front end open so the user can retry later.
+            self.on_notice("error", "Connection Error", f"An error occurred: {e}\nPlease try again.")
+            self.on_status(f"❌ {e}")
+            if check: raise ServerUnreachable(str(e)) from e
+            return "", str(e)
+
+    def agent_call(self, op, **args):
+        # Returns the remote agent's result, or None when the caller should fall back to shell commands.
+        if not self.agent: return None
+        try:
+            with METRICS.timer("agent_call_seconds", op=op):
+                return self.agent.call(op, **args)
+        except (AgentUnavailable, AgentError) as e:
+            print(f"Remote agent: {e}")
+            return None
+
+    def get_server_timezone(self):
+        # The server timezone cannot change during a session, so it is read once per connection.
+        if self.server_tz_name is None:
+            try:
+                out, _ = self.execute_command("cat /etc/timezone", check=True)
+            except ServerUnreachable:
+                return "UTC"
+            self.server_tz_name = out.strip() or "UTC"
+        return self.server_tz_name
+
+    # --- Channels ---
+    def get_channel(self, key):
+        if not CHANNEL_KEY_PATTERN.match(key):
+            raise ValueError("Channel keys may only contain letters, digits, '-' and '_' (max 32).")
+        with self._channels_lock:
+            added = key not in self.channels
+            if added: self.channels[key] = StreamChannel(key)
+            channel = self.channels[key]
+        if added: self.on_channel_added(channel)
+        return channel
+
+    def scan_live_channels(self):
+        # One process scan reports the state of every channel. Returns None when the server is unreachable.
+        processes = self.agent_call("status", pattern=STREAM_PROCESS_PATTERN)
+        if processes is None:
+            try:
+                out, _ = self.execute_command(f"ps -eo args | grep -E '{STREAM_PROCESS_PATTERN}'", check=True)
+            except ServerUnreachable:
+                return None
+            commands = out.splitlines()
+        else:
+            commands = [process["cmdline"] for process in processes]
+        live_channels = set()
+        for command in commands:
+            match = STREAM_KEY_IN_COMMAND.search(command)
+            if match: live_channels.add(match.group(1) or match.group(2))
+        self.live_channels = live_channels
+        for key in live_channels: self.get_channel(key)
+        return live_channels
+
+    def stop_stream(self, channel):
+        if self.agent_call("stop", pattern=channel.process_pattern) is None:
+            self.execute_command(f"pkill -9 -f '{channel.process_pattern}'")
+        self.install_page(channel, 'idle')
+
+    # --- Pages ---
+    def page_template(self, page):
+        # The custom template on the server, or None; read once per session and after set_template.
+        path = REMOTE_PLAYER_TEMPLATE_PATH if page == 'player' else REMOTE_IDLE_TEMPLATE_PATH
+        if path not in self.page_templates:
+            try:
+                with self.session.sftp() as sftp, sftp.file(path, 'r') as f:
+                    self.page_templates[path] = f.read().decode("utf-8")
+            except IOError:
+                self.page_templates[path] = None
+        return self.page_templates[path]
+
+    def render_page(self, channel, page, low_latency=False):
+        template = self.page_template(page)
+        if template is None:
+            return channel.render_player_html(low_latency) if page == 'player' else DEFAULT_IDLE_HTML
+        for old, new in channel.page_replacements(low_latency).items():
+            template = template.replace(old, new)
+        return template
+
+    def _page_install_cmd(self, channel, page, low_latency=False):
+        # Shell equivalent of the agent's "page" operation. The page is rendered and staged now, so
+        # a start script only swaps names when it runs.
+        return swap_command(self.pages.stage(self.render_page(channel, page, low_latency)), channel.player_html_path)
+
+    def install_page(self, channel, page):
+        staged = self.pages.stage(self.render_page(channel, page))
+        if self.agent_call("page", staged=staged, target=channel.player_html_path) is None:
+            self.execute_command(swap_command(staged, channel.player_html_path))
+
+    def set_template(self, template_type, local_path):
+        # Uploads a custom page template. A new idle page is applied right away to every idle
+        # channel, which are returned; player templates apply to streams started or scheduled from now on.
+        remote_path = REMOTE_IDLE_TEMPLATE_PATH if template_type == 'idle' else REMOTE_PLAYER_TEMPLATE_PATH
+        with self.session.sftp() as sftp:
+            sftp.put(local_path, remote_path)
+        self.page_templates.pop(remote_path, None)
+        if template_type != 'idle': return []
+        idle_channels = [channel for key, channel in self.channels.items() if key not in self.live_channels]
+        for channel in idle_channels: self.install_page(channel, 'idle')
+        return idle_channels
+
+    # --- Library ---
+    def upload(self, local_path, progress_callback=None):
+        # Uploads into the content-addressed library unless the file is already there. Returns the
+        # library path. Runs inside a TaskExecutor task, the upload stops when that task is cancelled.
+        filename = os.path.basename(local_path)
+        self.on_status(f"Hashing {filename}...")
+        digest = file_sha256(local_path)
+        library_path = f"{REMOTE_LIBRARY_DIR}/{digest}{os.path.splitext(filename)[1].lower()}"
+        out, _ = self.execute_command(f"test -f {library_path} && echo exists", check=True)
+        if out == "exists":
+            if progress_callback: progress_callback(1, 1)
+            self.on_status(f"✅ '{filename}' is already in the server library. Upload skipped.")
+            return library_path
+        task = current_task()
+        self.execute_command(f"mkdir -p {REMOTE_LIBRARY_DIR}")
+        started = time.perf_counter()
+        ParallelUploader(self.session, local_path, f"{library_path}.part", callback=progress_callback,
+                         local_sha256=digest, is_cancelled=task.is_cancelled if task else None).upload()
+        self._observe_upload("parallel", os.path.getsize(local_path), time.perf_counter() - started)
+        self.execute_command(f"mv -f {library_path}.part {library_path}")
+        self.on_status(f"✅ Upload of '{filename}' complete. Ready for action.")
+        return library_path
+
+    def upload_encoded(self, local_path, profile, progress_callback=None):
+        # Encodes the file locally to an ENCODE_PROFILES rung while the output uploads, and returns
+        # the library path. `progress_callback` gets EncodingUploader's encode and upload figures.
+        # An earlier encode of the same file and profile that is still on the server is reused.
+        rung = next((rung for rung in ABR_LADDER if rung["name"] == profile and rung["height"]), None)
+        if rung is None: raise EngineError(f"Unknown encode profile '{profile}'.")
+        filename = os.path.basename(local_path)
+        library_path = cached_encode(local_path, rung)
+        if library_path:
+            out, _ = self.execute_command(f"test -f {library_path} && echo exists", check=True)
+            if out == "exists":
+                self.on_status(f"✅ '{filename}' is already in the server library as {profile}. Encode skipped.")
+                return library_path
+        task = current_task()
+        incoming = f"{REMOTE_LIBRARY_DIR}/incoming-{os.urandom(8).hex()}.mp4.part"
+        self.execute_command(f"mkdir -p {REMOTE_LIBRARY_DIR}")
+        self.on_status(f"Encoding {filename} to {profile} while uploading...")
+        uploader = EncodingUploader(self.session, local_path, incoming, rung, callback=progress_callback,
+                                    is_cancelled=task.is_cancelled if task else None)
+        started = time.perf_counter()
+        try:
+            digest = uploader.upload()
+        except Exception:
+            self.execute_command(f"rm -f {incoming}")
+            raise
+        self._observe_upload("encoded", uploader.bytes_uploaded, time.perf_counter() - started)
+        library_path = f"{REMOTE_LIBRARY_DIR}/{digest}.mp4"
+        self.execute_command(f"mv -f {incoming} {library_path}")
+        remember_encode(local_path, rung, library_path)
+        self.on_status(f"✅ '{filename}' encoded to {profile} and uploaded. Ready for action.")
+        return library_path
+
+    @staticmethod
+    def _observe_upload(mode, size, elapsed):
+        METRICS.observe("upload_seconds", elapsed, mode=mode)
+        METRICS.observe("upload_throughput_bytes_per_second", size / max(elapsed, 1e-6), THROUGHPUT_BUCKETS, mode=mode)
+
+    def probe_video(self, path):
+        probe = self.agent_call("probe", path=path, ffprobe=FFPROBE_PATH, window=PROBE_WINDOW_SECONDS)
+        if probe is None:
+            try:
+                out, _ = self.execute_command(probe_command(path, FFPROBE_PATH), check=True)
+            except ServerUnreachable:
+                return None
+            probe = parse_probe(out)
+        return analyse(probe)
+
+    def prepare_video(self, path, filename):
+        # Pre-flight check right after upload, so codec or container problems surface now, and
+        # the remux/transcode and HLS packaging are done well before air time. Returns the report.
+        self.on_status(f"🔎 Probing {filename}...")
+        report = self.probe_video(path)
+        if report is None: return None
+        if report["duration"]: self.video_durations[path] = report["duration"]
+        reasons = "; ".join(report["reasons"])
+        if report["plan"] == PLAN_UNREADABLE:
+            self.on_notice("warning", "Unsupported Video", f"'{filename}' cannot be streamed: {reasons}.")
+            self.on_status(f"⚠️ '{filename}' cannot be streamed: {reasons}.")
+            return report
+        self.execute_command(prepare_command(path, report, FFMPEG_PATH, REMOTE_PACKAGE_DIR))
+        if report["plan"] == PLAN_COPY:
+            self.on_status(f"✅ '{filename}' is ready ({report['video_codec']}/{report['audio_codec']}, "
+                           f"keyframes every {report['keyframe_interval']:.1f} s). "
+                           f"Pre-packaging it as HLS in the background.")
+        else:
+            action = "Remuxing" if report["plan"] == PLAN_FASTSTART else "Transcoding to H.264/AAC"
+            self.on_status(f"🛠️ {action} '{filename}' on the server in the background ({reasons}). "
+                           f"The original is used until it finishes.")
+        return report
+
+    def probe_durations(self, paths):
+        # Library files never change, so each duration is probed once per session.
+        missing = sorted({path for path in paths if path not in self.video_durations})
+        if not missing: return
+        files = " ".join(f'"{path}"' for path in missing)
+        try:
+            out, _ = self.execute_command(
+                f"for f in {files}; do printf '%s\\t%s\\n' \"$f\" "
+                f"\"$({FFPROBE_PATH} -v error -show_entries format=duration -of csv=p=0 \"$f\")\"; done", check=True)
+        except ServerUnreachable:
+            return
+        for line in out.splitlines():
+            path, _, duration = line.partition("\t")
+            try:
+                self.video_durations[path] = float(duration)
+            except ValueError:
+                print(f"Could not probe the duration of {path}")
+
+    def rundown(self, items, start_dt):
+        # Returns (item, start time, duration) per item; once a duration is unknown, later starts are too.
+        entries, offset = [], 0.0
+        for item in items:
+            duration = self.video_durations.get(item["path"])
+            entries.append((item, None if offset is None else start_dt + timedelta(seconds=offset), duration))
+            offset = None if offset is None or duration is None else offset + duration
+        return entries, offset
+
+    # --- Start scripts ---
+    def _abr_outputs(self, rtmp_url, gop, silence=""):
+        # One split per video rung; every encoder forces keyframes on the same fragment grid.
+        # Every rung of the ladder is always published, so the master playlist nginx writes from
+        # ABR_VARIANTS never points at a missing variant. For silent sources `silence` is a
+        # generated silent input (see _silence_input) that stands in for the audio track.
+        audio_map = "1:a:0" if silence else "0:a:0?"
+        video_rungs = [rung for rung in ABR_LADDER if rung["height"]]
+        filters = [f"[0:v]split={len(video_rungs)}" + "".join(f"[s{i}]" for i in range(len(video_rungs)))]
+        filters += [f"[s{i}]scale=-2:'min({rung['height']},ih)'[v{i}]" for i, rung in enumerate(video_rungs)]
+        outputs = ([silence] if silence else []) + [f'-filter_complex "{";".join(filters)}"']
+        for i, rung in enumerate(video_rungs):
+            kbps = rung["video_kbps"]
+            outputs.append(f'-map "[v{i}]" -map {audio_map} -c:v libx264 -preset veryfast -b:v {kbps}k '
+                           f'-maxrate {kbps * 107 // 100}k -bufsize {kbps * 3 // 2}k {gop} '
+                           f'-c:a aac -b:a {rung["audio_kbps"]}k -ar 48000 -f flv {rtmp_url}_{rung["name"]}')
+        for rung in ABR_LADDER:
+            if not rung["height"]:
+                outputs.append(f'-map {audio_map.rstrip("?")} -vn -c:a aac -b:a {rung["audio_kbps"]}k -ar 48000 '
+                               f'-f flv {rtmp_url}_{rung["name"]}')
+        return " ".join(outputs)
+
+    def _silence_input(self, videos):
+        # Returns "" when every source has an audio track, else a real-time silent input as long
+        # as the whole session, so the audio-only rung still ends when the video does. Probes are
+        # cached next to the files, so this is cheap after the upload pre-flight.
+        reports = [self.probe_video(video) for video in videos]
+        if all(report and report["audio_codec"] for report in reports): return ""
+        if not all(report and report["duration"] for report in reports):
+            raise EngineError("The ABR ladder needs the duration of silent videos; check that they can be probed.")
+        total = sum(report["duration"] for report in reports)
+        return f"-re -f lavfi -t {total:.3f} -i anullsrc=r=48000:cl=stereo"
+
+    def _low_latency_output(self, rtmp_url, gop):
+        # Single rendition capped at the top ABR rung; the source is re-encoded so that every
+        # 1 s fragment starts on a keyframe, whatever GOP the file was uploaded with.
+        top = ABR_LADDER[0]
+        return (f"-map 0:v:0 -map 0:a:0? -c:v libx264 -preset veryfast -crf 21 -maxrate {top['video_kbps']}k "
+                f"-bufsize {top['video_kbps']}k -pix_fmt yuv420p {gop} "
+                f"-c:a aac -b:a {top['audio_kbps']}k -ar 48000 -f flv {rtmp_url}")
+
+    def _stream_script(self, channel, script_path, title, videos, ffmpeg_input, preamble="", temp_files=(),
+                       abr=False, low_latency=False):
+        # Builds the start script: player page up, one publish session, idle page back, library
+        # upkeep and cleanup. `videos` are the library files the session plays. When all of them
+        # are pre-packaged, the agent airs the packages; otherwise ffmpeg encodes in real time.
+        # Pre-packaged videos have a single rendition on the standard fragment grid, so ABR and
+        # low-latency streams are always encoded live.
+        log_file = channel.log_file
+        if low_latency:
+            rtmp_url = channel.low_latency_rtmp_url
+            gop = (f'-force_key_frames "expr:gte(t,n_forced*{LOW_LATENCY_FRAGMENT_SECONDS})" -sc_threshold 0 '
+                   f'-tune zerolatency')
+        else:
+            rtmp_url = channel.rtmp_url
+            gop = f'-force_key_frames "expr:gte(t,n_forced*{HLS_FRAGMENT_SECONDS})" -sc_threshold 0'
+        if abr:
+            outputs = self._abr_outputs(rtmp_url, gop, self._silence_input(videos))
+        elif low_latency:
+            outputs = self._low_latency_output(rtmp_url, gop)
+        else:
+            outputs = f"-c:v copy -c:a copy -f flv {rtmp_url}"
+        modes = [mode for mode, enabled in (("ABR ladder", abr), ("low latency", low_latency)) if enabled]
+        label = f" ({', '.join(modes)})" if modes else ""
+        encode = (f'echo "--- Starting ffmpeg{label}... ---" >> {log_file}\n'
+                  f"{FFMPEG_PATH} -nostats -progress {channel.progress_file} -re {ffmpeg_input} {outputs} "
+                  f">> {log_file} 2>&1")
+        quoted_videos = " ".join(f'"{video}"' for video in videos)
+        playlists = [f'"{package_playlist(video, REMOTE_PACKAGE_DIR)}"' for video in videos]
+        packaged = " && ".join([f"[ -f {playlist} ]" for playlist in playlists] + [f"[ -f {REMOTE_AGENT_PATH} ]"])
+        if not modes:
+            encode = f"""if {packaged} && command -v python3 > /dev/null; then
+echo "--- Publishing pre-packaged HLS... ---" >> {log_file}
+python3 {REMOTE_AGENT_PATH} publish {channel.key} {channel.progress_file} {" ".join(playlists)} >> {log_file} 2>&1
+else
+{encode}
+fi"""
+        return f"""#!/bin/bash
+# video: {title}
+# channel: {channel.key}
+echo "--- Stream script started at $(date) ---" > {log_file}
+touch -c {quoted_videos}
+pick() {{ R="${{1%.*}}{READY_SUFFIX}"; if [ -f "$R" ]; then echo "$R"; else echo "$1"; fi; }}
+{preamble}{self._page_install_cmd(channel, 'player', low_latency)}
+{encode}
+FFMPEG_EXIT_CODE=$?
+echo "--- Stream finished with code: $FFMPEG_EXIT_CODE ---" >> {log_file}
+{self._page_install_cmd(channel, 'idle')}
+{self._library_upkeep_script(quoted_videos, log_file)}
+rm -f {" ".join((script_path,) + tuple(temp_files))}
+echo "--- Cleanup complete. ---" >> {log_file}
+"""
+
+    def _submit_script(self, channel, script_path, script_content, what, title, local_dt=None, duration=None,
+                       repeat="", until_dt=None, force=False):
+        self.execute_command(f"mkdir -p {channel.script_dir}")
+        with self.session.sftp() as sftp, sftp.file(script_path, 'w') as f:
+            f.write(script_content)
+        if local_dt:
+            # The job store and `at` both keep their own copy of the script, so the file is removed
+            # once the job is queued. Overlapping jobs on the channel are refused unless `force`d.
+            try:
+                job = self.agent_call("add_job", script=script_path, channel=channel.key, title=title,
+                                      start=int(local_dt.timestamp()), duration=duration, recurrence=repeat,
+                                      until=int(until_dt.timestamp()) if until_dt else None,
+                                      tz=self.local_timezone.zone, force=force)
+                if job is None:
+                    if repeat:
+                        raise EngineError("Repeating schedules need the remote agent (python3) on the server.")
+                    server_tz = self.get_server_timezone()
+                    schedule_time_str = local_dt.astimezone(pytz.timezone(server_tz)).strftime('%H:%M %Y-%m-%d')
+                    if self.agent_call("schedule", script=script_path, time=schedule_time_str, tz=server_tz) is None:
+                        self.execute_command(f"chmod +x {script_path}")
+                        self.execute_command(f"TZ={server_tz} at -f {script_path} {schedule_time_str}")
+                elif job["id"] is None:
+                    conflicts = [(conflict["title"], datetime.fromtimestamp(conflict["start"], self.local_timezone))
+                                 for conflict in job["conflicts"]]
+                    raise ScheduleConflict(f"{what} overlaps on '{channel.key}' with " + ", ".join(
+                        f"'{other}' at {start:%H:%M on %Y-%m-%d}" for other, start in conflicts) + ".", conflicts)
+            finally:
+                self.execute_command(f"rm -f {script_path}")
+            repeats = f", repeating {repeat}" if repeat else ""
+            msg = f"{what} scheduled on '{channel.key}' for {local_dt:%H:%M on %Y-%m-%d} (Tehran Time){repeats}."
+            self.on_notice("info", "Scheduling Successful", msg)
+            self.on_status(f"⏰ {msg}")
+        else:
+            if self.agent_call("run", script=script_path) is None:
+                self.execute_command(f"chmod +x {script_path}")
+                self.execute_command(f"nohup {script_path} &")
+            msg = f"{what} sent to '{channel.key}'. It should be live in a few seconds."
+            self.on_notice("info", "Stream Started", msg)
+            self.on_status(f"🚀 {msg}")
+
+    def start_or_schedule(self, channel, video, title=None, local_dt=None, abr=False, low_latency=False, repeat="",
+                          until_dt=None, force=False):
+        # Starts `video` (a library path) on `channel` now, or at `local_dt` when given, optionally
+        # repeating daily or weekly until `until_dt`. Raises ScheduleConflict on overlaps unless `force`.
+        script_path = channel.new_script_path()
+        title = title or os.path.basename(video)
+        script_content = self._stream_script(channel, script_path, title, [video], f'-i "$(pick "{video}")"',
+                                             abr=abr, low_latency=low_latency)
+        self._submit_script(channel, script_path, script_content, "Stream", title, local_dt,
+                            self.video_durations.get(video), repeat, until_dt, force)
+
+    def start_or_schedule_playlist(self, channel, items, local_dt=None, abr=False, low_latency=False, repeat="",
+                                   until_dt=None, force=False):
+        # The ffconcat list is embedded in the script, so the `at` copy is self-contained and
+        # the library upkeep of other jobs sees every queued item as pinned. Items are resolved
+        # to their prepared copies when the job runs.
+        script_path = channel.new_script_path()
+        playlist_path = channel.playlist_path(script_path)
+        entries = []
+        for item in items:
+            entries.append(f"file '$(pick \"{item['path']}\")'")
+            if item["path"] in self.video_durations:
+                entries.append(f"duration {self.video_durations[item['path']]:.3f}")
+        preamble = f"cat > {playlist_path} <<EOF\n{PLAYLIST_HEADER}\n" + "\n".join(entries) + "\nEOF\n"
+        title = items[0]["title"] if len(items) == 1 else f"Playlist: {items[0]['title']} + {len(items) - 1} more"
+        script_content = self._stream_script(channel, script_path, title, [item["path"] for item in items],
+                                             f"-f concat -safe 0 -i {playlist_path}", preamble, [playlist_path],
+                                             abr, low_latency)
+        _, duration = self.rundown(items, local_dt or datetime.now(self.local_timezone))
+        self._submit_script(channel, script_path, script_content, "Playlist", title, local_dt, duration, repeat,
+                            until_dt, force)
+
+    def _library_upkeep_script(self, keep, log_file):
+        # Evicts the least-recently-streamed library files (oldest mtime first) until the
+        # library fits the quota again. Files in `keep` or referenced by queued jobs are kept.
+        quota_bytes = self.library_quota_gb * 1024 ** 3
+        return f"""QUOTA={quota_bytes}
+PINNED=$({{ atq | cut -f1 | while read -r id; do at -c "$id"; done; python3 {REMOTE_AGENT_PATH} scripts 2>/dev/null; }} | grep -oE '{REMOTE_LIBRARY_DIR}/[0-9a-f]{{64}}[.a-z0-9]*' | sort -u)
+USED=$(du -sbc {REMOTE_LIBRARY_DIR} {REMOTE_PACKAGE_DIR} 2>/dev/null | tail -n 1 | cut -f1)
+find {REMOTE_LIBRARY_DIR} -maxdepth 1 -type f -regextype posix-extended -regex '.*/[0-9a-f]{{64}}\\.[a-z0-9]+' -printf '%T@ %p\\n' | sort -n | while read -r _ path; do
+    [ "$USED" -le "$QUOTA" ] && break
+    printf '%s\\n' "$PINNED" {keep} | grep -qxF "$path" && continue
+    name=${{path##*/}}
+    rm -rf "$path" "${{path%.*}}"{READY_SUFFIX} "${{path%.*}}"{PROBE_SUFFIX} "{REMOTE_PACKAGE_DIR}/${{name%.*}}" || continue
+    USED=$(du -sbc {REMOTE_LIBRARY_DIR} {REMOTE_PACKAGE_DIR} 2>/dev/null | tail -n 1 | cut -f1) && echo "Evicted $path from the library." >> {log_file}
+done"""
+
+    # --- Schedule queue ---
+    def local_time(self, naive_dt):
+        return self.local_timezone.localize(naive_dt)
+
+    def fetch_queue_snapshot(self, offset=0, limit=QUEUE_PAGE_SIZE, channel=None, start_dt=None, end_dt=None):
+        # Returns one page of (job id, server time, video title, channel, repeat) ordered by start
+        # time, and the number of matching jobs, or None when the server is unreachable. The
+        # page comes from one indexed query on the job store; jobs still queued in `at` (from
+        # a server without the agent) are few, so all of them are merged with the store's jobs
+        # and the page is cut from the merged sequence.
+        at_jobs = self._fetch_at_queue()
+        if at_jobs is None: return None
+        at_jobs = sorted((job + ("",) for job in at_jobs
+                          if (channel is None or job[3] == channel) and (start_dt is None or job[1] >= start_dt)
+                          and (end_dt is None or job[1] < end_dt)), key=lambda job: job[1])
+
+        def store_page(first, count):
+            return self.agent_call("jobs", offset=first, limit=count, channel=channel,
+                                   start=int(start_dt.timestamp()) if start_dt else None,
+                                   end=int(end_dt.timestamp()) if end_dt else None)
+
+        # Each `at` job ahead of a store job moves it one place down, so the store jobs on the
+        # page are among those from `first` on.
+        first = max(0, offset - len(at_jobs))
+        page = store_page(first, offset + limit - first)
+        if page is None: return at_jobs[offset:offset + limit], len(at_jobs)
+        server_tz = pytz.timezone(page["timezone"])
+
+        def store_job(job):
+            return (f"{STORE_JOB_PREFIX}{job['id']}", datetime.fromtimestamp(job["start"], server_tz), job["title"],
+                    job["channel"], job["recurrence"])
+
+        jobs = [store_job(job) for job in page["jobs"]]
+        merged, base = at_jobs + jobs, 0
+        if first and page["total"]:
+            # The store jobs before `first` and the `at` jobs up to an anchor store job all come
+            # before the page; only how many of them there are matters. The anchor is the first
+            # store job fetched or, when the page lies past the store's end, its last job.
+            if jobs:
+                anchor, base = jobs[0][1], first
+            else:
+                last = store_page(page["total"] - 1, 1)
+                if last is None or not last["jobs"]: return at_jobs[offset:offset + limit], len(at_jobs)
+                anchor, base = store_job(last["jobs"][0])[1], page["total"]
+            earlier = [job for job in at_jobs if job[1] <= anchor]
+            merged, base = at_jobs[len(earlier):] + jobs, base + len(earlier)
+        merged.sort(key=lambda job: job[1])
+        return merged[offset - base:offset - base + limit], page["total"] + len(at_jobs)
+
+    def _fetch_at_queue(self):
+        # Returns (job id, server time, video title, channel) for every `at` job in one remote request.
+        snapshot = self.agent_call("queue", video_dir=REMOTE_VIDEO_DIR)
+        if snapshot is not None:
+            self.server_tz_name = snapshot["timezone"]
+            server_tz = pytz.timezone(self.server_tz_name)
+            return [(job["id"], datetime.fromtimestamp(job["start"], server_tz),
+                     job["title"] or os.path.basename(job["video"]), job["channel"] or DEFAULT_CHANNEL)
+                    for job in snapshot["jobs"]]
+        command = QUEUE_SNAPSHOT_CMD if self.server_tz_name else QUEUE_SNAPSHOT_TZ_CMD + QUEUE_SNAPSHOT_CMD
+        try:
+            out, _ = self.execute_command(command, check=True)
+        except ServerUnreachable:
+            return None
+        lines = []
+        for line in out.split('\n'):
+            fields = line.split('\t', 2)
+            if fields[0] == "TZ" and len(fields) == 2:
+                self.server_tz_name = fields[1].strip() or "UTC"
+            elif fields[0] == "JOB" and len(fields) == 3:
+                lines.append(fields[1:])
+        if self.server_tz_name is None: self.server_tz_name = "UTC"
+        server_tz = pytz.timezone(self.server_tz_name)
+        jobs = []
+        for title, job_line in lines:
+            try:
+                channel, video, line = job_line.split('\t', 2)
+                parts = line.split()
+                job_id, server_time_str = parts[0], " ".join(parts[1:6])
+                server_dt_naive = datetime.strptime(server_time_str, '%a %b %d %H:%M:%S %Y')
+                jobs.append((job_id, server_tz.localize(server_dt_naive), title or os.path.basename(video), channel))
+            except (ValueError, IndexError) as e:
+                print(f"Could not parse job line: {job_line} - Error: {e}")
+        return jobs
+
+    def cancel_job(self, job_id):
+        job_id = str(job_id)
+        if job_id.startswith(STORE_JOB_PREFIX):
+            if self.agent_call("remove_job", job_id=int(job_id[len(STORE_JOB_PREFIX):])) is None:
+                raise EngineError(f"Job {job_id} could not be cancelled: the remote agent is not available.")
+        elif self.agent_call("cancel", job_id=job_id) is None:
+            self.execute_command(f"atrm {job_id}")
+        self.on_status(f"🗑️ Job {job_id} cancelled.")
+
+    # --- Server tuning ---
+    def edge_url(self):
+        # The URL edges should pull from this server ("" = plain HTTP to its address is fine).
+        try:
+            push_if_changed(self.session, LOCAL_NGINX_CONF_GENERATOR, REMOTE_NGINX_CONF_GENERATOR)
+        except Exception as e:
+            raise EngineError(f"Could not upload the config generator: {e}")
+        out, _ = self.execute_command(f"python3 {REMOTE_NGINX_CONF_GENERATOR} --print-edge-url", check=True)
+        return out.strip()
+
+    def apply_nginx_profile(self, viewers, latency, ram_mb, origin=None):
+        # Returns (applied, generator output). The previous config stays active when not applied.
+        # `origin` makes the server a pull edge of that URL, "" makes it standalone again, None keeps its role.
+        self.on_status(f"Applying nginx profile ({viewers} viewers, {latency} latency, {ram_mb} MB)...")
+        try:
+            push_if_changed(self.session, LOCAL_NGINX_CONF_GENERATOR, REMOTE_NGINX_CONF_GENERATOR)
+        except Exception as e:
+            raise EngineError(f"Could not upload the config generator: {e}")
+        role = "" if origin is None else f" --origin '{origin}'"
+        out, err = self.execute_command(f"python3 {REMOTE_NGINX_CONF_GENERATOR} --viewers {viewers} "
+                                        f"--latency {latency} --ram-mb {ram_mb}{role} --apply 2>&1; echo \"EXIT:$?\"",
+                                        check=True)
+        output, _, status = out.rpartition("EXIT:")
+        if status.strip() == "0":
+            self.on_status("✅ nginx profile applied.")
+            return True, output.strip()
+        self.on_status("❌ nginx profile was not applied; the previous config is still active.")
+        return False, output.strip() or err
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Keyed Treeview Model
+# ==============================================================================
+# Keeps a ttk.Treeview in step with an ordered list of (iid, values) rows. Each
+# refresh is diffed against the rows already shown and only the rows that were
+# added, changed, removed or moved touch Tk, so a refresh of an unchanged
+# 1,000-row queue costs no Tk call at all, and selection, focus and scroll
+# position survive. `last_operations` counts the Tk calls of the last sync.
+# ==============================================================================
+
+
+class KeyedTree:
+    def __init__(self, tree):
+        self.tree = tree
+        self.rows = {}
+        self.order = []
+        self.last_operations = 0
+
+    def sync(self, rows):
+        # `rows` is the complete new content, in display order; iids must be unique strings.
+        new_rows = {iid: tuple(values) for iid, values in rows}
+        operations = 0
+        gone = [iid for iid in self.order if iid not in new_rows]
+        if gone:
+            self.tree.delete(*gone)
+            operations += 1
+        current = [iid for iid in self.order if iid in new_rows]
+        old_position = {iid: position for position, iid in enumerate(current)}
+        # Rows that keep their relative order stay put; only the others are moved.
+        stay = _longest_increasing([iid for iid in new_rows if iid in old_position], old_position)
+        previous = None
+        for iid, values in new_rows.items():
+            if iid not in stay:
+                if iid in old_position:
+                    current.remove(iid)
+                index = current.index(previous) + 1 if previous is not None else 0
+                current.insert(index, iid)
+                if iid in old_position:
+                    self.tree.move(iid, "", index)
+                else:
+                    self.tree.insert("", index, iid=iid, values=values)
+                operations += 1
+            if iid in self.rows and self.rows[iid] != values:
+                self.tree.item(iid, values=values)
+                operations += 1
+            previous = iid
+        self.rows, self.order = new_rows, current
+        self.last_operations = operations
+        return operations
+
+
+def _longest_increasing(iids, position):
+    # Largest set of `iids` whose `position`s already increase in list order (patience sorting).
+    tails, links = [], {}
+    for iid in iids:
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if position[tails[middle]] < position[iid]:
+                low = middle + 1
+            else:
+                high = middle
+        links[iid] = tails[low - 1] if low else None
+        if low == len(tails):
+            tails.append(iid)
+        else:
+            tails[low] = iid
+    keep, iid = set(), tails[-1] if tails else None
+    while iid is not None:
+        keep.add(iid)
+        iid = links[iid]
+    return keep
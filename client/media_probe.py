@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Pre-flight Media Probe
+# ==============================================================================
+# Inspects every library video right after upload: container, codecs, pixel
+# format, keyframe interval and whether an MP4's moov atom sits behind the
+# media data. The result is cached next to the video as <hash>.probe.json and
+# turns into a plan:
+#
+#   copy       - stream the file as-is (`-c copy` into FLV)
+#   faststart  - remux once with the moov atom up front
+#   transcode  - re-encode once to H.264/AAC with keyframes on every HLS fragment
+#
+# Remuxes and transcodes run as low-priority background jobs on the server and
+# write <hash>.ready.mp4; start scripts prefer that file when it exists. The same
+# job then segments the video into an HLS package (<package dir>/<hash>/), which
+# start scripts publish at air time instead of encoding it in real time.
+# ==============================================================================
+
+
+import json
+import os
+
+HLS_FRAGMENT_SECONDS = 3
+PROBE_WINDOW_SECONDS = 30
+# nginx-rtmp can only cut fragments on keyframes, so sparser keyframes stretch every segment.
+KEYFRAME_INTERVAL_LIMIT = HLS_FRAGMENT_SECONDS * 2
+FLV_VIDEO_CODECS = {"h264"}
+FLV_AUDIO_CODECS = {"aac", "mp3"}
+FLV_PIXEL_FORMATS = {"yuv420p", "yuvj420p"}
+MP4_FORMATS = {"mov", "mp4", "m4a", "3gp", "3g2", "mj2"}
+READY_SUFFIX = ".ready.mp4"
+PROBE_SUFFIX = ".probe.json"
+
+PLAN_COPY = "copy"
+PLAN_FASTSTART = "faststart"
+PLAN_TRANSCODE = "transcode"
+PLAN_UNREADABLE = "unreadable"
+
+
+def ready_path(path):
+    return os.path.splitext(path)[0] + READY_SUFFIX
+
+
+def package_playlist(path, package_dir):
+    return f"{package_dir}/{os.path.basename(os.path.splitext(path)[0])}/index.m3u8"
+
+
+def probe_command(path, ffprobe_path):
+    # Shell equivalent of the agent's "probe" operation. Prints the cached probe, or
+    # probes the file and caches the result when ffprobe could read it.
+    cache = os.path.splitext(path)[0] + PROBE_SUFFIX
+    return (f'P="{path}"; C="{cache}"; if [ -s "$C" ]; then cat "$C"; else '
+            f'''A=$({ffprobe_path} -v trace -i "$P" 2>&1 | grep -m1 -oE "type:'(moov|mdat)'" | grep -oE "moov|mdat"); '''
+            f'if F=$({ffprobe_path} -v error -print_format json -show_format -show_streams '
+            f'-show_entries packet=stream_index,pts_time,flags -read_intervals %+{PROBE_WINDOW_SECONDS} "$P"); then '
+            f'''printf '{{"first_atom": "%s", "ffprobe": %s}}\\n' "$A" "$F" > "$C.tmp" && mv -f "$C.tmp" "$C" && cat "$C"; '''
+            f'''else printf '{{"first_atom": "%s", "ffprobe": null}}\\n' "$A"; fi; fi''')
+
+
+def parse_probe(output):
+    try:
+        return json.loads(output)
+    except ValueError:
+        return {"first_atom": "", "ffprobe": None}
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def keyframe_interval(info, stream_index, duration):
+    # Largest gap between video keyframes in the probed window; a single keyframe
+    # means the gap is at least as long as the window (or the whole file).
+    times = sorted(_float(packet.get("pts_time")) for packet in info.get("packets", [])
+                   if packet.get("stream_index") == stream_index and "K" in packet.get("flags", "")
+                   and _float(packet.get("pts_time")) is not None)
+    if len(times) < 2:
+        return min(duration or PROBE_WINDOW_SECONDS, PROBE_WINDOW_SECONDS)
+    return max(later - earlier for earlier, later in zip(times, times[1:]))
+
+
+def analyse(probe):
+    info = probe.get("ffprobe") or {}
+    streams = info.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+    container = info.get("format", {}).get("format_name", "")
+    duration = _float(info.get("format", {}).get("duration"))
+    report = {
+        "container": container,
+        "duration": duration,
+        "video_codec": video.get("codec_name") if video else None,
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "pix_fmt": video.get("pix_fmt") if video else None,
+        "keyframe_interval": keyframe_interval(info, video.get("index"), duration) if video else None,
+        "moov_at_end": probe.get("first_atom") == "mdat" and bool(MP4_FORMATS & set(container.split(","))),
+        "reasons": [],
+    }
+    reasons = report["reasons"]
+    if not video:
+        report["plan"] = PLAN_UNREADABLE
+        reasons.append("ffprobe found no video stream")
+        return report
+    if report["video_codec"] not in FLV_VIDEO_CODECS:
+        reasons.append(f"video codec {report['video_codec']} cannot be carried over RTMP")
+    elif report["pix_fmt"] not in FLV_PIXEL_FORMATS:
+        reasons.append(f"pixel format {report['pix_fmt']} is not playable in browsers")
+    if audio and report["audio_codec"] not in FLV_AUDIO_CODECS:
+        reasons.append(f"audio codec {report['audio_codec']} cannot be carried over RTMP")
+    if report["keyframe_interval"] > KEYFRAME_INTERVAL_LIMIT:
+        reasons.append(f"keyframes only every {report['keyframe_interval']:.1f} s "
+                       f"(HLS fragments are {HLS_FRAGMENT_SECONDS} s)")
+    if reasons:
+        report["plan"] = PLAN_TRANSCODE
+    elif report["moov_at_end"]:
+        report["plan"] = PLAN_FASTSTART
+        reasons.append("the moov atom is at the end of the file")
+    else:
+        report["plan"] = PLAN_COPY
+    return report
+
+
+def prepare_command(path, report, ffmpeg_path, package_dir):
+    # Starts the one-time preparation as a niced background job: the remux/transcode to
+    # <hash>.ready.mp4 when the plan needs one, then the HLS package. Both steps write to
+    # temporary names first, and flock keeps a second request from starting a duplicate job.
+    digest = os.path.basename(os.path.splitext(path)[0])
+    source, steps = path, []
+    if report["plan"] in (PLAN_FASTSTART, PLAN_TRANSCODE):
+        target = ready_path(path)
+        if report["plan"] == PLAN_FASTSTART:
+            codec_args = "-map 0:v:0 -map 0:a:0? -c copy"
+        else:
+            audio_args = "-c:a copy" if report["audio_codec"] in FLV_AUDIO_CODECS else "-c:a aac -b:a 160k -ar 48000"
+            codec_args = (f"-map 0:v:0 -map 0:a:0? -c:v libx264 -preset veryfast -crf 20 -pix_fmt yuv420p "
+                          f'-force_key_frames "expr:gte(t,n_forced*{HLS_FRAGMENT_SECONDS})" {audio_args}')
+        steps.append(f'[ -f "{target}" ] || {{ {ffmpeg_path} -nostdin -v error -y -i "{source}" {codec_args} '
+                     f'-movflags +faststart -f mp4 "{target}.part" && mv -f "{target}.part" "{target}"; }}')
+        source = target
+    package = os.path.dirname(package_playlist(path, package_dir))
+    steps.append(f'[ -f "{package}/index.m3u8" ] || {{ rm -rf "{package}.tmp" && mkdir -p "{package}.tmp" && '
+                 f'{ffmpeg_path} -nostdin -v error -y -i "{source}" -map 0:v:0 -map 0:a:0? -c copy '
+                 f'-f hls -hls_time {HLS_FRAGMENT_SECONDS} -hls_playlist_type vod '
+                 f'-hls_segment_filename "{package}.tmp/segment_%05d.ts" "{package}.tmp/index.m3u8" && '
+                 f'rm -rf "{package}" && mv "{package}.tmp" "{package}"; }}')
+    return (f"nohup flock -n /tmp/hlsmanager-prepare-{digest}.lock nice -n 19 ionice -c 3 "
+            f"sh -c '{' && '.join(steps)}' > /tmp/hlsmanager-prepare-{digest}.log 2>&1 < /dev/null &")
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Operation Metrics
+# ==============================================================================
+# In-memory histograms of how long the client's operations take: every remote
+# command and agent call, uploads (duration and throughput), background tasks
+# by name (queue and status refreshes among them) and UI drain cycles. An
+# observation is a bisect and a few additions under a lock, about a microsecond
+# or two, against SSH round trips of milliseconds.
+#
+# Collectors add point-in-time values on demand, e.g. the task executor's and
+# the UI channel's counters. snapshot() feeds the diagnostics tab, and export()
+# writes Prometheus text format (.prom, replaced atomically, for a node
+# exporter's textfile collector) or appends one JSON object per metric to a
+# JSON-lines file.
+#
+# Profiling is opt-in: with enable_profiling(seconds), every timed operation
+# runs under cProfile, and any that takes at least that long leaves a .prof
+# dump in ~/.hlsmanager/profiles (open it with `python -m pstats`). Nested
+# operations are profiled as part of the outermost one.
+# ==============================================================================
+
+
+import cProfile
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+METRIC_PREFIX = "hlsmanager_"
+PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".hlsmanager", "profiles")
+# Upper bounds in seconds, and in bytes per second for throughput (64 KiB/s to 128 MiB/s).
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+THROUGHPUT_BUCKETS = tuple(64 * 1024 * 2 ** i for i in range(12))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_profiling = threading.local()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max: self.max = value
+
+    def quantile(self, q):
+        # Estimated by interpolating inside the bucket that holds the q-th observation.
+        if not self.count: return None
+        rank, seen = q * self.count, 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+                return lower + (max(upper, lower) - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+
+class _Timer:
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.profiler = None
+
+    def __enter__(self):
+        if self.metrics.profile_threshold is not None and not getattr(_profiling, "active", False):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another thread's profile is running (Python 3.12+)
+                profiler = None
+            if profiler:
+                _profiling.active, self.profiler = True, profiler
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        self.metrics.observe(self.name, elapsed, **self.labels)
+        if self.profiler:
+            self.profiler.disable()
+            _profiling.active = False
+            self.metrics._keep_profile(self.profiler, self.name, elapsed)
+        return False
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.collectors = {}
+        self.profile_threshold = None
+        self.profile_dir = PROFILE_DIR
+        self.last_profile = None
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        # `with METRICS.timer("ssh_command_seconds"):` records the block's duration.
+        return _Timer(self, name, labels)
+
+    def collect(self, prefix, func):
+        # `func()` returns a dict of numbers, reported as `<prefix>_<key>` gauges.
+        self.collectors[prefix] = func
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+
+    # --- Profiling ---
+    def enable_profiling(self, threshold_seconds, directory=None):
+        self.profile_dir = directory or self.profile_dir
+        self.profile_threshold = threshold_seconds
+
+    def disable_profiling(self):
+        self.profile_threshold = None
+
+    def _keep_profile(self, profiler, name, elapsed):
+        threshold = self.profile_threshold
+        if threshold is None or elapsed < threshold: return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, f"{name}-{datetime.now():%Y%m%d-%H%M%S-%f}-{elapsed * 1000:.0f}ms.prof")
+        profiler.dump_stats(path)
+        self.last_profile = path
+
+    # --- Reading ---
+    def snapshot(self):
+        # Returns one dict per histogram (count, sum, max, p50/p95/p99, cumulative buckets) and per gauge.
+        with self._lock:
+            histograms = [(name, labels, histogram.buckets, list(histogram.counts), histogram.count, histogram.sum,
+                           histogram.max) for (name, labels), histogram in sorted(self.histograms.items())]
+        entries = []
+        for name, labels, buckets, counts, count, total, maximum in histograms:
+            view = Histogram(buckets)
+            view.counts, view.count, view.sum, view.max = counts, count, total, maximum
+            cumulative, buckets_out = 0, []
+            for bound, bucket_count in zip(buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                buckets_out.append((bound, cumulative))
+            entry = {"name": name, "type": "histogram", "labels": dict(labels), "count": count, "sum": total,
+                     "max": maximum, "buckets": buckets_out}
+            for q in QUANTILES:
+                entry[f"p{int(q * 100)}"] = view.quantile(q)
+            entries.append(entry)
+        for prefix, func in sorted(self.collectors.items()):
+            try:
+                values = func()
+            except Exception as e:
+                print(f"Metrics collector '{prefix}' failed: {e}")
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, (int, float)):
+                    entries.append({"name": f"{prefix}_{key}", "type": "gauge", "labels": {}, "value": value})
+        return entries
+
+    def prometheus_text(self):
+        lines, typed = [], set()
+        for entry in self.snapshot():
+            name = METRIC_PREFIX + entry["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} {entry['type']}")
+                typed.add(name)
+            labels = entry["labels"]
+            if entry["type"] == "gauge":
+                lines.append(f"{name}{_labels(labels)} {entry['value']}")
+                continue
+            for bound, cumulative in entry["buckets"]:
+                lines.append(f"{name}_bucket{_labels(dict(labels, le=bound))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {entry['sum']}")
+            lines.append(f"{name}_count{_labels(labels)} {entry['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # `.prom` files are replaced with Prometheus text; anything else gets JSON lines appended.
+        if path.endswith(".prom"):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp_path, path)
+            return
+        timestamp = time.time()
+        with open(path, "a", encoding="utf-8") as f:
+            for entry in self.snapshot():
+                entry = dict(entry, time=timestamp)
+                if "buckets" in entry:
+                    entry["buckets"] = {str(bound): cumulative for bound, cumulative in entry["buckets"]}
+                f.write(json.dumps(entry) + "\n")
+
+
+def _label_value(value):
+    # Prometheus text format: backslash, double quote and newline are escaped in label values.
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels: return ""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in sorted(labels.items())) + "}"
+
+
+def format_value(name, value):
+    # Human-readable value for the diagnostics tab.
+    if value is None: return "-"
+    if name.endswith("_bytes_per_second"): return f"{value / 1048576:.1f} MB/s"
+    if name.endswith("_seconds"): return f"{value * 1000:.1f} ms" if value < 1 else f"{value:.2f} s"
+    return f"{value:g}"
+
+
+METRICS = Metrics()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Page Deployment
+# ==============================================================================
+# Player and idle pages are rendered once on the client, gzipped, and uploaded
+# to a staging directory under their content hash (<sha256>.html and .html.gz),
+# each written to a .part file first and renamed into place. A staged page never
+# changes, so it is uploaded once per distinct content.
+#
+# Going live or idle then only swaps names on the server: the staged files are
+# hard-linked next to the channel's index.html and renamed over it, .gz first.
+# A viewer always gets a complete old or new page, never a half-written one,
+# and nginx serves the precompressed variant (gzip_static) with an ETag derived
+# from the staged file, which only changes when the content does.
+#
+# The staging directory sits outside the web root but on the same filesystem as
+# /var/www/player, so the links work. Staged pages are a few KB each and are kept,
+# because queued start scripts refer to them.
+# ==============================================================================
+
+
+import gzip
+import hashlib
+import os
+
+REMOTE_PAGE_STAGING_DIR = "/var/www/pages"
+PAGE_HASH_LENGTH = 16
+PAGE_GZIP_LEVEL = 9
+PAGE_VARIANTS = (".gz", "")
+
+
+def build_page(html):
+    # Returns (staged file name, page bytes, gzipped bytes). mtime=0 keeps the gzip output reproducible.
+    data = html.encode("utf-8")
+    name = f"{hashlib.sha256(data).hexdigest()[:PAGE_HASH_LENGTH]}.html"
+    return name, data, gzip.compress(data, PAGE_GZIP_LEVEL, mtime=0)
+
+
+def swap_command(staged_path, target):
+    # Shell equivalent of the agent's "page" operation. Names already linked to the staged file are
+    # left alone: renaming a hard link over itself is a no-op that would leave the .tmp name behind.
+    steps = [f"mkdir -p {os.path.dirname(target)}"]
+    for suffix in PAGE_VARIANTS:
+        source, name = f"{staged_path}{suffix}", f"{target}{suffix}"
+        steps.append(f"{{ [ {source} -ef {name} ] || {{ ln -f {source} {name}.tmp && mv -f {name}.tmp {name}; }}; }}")
+    return " && ".join(steps)
+
+
+class PageStager:
+    def __init__(self, session, staging_dir=REMOTE_PAGE_STAGING_DIR):
+        self.session = session
+        self.staging_dir = staging_dir
+        self.staged = set()
+
+    def stage(self, html):
+        # Returns the staged path of `html`, uploading it unless the server already has it.
+        name, data, compressed = build_page(html)
+        path = f"{self.staging_dir}/{name}"
+        if name in self.staged:
+            return path
+        with self.session.sftp() as sftp:
+            try:
+                sftp.stat(path)
+            except IOError:
+                try:
+                    sftp.stat(self.staging_dir)
+                except IOError:
+                    sftp.mkdir(self.staging_dir)
+                # The page itself is renamed last, so its presence means the .gz is complete too.
+                for suffix, content in ((".gz", compressed), ("", data)):
+                    with sftp.file(f"{path}{suffix}.part", "wb") as f:
+                        f.write(content)
+                    sftp.posix_rename(f"{path}{suffix}.part", f"{path}{suffix}")
+        self.staged.add(name)
+        return path
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Remote Agent
+# ==============================================================================
+# A small stdlib-only helper that the desktop client pushes to the server and
+# keeps running on one long-lived SSH channel. It reads one JSON request per
+# line on stdin and answers with one JSON response per line on stdout:
+#
+#   {"id": 1, "op": "status", "args": {"pattern": "..."}}
+#   {"id": 1, "ok": true, "result": [...]}
+#
+# Read-only operations (status, queue, jobs) are served from /proc, the `at`
+# spool directory and the job store without spawning any process on the server.
+#
+# `remote_agent.py publish <key> <progress file> <playlist>...` is used by start
+# scripts instead: it airs pre-packaged VOD playlists as a sliding live playlist
+# at /hls/<key>.m3u8 in real time, without encoding anything.
+#
+# Scheduled streams live in an SQLite job store (schedule.db next to this file),
+# indexed by start time and by channel. `remote_agent.py scheduler` is the daemon
+# that runs due jobs and moves recurring ones to their next occurrence; it runs
+# as a systemd service where available and is started on demand otherwise.
+# `remote_agent.py scripts` prints every queued start script, so library upkeep
+# can keep the videos they reference.
+# ==============================================================================
+
+
+import json
+import math
+import os
+import re
+import select
+import signal
+import sqlite3
+import struct
+import subprocess
+import sys
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9: recurrences keep a fixed UTC offset
+    ZoneInfo = None
+
+AGENT_VERSION = 1
+AT_SPOOL_DIR = "/var/spool/cron/atjobs"
+TIMEZONE_FILE = "/etc/timezone"
+AT_JOB_NAME = re.compile(r"^([a-zA-Z=])([0-9a-f]{5})([0-9a-f]{8})$")
+AT_SUBMITTED = re.compile(r"job (\d+) at")
+PROBE_SUFFIX = ".probe.json"
+MAX_TOP_LEVEL_BOXES = 64
+VOD_DIR = "/var/videos/hls"
+VOD_URL = "/vod"
+LIVE_HLS_DIR = "/var/hls"
+LIVE_WINDOW_SECONDS = 60
+AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEDULE_DB = os.path.join(AGENT_DIR, "schedule.db")
+SCHEDULER_RUN_DIR = os.path.join(AGENT_DIR, "runs")
+SCHEDULER_PID_FILE = os.path.join(AGENT_DIR, "scheduler.pid")
+SCHEDULER_UNIT = "hlsmanager-scheduler"
+SCHEDULER_UNIT_PATH = f"/etc/systemd/system/{SCHEDULER_UNIT}.service"
+SCHEDULER_MAX_SLEEP = 60
+# A job found more than this late (the server was down) is skipped rather than started hours late.
+SCHEDULER_GRACE_SECONDS = 600
+RECURRENCE_DAYS = {"daily": 1, "weekly": 7}
+CONFLICT_HORIZON_DAYS = 28
+MAX_PAGE_SIZE = 1000
+JOB_COLUMNS = ("id", "channel", "title", "start", "duration", "recurrence", "until", "tz")
+SCHEDULE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    script TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    duration REAL,
+    recurrence TEXT NOT NULL DEFAULT '',
+    until INTEGER,
+    tz TEXT NOT NULL DEFAULT 'UTC',
+    created INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_start ON jobs (start);
+CREATE INDEX IF NOT EXISTS jobs_channel_start ON jobs (channel, start);
+"""
+
+
+class AgentError(Exception):
+    pass
+
+
+# --- Helpers ---
+def _read_text(path, default=""):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return default
+
+
+def _write_atomic(path, content):
+    # Readers never observe a half-written file: the new content is renamed into place.
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def _processes(pattern):
+    regex = re.compile(pattern)
+    matches = []
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().replace(b"\0", b" ").decode(errors="replace").strip()
+        except OSError:
+            continue
+        if cmdline and regex.search(cmdline):
+            matches.append({"pid": int(pid), "cmdline": cmdline})
+    return matches
+
+
+def _first_atom(path):
+    # Walks the top-level MP4 boxes (32-bit size + type, size 1 = 64-bit size follows)
+    # and reports whether "moov" or "mdat" comes first. Non-MP4 files yield "".
+    try:
+        with open(path, "rb") as f:
+            for _ in range(MAX_TOP_LEVEL_BOXES):
+                header = f.read(8)
+                if len(header) < 8:
+                    return ""
+                size, kind = struct.unpack(">I4s", header)
+                if kind in (b"moov", b"mdat"):
+                    return kind.decode()
+                if size == 1:
+                    size = struct.unpack(">Q", f.read(8))[0] - 8
+                if size < 8:
+                    return ""
+                f.seek(size - 8, os.SEEK_CUR)
+    except (OSError, struct.error):
+        pass
+    return ""
+
+
+def _spawn(args):
+    # Detached from the agent, so the process survives the SSH channel closing.
+    with open(os.devnull, "rb") as devnull_in, open(os.devnull, "wb") as devnull_out:
+        proc = subprocess.Popen(args, stdin=devnull_in, stdout=devnull_out, stderr=devnull_out,
+                                start_new_session=True)
+    return proc.pid
+
+
+# --- Job store ---
+def _schedule_db():
+    # WAL lets the scheduler daemon and the agent use the store at the same time.
+    db = sqlite3.connect(SCHEDULE_DB, timeout=10)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(SCHEDULE_SCHEMA)
+    return db
+
+
+def _next_start(start, recurrence, tz):
+    # Steps whole calendar days in the job's timezone, so a daily 20:00 programme stays at 20:00 across DST.
+    days = RECURRENCE_DAYS[recurrence]
+    try:
+        zone = ZoneInfo(tz) if ZoneInfo else None
+    except Exception:
+        zone = None
+    if zone is None:
+        return start + days * 86400
+    local = datetime.fromtimestamp(start, zone).replace(tzinfo=None) + timedelta(days=days)
+    return int(local.replace(tzinfo=zone).timestamp())
+
+
+def _occurrences(start, recurrence, until, tz, before):
+    # Start times of a job up to (not including) `before`.
+    while start < before and (until is None or start <= until):
+        yield start
+        if not recurrence:
+            return
+        start = _next_start(start, recurrence, tz)
+
+
+def _conflicts(db, channel, start, duration, recurrence, until, tz):
+    # Jobs on the same channel whose airtime overlaps the new job, looking CONFLICT_HORIZON_DAYS ahead
+    # for recurring jobs. A job of unknown duration is taken to occupy only its first second.
+    horizon = start + CONFLICT_HORIZON_DAYS * 86400 if recurrence else start + 1
+    airtimes = [(begin, begin + max(duration or 0, 1)) for begin in _occurrences(start, recurrence, until, tz, horizon)]
+    if not airtimes:
+        return []
+    last_end = airtimes[-1][1]
+    conflicts = []
+    for job in db.execute("SELECT id, title, start, duration, recurrence, until, tz FROM jobs "
+                          "WHERE channel = ? AND start < ? ORDER BY start", (channel, last_end)):
+        length = max(job["duration"] or 0, 1)
+        for begin in _occurrences(job["start"], job["recurrence"], job["until"], job["tz"], last_end):
+            if any(begin < end and new_begin < begin + length for new_begin, end in airtimes):
+                conflicts.append({"id": job["id"], "title": job["title"], "start": begin})
+                break
+    return conflicts
+
+
+def _scheduler_pid():
+    pid = _read_text(SCHEDULER_PID_FILE).strip()
+    if pid.isdigit() and "scheduler" in _read_text(f"/proc/{pid}/cmdline"):
+        return int(pid)
+    return None
+
+
+def _ensure_scheduler():
+    # Wakes a running daemon so it sees a new job at once. Otherwise it is installed as a systemd
+    # service (so it survives reboots) or, without systemd, started in the background.
+    pid = _scheduler_pid()
+    if pid:
+        os.kill(pid, signal.SIGHUP)
+        return
+    command = [sys.executable, os.path.abspath(__file__), "scheduler"]
+    if os.path.isdir("/run/systemd/system"):
+        unit = (f"[Unit]\nDescription=HLSManager stream scheduler\nAfter=network.target\n\n"
+                f"[Service]\nExecStart={' '.join(command)}\nRestart=always\n\n"
+                f"[Install]\nWantedBy=multi-user.target\n")
+        if _read_text(SCHEDULER_UNIT_PATH) != unit:
+            _write_atomic(SCHEDULER_UNIT_PATH, unit)
+            subprocess.run(["systemctl", "daemon-reload"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if subprocess.run(["systemctl", "enable", "--now", SCHEDULER_UNIT], stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode == 0:
+            return
+    _spawn(command)
+
+
+# --- Operations ---
+def op_ping():
+    return {"version": AGENT_VERSION, "pid": os.getpid()}
+
+
+def op_status(pattern):
+    return _processes(pattern)
+
+
+def op_stop(pattern, sig=signal.SIGKILL):
+    killed = []
+    for proc in _processes(pattern):
+        try:
+            os.kill(proc["pid"], sig)
+            killed.append(proc["pid"])
+        except OSError:
+            pass
+    return killed
+
+
+def op_queue(video_dir):
+    # Mirrors `atq` + `at -c` by reading the spool directly. Job file names encode
+    # the queue letter, the job number and the start time in minutes since the epoch.
+    video_pattern = re.compile(r' -i "(' + re.escape(video_dir) + r'/[^"]*)"')
+    jobs = []
+    try:
+        names = os.listdir(AT_SPOOL_DIR)
+    except OSError as e:
+        raise AgentError(f"Cannot read the at spool: {e}")
+    for name in names:
+        match = AT_JOB_NAME.match(name)
+        if not match:
+            continue
+        content = _read_text(os.path.join(AT_SPOOL_DIR, name))
+        tags = dict(line[2:].split(": ", 1) for line in content.splitlines()
+                    if line.startswith("# ") and ": " in line)
+        video = video_pattern.search(content)
+        jobs.append({"id": int(match.group(2), 16), "queue": match.group(1),
+                     "start": int(match.group(3), 16) * 60,
+                     "title": tags.get("video", ""), "channel": tags.get("channel", ""),
+                     "video": video.group(1) if video else ""})
+    jobs.sort(key=lambda job: (job["start"], job["id"]))
+    return {"timezone": _read_text(TIMEZONE_FILE).strip() or "UTC", "jobs": jobs}
+
+
+def op_schedule(script, time, tz=None):
+    os.chmod(script, 0o755)
+    env = dict(os.environ, TZ=tz) if tz else None
+    result = subprocess.run(["at", "-f", script] + time.split(), env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    match = AT_SUBMITTED.search(result.stderr)
+    if result.returncode != 0 or not match:
+        raise AgentError(result.stderr.strip() or "at failed")
+    return int(match.group(1))
+
+
+def op_run(script):
+    os.chmod(script, 0o755)
+    return _spawn([script])
+
+
+def op_cancel(job_id):
+    result = subprocess.run(["atrm", str(int(job_id))], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        raise AgentError(result.stderr.strip() or "atrm failed")
+    return True
+
+
+def op_add_job(script, channel, start, title="", duration=None, recurrence="", until=None, tz="UTC",
+               force=False):
+    # Stores the start script at `script` to run at `start` (epoch seconds) and, for a recurrence,
+    # every day or week after that up to `until`. Overlapping jobs on the channel are returned;
+    # unless `force` is set they also keep the job from being added ("id" is then None).
+    if recurrence and recurrence not in RECURRENCE_DAYS:
+        raise AgentError(f"Unknown recurrence: {recurrence}")
+    content = _read_text(script, None)
+    if content is None:
+        raise AgentError(f"Cannot read {script}")
+    with closing(_schedule_db()) as db:
+        with db:
+            conflicts = _conflicts(db, channel, int(start), duration, recurrence, until, tz)
+            if conflicts and not force:
+                return {"id": None, "conflicts": conflicts}
+            job_id = db.execute("INSERT INTO jobs (channel, title, script, start, duration, recurrence, until, tz, "
+                                "created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                (channel, title, content, int(start), duration, recurrence, until, tz,
+                                 int(time.time()))).lastrowid
+    _ensure_scheduler()
+    return {"id": job_id, "conflicts": conflicts}
+
+
+def op_jobs(start=None, end=None, channel=None, limit=100, offset=0):
+    # One page of the job store, by next start time, from a single indexed query.
+    # `total` counts every match so the client can page through the rest.
+    where, params = [], []
+    for clause, value in (("start >= ?", start), ("start < ?", end), ("channel = ?", channel)):
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    condition = f" WHERE {' AND '.join(where)}" if where else ""
+    with closing(_schedule_db()) as db:
+        total = db.execute(f"SELECT COUNT(*) FROM jobs{condition}", params).fetchone()[0]
+        rows = db.execute(f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs{condition} ORDER BY start, id "
+                          f"LIMIT ? OFFSET ?", params + [min(int(limit), MAX_PAGE_SIZE), int(offset)]).fetchall()
+    return {"timezone": _read_text(TIMEZONE_FILE).strip() or "UTC", "total": total,
+            "jobs": [dict(zip(JOB_COLUMNS, row)) for row in rows]}
+
+
+def op_remove_job(job_id):
+    with closing(_schedule_db()) as db:
+        with db:
+            if not db.execute("DELETE FROM jobs WHERE id = ?", (int(job_id),)).rowcount:
+                raise AgentError(f"No scheduled job {job_id}")
+    return True
+
+
+def op_page(staged, target):
+    # Puts a staged page and its .gz in place as `target` (see the client's page_deploy.py): each is
+    # hard-linked under a temporary name and renamed over the old one, so viewers never see a partial
+    # page. Names already linked to the staged file are left alone.
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    for suffix in (".gz", ""):
+        source, name = staged + suffix, target + suffix
+        if os.path.exists(name) and os.path.samefile(source, name):
+            continue
+        tmp_path = f"{name}.tmp{os.getpid()}"
+        if os.path.lexists(tmp_path):
+            os.unlink(tmp_path)
+        os.link(source, tmp_path)
+        os.replace(tmp_path, name)
+    return True
+
+
+def op_probe(path, ffprobe="ffprobe", window=30):
+    # Same document as the client's shell probe; successful probes are cached next to the file.
+    cache = os.path.splitext(path)[0] + PROBE_SUFFIX
+    cached = _read_text(cache, None)
+    if cached:
+        return json.loads(cached)
+    result = subprocess.run([ffprobe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams",
+                             "-show_entries", "packet=stream_index,pts_time,flags",
+                             "-read_intervals", f"%+{window}", path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    probe = {"first_atom": _first_atom(path), "ffprobe": None}
+    if result.returncode == 0:
+        probe["ffprobe"] = json.loads(result.stdout)
+        _write_atomic(cache, json.dumps(probe))
+    return probe
+
+
+OPERATIONS = {
+    "ping": op_ping,
+    "status": op_status,
+    "stop": op_stop,
+    "queue": op_queue,
+    "schedule": op_schedule,
+    "run": op_run,
+    "cancel": op_cancel,
+    "add_job": op_add_job,
+    "jobs": op_jobs,
+    "remove_job": op_remove_job,
+    "page": op_page,
+    "probe": op_probe,
+}
+
+
+def handle(line):
+    request_id = None
+    try:
+        request = json.loads(line)
+        request_id = request.get("id")
+        operation = OPERATIONS.get(request.get("op"))
+        if operation is None:
+            raise AgentError(f"Unknown operation: {request.get('op')}")
+        return {"id": request_id, "ok": True, "result": operation(**request.get("args", {}))}
+    except Exception as e:
+        return {"id": request_id, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+# --- Publisher ---
+def _vod_segments(playlists):
+    # Returns (duration, uri, discontinuity) for every segment, in airing order.
+    segments = []
+    for number, playlist in enumerate(playlists):
+        base = f"{VOD_URL}/{os.path.relpath(os.path.dirname(playlist), VOD_DIR)}"
+        duration, first = None, True
+        for line in _read_text(playlist).splitlines():
+            line = line.strip()
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#") and duration is not None:
+                segments.append((duration, f"{base}/{line}", first and number > 0))
+                duration, first = None, False
+    return segments
+
+
+def _live_playlist(segments, first, last, discontinuities, target_duration, ended):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{target_duration}",
+             f"#EXT-X-MEDIA-SEQUENCE:{first}", f"#EXT-X-DISCONTINUITY-SEQUENCE:{discontinuities}"]
+    for duration, uri, discontinuity in segments[first:last]:
+        if discontinuity:
+            lines.append("#EXT-X-DISCONTINUITY")
+        lines += [f"#EXTINF:{duration:.3f},", uri]
+    if ended:
+        lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def _progress_block(elapsed, ended):
+    # Same keys as ffmpeg's `-progress` output, so the client telemetry works unchanged.
+    hours, rest = divmod(elapsed, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return (f"frame=0\nfps=N/A\nbitrate=N/A\ntotal_size=0\n"
+            f"out_time={int(hours):02}:{int(minutes):02}:{seconds:09.6f}\nspeed=1.00x\n"
+            f"drop_frames=0\ndup_frames=0\nprogress={'end' if ended else 'continue'}\n")
+
+
+def publish(key, progress_file, playlists, window=LIVE_WINDOW_SECONDS):
+    # A segment is published once its end time has passed on the wall clock, exactly as
+    # if a live encoder had just finished it; older segments slide out after `window`.
+    segments = _vod_segments(playlists)
+    if not segments:
+        raise AgentError(f"No segments found in {', '.join(playlists)}")
+    target = os.path.join(LIVE_HLS_DIR, f"{key}.m3u8")
+    target_duration = math.ceil(max(duration for duration, _, _ in segments))
+    ends, total = [], 0.0
+    for duration, _, _ in segments:
+        total += duration
+        ends.append(total)
+    started = time.monotonic()
+    with open(progress_file, "a") as progress:
+        while True:
+            elapsed = time.monotonic() - started
+            last = sum(1 for end in ends if end <= elapsed)
+            ended = last == len(segments)
+            first = 0
+            while first < last - 1 and ends[first] <= elapsed - window:
+                first += 1
+            discontinuities = sum(1 for _, _, discontinuity in segments[:first] if discontinuity)
+            if last:
+                _write_atomic(target, _live_playlist(segments, first, last, discontinuities, target_duration, ended))
+            progress.write(_progress_block(min(elapsed, total), ended))
+            progress.flush()
+            if ended:
+                return
+            time.sleep(max(0.1, min(ends[last] - elapsed, 1.0)))
+
+
+# --- Scheduler ---
+def _run_due_jobs():
+    # Starts every due job, moves recurring jobs to their next occurrence and removes the rest.
+    # Returns how long to sleep until the next job is due.
+    now = time.time()
+    with closing(_schedule_db()) as db:
+        with db:
+            for job in db.execute("SELECT id, script, start, recurrence, until, tz FROM jobs WHERE start <= ? "
+                                  "ORDER BY start", (now,)).fetchall():
+                if now - job["start"] <= SCHEDULER_GRACE_SECONDS:
+                    path = os.path.join(SCHEDULER_RUN_DIR, f"job{job['id']}-{job['start']}.sh")
+                    _write_atomic(path, job["script"])
+                    os.chmod(path, 0o755)
+                    _spawn(["/bin/sh", "-c", '"$0"; rm -f "$0"', path])
+                else:
+                    print(f"Skipped job {job['id']}: missed its start by {now - job['start']:.0f} s.",
+                          file=sys.stderr, flush=True)
+                next_start = job["start"]
+                while job["recurrence"] and next_start <= now:
+                    next_start = _next_start(next_start, job["recurrence"], job["tz"])
+                if job["recurrence"] and (job["until"] is None or next_start <= job["until"]):
+                    db.execute("UPDATE jobs SET start = ? WHERE id = ?", (next_start, job["id"]))
+                else:
+                    db.execute("DELETE FROM jobs WHERE id = ?", (job["id"],))
+        next_due = db.execute("SELECT MIN(start) FROM jobs").fetchone()[0]
+    if next_due is None:
+        return SCHEDULER_MAX_SLEEP
+    return max(0.0, min(next_due - time.time(), SCHEDULER_MAX_SLEEP))
+
+
+def run_scheduler():
+    # SIGHUP (sent by the agent after a new job is added) cuts the sleep short. The handler does
+    # nothing itself: the signal is delivered through a wakeup pipe, so it never interrupts a store
+    # update, and one arriving while jobs are started makes the next wait return at once.
+    os.makedirs(SCHEDULER_RUN_DIR, exist_ok=True)
+    _write_atomic(SCHEDULER_PID_FILE, str(os.getpid()))
+    wakeup, wakeup_writer = os.pipe()
+    os.set_blocking(wakeup_writer, False)
+    signal.set_wakeup_fd(wakeup_writer, warn_on_full_buffer=False)
+    signal.signal(signal.SIGHUP, lambda signum, frame: None)
+    while True:
+        delay = _run_due_jobs()
+        if select.select([wakeup], [], [], delay)[0]:
+            os.read(wakeup, 4096)
+
+
+def print_scripts(stdout=sys.stdout):
+    with closing(_schedule_db()) as db:
+        for (script,) in db.execute("SELECT script FROM jobs"):
+            stdout.write(script + "\n")
+
+
+def serve(stdin=sys.stdin, stdout=sys.stdout):
+    for line in stdin:
+        if not line.strip():
+            continue
+        stdout.write(json.dumps(handle(line)) + "\n")
+        stdout.flush()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["publish"]:
+        publish(sys.argv[2], sys.argv[3], sys.argv[4:])
+    elif sys.argv[1:2] == ["scheduler"]:
+        run_scheduler()
+    elif sys.argv[1:2] == ["scripts"]:
+        print_scripts()
+    else:
+        serve()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Parallel SFTP Upload Engine
+# ==============================================================================
+# Splits a local file into fixed-size ranges and writes them concurrently over
+# several SFTP channels with pipelined requests. Completed ranges are recorded
+# in a local journal so an interrupted upload resumes where it stopped, and the
+# finished file is verified against a SHA-256 checksum computed on the server.
+# ==============================================================================
+
+
+import hashlib
+import json
+import os
+import queue
+import threading
+
+UPLOAD_CHUNK_SIZE = 32 * 1024 * 1024
+UPLOAD_WORKERS = 4
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".hlsmanager", "uploads")
+
+
+class UploadError(Exception):
+    pass
+
+
+def file_sha256(path, block_size=UPLOAD_BLOCK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParallelUploader:
+    def __init__(self, session, local_path, remote_path, callback=None,
+                 workers=UPLOAD_WORKERS, chunk_size=UPLOAD_CHUNK_SIZE, local_sha256=None, is_cancelled=None):
+        self.session = session
+        self.is_cancelled = is_cancelled or (lambda: False)
+        self.local_sha256 = local_sha256
+        self.local_path = local_path
+        self.remote_path = remote_path
+        self.callback = callback
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.total_bytes = os.path.getsize(local_path)
+        self.chunk_count = max(1, -(-self.total_bytes // chunk_size))
+        self.bytes_transferred = 0
+        self.lock = threading.Lock()
+        journal_key = hashlib.sha1(f"{os.path.abspath(local_path)}|{remote_path}".encode()).hexdigest()
+        self.journal_path = os.path.join(JOURNAL_DIR, f"{journal_key}.json")
+
+    # --- Journal ---
+    def _load_journal(self):
+        stat = os.stat(self.local_path)
+        fresh = {"local_path": os.path.abspath(self.local_path), "remote_path": self.remote_path,
+                 "size": stat.st_size, "mtime": stat.st_mtime, "chunk_size": self.chunk_size, "done": []}
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            return fresh
+        # A journal is only trusted for the exact same source file and chunk layout.
+        if any(journal.get(k) != fresh[k] for k in ("size", "mtime", "chunk_size", "remote_path")):
+            return fresh
+        return journal
+
+    def _save_journal(self, journal):
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(journal, f)
+        os.replace(tmp_path, self.journal_path)
+
+    def _discard_journal(self):
+        try:
+            os.remove(self.journal_path)
+        except OSError:
+            pass
+
+    # --- Transfer ---
+    def _report(self, nbytes):
+        with self.lock:
+            self.bytes_transferred += nbytes
+            transferred = self.bytes_transferred
+        if self.callback:
+            self.callback(transferred, self.total_bytes)
+
+    def _chunk_range(self, index):
+        offset = index * self.chunk_size
+        return offset, min(self.chunk_size, self.total_bytes - offset)
+
+    def _prepare_remote(self, journal):
+        sftp = self.session.open_sftp()
+        try:
+            if journal["done"]:
+                try:
+                    sftp.stat(self.remote_path)
+                except IOError:
+                    journal["done"] = []
+            if not journal["done"]:
+                sftp.open(self.remote_path, "wb").close()
+        finally:
+            sftp.close()
+
+    def _worker(self, pending, journal, errors):
+        try:
+            sftp = self.session.open_sftp()
+        except Exception as e:
+            errors.append(e)
+            return
+        try:
+            with open(self.local_path, "rb") as local_file:
+                while not errors:
+                    try:
+                        index = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    offset, length = self._chunk_range(index)
+                    local_file.seek(offset)
+                    # Closing a pipelined file waits for every outstanding write to be
+                    # acknowledged, so a range only enters the journal once it is on disk.
+                    with sftp.open(self.remote_path, "r+b") as remote_file:
+                        remote_file.set_pipelined(True)
+                        remote_file.seek(offset)
+                        remaining = length
+                        while remaining > 0:
+                            if self.is_cancelled():
+                                raise UploadError("Upload cancelled. It will resume from the last completed range.")
+                            block = local_file.read(min(UPLOAD_BLOCK_SIZE, remaining))
+                            if not block:
+                                raise UploadError(f"{self.local_path} changed during upload.")
+                            remote_file.write(block)
+                            remaining -= len(block)
+                            self._report(len(block))
+                    with self.lock:
+                        journal["done"].append(index)
+                        self._save_journal(journal)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            sftp.close()
+
+    def _remote_sha256(self):
+        quoted_path = "'" + self.remote_path.replace("'", "'\\''") + "'"
+        out, err = self.session.execute(f"sha256sum {quoted_path}")
+        if not out:
+            raise UploadError(f"Could not checksum remote file: {err}")
+        return out.split()[0]
+
+    def upload(self):
+        journal = self._load_journal()
+        self._prepare_remote(journal)
+        done = set(journal["done"])
+        pending = queue.Queue()
+        for index in range(self.chunk_count):
+            if index in done:
+                self.bytes_transferred += self._chunk_range(index)[1]
+            else:
+                pending.put(index)
+        self._report(0)
+
+        # Unless the caller already hashed the file, the local checksum is computed
+        # while the ranges are being transferred.
+        local_digest = {"value": self.local_sha256}
+        hasher = threading.Thread(target=lambda: local_digest.update(value=file_sha256(self.local_path)),
+                                  daemon=True)
+        if not self.local_sha256: hasher.start()
+        errors = []
+        threads = [threading.Thread(target=self._worker, args=(pending, journal, errors), daemon=True)
+                   for _ in range(min(self.workers, pending.qsize()))]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        if not self.local_sha256: hasher.join()
+        if errors:
+            raise errors[0]
+
+        if self._remote_sha256() != local_digest.get("value"):
+            self._discard_journal()
+            raise UploadError("Checksum mismatch after upload. The transfer will restart from zero next time.")
+        self._discard_journal()
+        return local_digest["value"]
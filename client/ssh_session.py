@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Persistent SSH Session
+# ==============================================================================
+# Wraps a paramiko SSHClient with transport keepalives, a reusable SFTP session,
+# a bounded number of concurrent command channels and transparent reconnection
+# with exponential backoff, so a flaky link no longer ends the client session.
+# ==============================================================================
+
+
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import paramiko
+
+KEEPALIVE_INTERVAL = 15
+MAX_COMMAND_CHANNELS = 6
+RECONNECT_ATTEMPTS = 5
+RECONNECT_BASE_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+CONNECT_TIMEOUT = 10
+
+# A command or SFTP call that fails with one of these lost its transport; any other OSError
+# (a missing remote file, say) is the caller's to handle. Opening a connection can also fail
+# with other socket errors: DNS failures, unreachable hosts.
+TRANSPORT_ERRORS = (paramiko.SSHException, EOFError, ConnectionError, socket.timeout)
+CONNECT_ERRORS = TRANSPORT_ERRORS + (OSError,)
+
+
+class ConnectionLost(Exception):
+    pass
+
+
+class SSHSession:
+    def __init__(self, host, port, username, password, on_state_change=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.on_state_change = on_state_change
+        self.client = None
+        self._sftp = None
+        self._closed = False
+        self._lock = threading.RLock()
+        self._sftp_lock = threading.Lock()
+        # SSH exec channels are single-use, so the pool bounds how many run at once
+        # on the shared transport instead of keeping idle channels around.
+        self._channel_slots = threading.BoundedSemaphore(MAX_COMMAND_CHANNELS)
+
+    def _notify(self, text):
+        if self.on_state_change:
+            self.on_state_change(text)
+
+    def connect(self):
+        with self._lock:
+            self._closed = False
+        self._open()
+
+    def _open(self):
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(self.host, port=self.port, username=self.username, password=self.password,
+                       timeout=CONNECT_TIMEOUT)
+        client.get_transport().set_keepalive(KEEPALIVE_INTERVAL)
+        with self._lock:
+            self.client = client
+            self._sftp = None
+
+    def is_active(self):
+        transport = self.client.get_transport() if self.client else None
+        return bool(transport and transport.is_active())
+
+    def _reconnect(self):
+        # The lock is only held for each attempt, not during the backoff, so close() and
+        # threads that find the session already reconnected are not kept waiting.
+        delay = RECONNECT_BASE_DELAY
+        for attempt in range(1, RECONNECT_ATTEMPTS + 1):
+            with self._lock:
+                if self._closed:
+                    raise ConnectionLost("SSH connection lost: the session was closed.")
+                if self.is_active():
+                    return
+                self._drop()
+                self._notify(f"Connection lost. Reconnecting (attempt {attempt}/{RECONNECT_ATTEMPTS})...")
+                try:
+                    self._open()
+                    self._notify("Reconnected to server.")
+                    return
+                except paramiko.AuthenticationException as e:
+                    raise ConnectionLost(f"Re-authentication failed: {e}")
+                except CONNECT_ERRORS as e:
+                    last_error = e
+            if attempt < RECONNECT_ATTEMPTS:
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        raise ConnectionLost(f"SSH connection lost: {last_error}")
+
+    def _drop(self):
+        try:
+            if self.client: self.client.close()
+        except Exception:
+            pass
+        self.client = None
+        self._sftp = None
+
+    def _ensure_connected(self):
+        if not self.is_active():
+            self._reconnect()
+
+    def execute(self, command, timeout=None):
+        # Runs a command and returns its decoded (stdout, stderr). A transport failure
+        # triggers one reconnect and retry before ConnectionLost is raised.
+        with self._channel_slots:
+            for attempt in range(2):
+                self._ensure_connected()
+                try:
+                    _, stdout, stderr = self.client.exec_command(command, timeout=timeout)
+                    return stdout.read().decode().strip(), stderr.read().decode().strip()
+                except TRANSPORT_ERRORS as e:
+                    if attempt:
+                        raise ConnectionLost(f"SSH connection lost: {e}")
+                    with self._lock:
+                        if not self.is_active(): self._drop()
+
+    def open_sftp(self):
+        # Opens a dedicated SFTP channel, for callers that need several in parallel.
+        self._ensure_connected()
+        try:
+            return self.client.open_sftp()
+        except TRANSPORT_ERRORS:
+            self._reconnect()
+            return self.client.open_sftp()
+
+    def open_channel(self):
+        # Opens a raw session channel for long-lived exchanges such as the remote agent.
+        self._ensure_connected()
+        return self.client.get_transport().open_session()
+
+    @contextmanager
+    def sftp(self):
+        # Yields the shared SFTP session, reopening it if the previous one died.
+        with self._sftp_lock:
+            self._ensure_connected()
+            with self._lock:
+                channel = self._sftp.get_channel() if self._sftp else None
+                if channel is None or channel.closed:
+                    self._sftp = self.open_sftp()
+                sftp = self._sftp
+            try:
+                yield sftp
+            except TRANSPORT_ERRORS:
+                self._sftp = None
+                raise
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._drop()
@@ -3,7 +3,8 @@
 #   HLSManager Desktop Client (Stream Manager GUI)
 # ==============================================================================
 # Graphical interface for managing video streams and scheduling on the server.
-# Built with Tkinter and Paramiko for SSH connectivity.
+# Built with Tkinter on top of the headless engine in hls_core.py, which also
+# powers the command line client (hls_cli.py).
 #
 # Author: Mohammad Akbarpour
 # Version: 1.0 (Final)
@@ -12,161 +13,44 @@
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import paramiko
 import os
 import threading
-from tkcalendar import DateEntry
-from datetime import datetime
-import pytz
-import re
-import queue
-from ttkthemes import ThemedTk
-
-# --- Paths on the server ---
-REMOTE_VIDEO_DIR = "/var/videos"
-REMOTE_PLAYER_HTML_PATH = "/var/www/player/index.html"
-REMOTE_PLAYER_TEMPLATE_PATH = "/var/www/player_template.html"
-REMOTE_IDLE_TEMPLATE_PATH = "/var/www/idle_template.html"
-FFMPEG_PATH = "/usr/bin/ffmpeg"
-
-# --- Default HTML templates ---
-DEFAULT_PLAYER_HTML = """
-<!DOCTYPE html>
-<html lang="fa" dir="rtl">
-<head>
-    <meta charset="UTF-8" />
-    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
-    <title>پخش زنده آنلاین</title>
-    <link href="https://vjs.zencdn.net/8.10.0/video-js.css" rel="stylesheet" />
-    <link rel="preconnect" href="https://fonts.googleapis.com">
-    <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
-    <link href="https://fonts.googleapis.com/css2?family=Vazirmatn:wght@400;700&display=swap" rel="stylesheet">
-    <style>
-        :root {
-            --bg-color: #121212;
-            --text-color: #e0e0e0;
-            --card-bg: #1e1e1e;
-            --header-color: #ffffff;
-            --shadow: 0 8px 30px rgba(0, 0, 0, 0.25);
-        }
-        body {
-            margin: 0;
-            font-family: 'Vazirmatn', sans-serif;
-            background-color: var(--bg-color);
-            color: var(--text-color);
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            min-height: 100vh;
-        }
-        .container {
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            padding: 2vw 4vw;
-            max-width: 1200px;
-            width: 100%;
-            margin: 0 auto;
-        }
-        .class-info {
-            width: 100%;
-            text-align: center;
-            margin-bottom: 30px;
-            padding: 20px;
-            background: var(--card-bg);
-            border-radius: 15px;
-            box-shadow: var(--shadow);
-        }
-        .class-info h1 {
-            font-size: clamp(1.5rem, 4vw, 2.5rem);
-            margin: 0 0 10px;
-            color: var(--header-color);
-        }
-        .class-info .description {
-            font-size: clamp(0.9rem, 2vw, 1.1rem);
-            line-height: 1.7;
-            max-width: 800px;
-            margin: 0 auto;
-            opacity: 0.8;
-        }
-        .video-wrapper {
-            position: relative;
-            width: 100%;
-            max-width: 1000px;
-            aspect-ratio: 16/9;
-            background: #000;
-            border-radius: 15px;
-            overflow: hidden;
-            box-shadow: var(--shadow);
-        }
-        .video-js {
-            width: 100%;
-            height: 100%;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="class-info">
-            <h1>پخش زنده آنلاین</h1>
-            <div class="description">به پخش زنده خوش آمدید. استریم به زودی آغاز خواهد شد.</div>
-        </div>
-        <div class="video-wrapper">
-            <video id="live-video" class="video-js vjs-big-play-centered" controls playsinline></video>
-        </div>
-    </div>
-
-    <script src="https://vjs.zencdn.net/8.10.0/video.min.js"></script>
-    <script>
-        var player = videojs("live-video", {
-            liveui: true,
-            fluid: true,
-            autoplay: true,
-            muted: true
-        });
-
-        player.src({
-            src: "/hls/stream.m3u8",
-            type: "application/x-mpegURL"
-        });
-
-        player.ready(function() {
-            var playPromise = this.play();
-            if (playPromise !== undefined) {
-                playPromise.then(() => {
-                    this.muted(false);
-                    this.volume(1.0);
-                }).catch(error => {
-                    console.log("پخش خودکار توسط مرورگر ممکن نشد. کاربر باید برای شروع روی دکمه پلی کلیک کند.");
-                });
-            }
-        });
-    </script>
-</body>
-</html>
-"""
-DEFAULT_IDLE_HTML = """
-<!DOCTYPE html>
-<html lang="fa" dir="rtl">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>آفلاین</title>
-    <style>
-        body, html { margin: 0; padding: 0; height: 100%; display: flex; justify-content: center; align-items: center; background-color: #1f2937; color: #f9fafb; font-family: sans-serif; text-align: center; }
-        .container { max-width: 600px; padding: 2rem; }
-        h1 { font-size: 2.5rem; margin-bottom: 1rem; }
-        p { font-size: 1.2rem; color: #d1d5db; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>پخش زنده‌ای وجود ندارد</h1>
-        <p>لطفاً بعداً مراجعه کنید.</p>
-    </div>
-</body>
-</html>
-"""
+from datetime import datetime, timedelta
+from task_executor import TaskExecutor, check_cancelled
+from ui_channel import UIChannel
+from telemetry import TelemetryStream
+from keyed_tree import KeyedTree
+from metrics import METRICS, format_value
+from fleet import FleetError, load_inventory
+from hls_core import (Engine, EngineError, ScheduleConflict, ABR_LADDER, DEFAULT_CHANNEL, LATENCY_TARGETS,
+                      ENCODE_PROFILES, LOW_LATENCY_FRAGMENT_SECONDS, QUEUE_PAGE_SIZE, RECURRENCES)
+
+# --- Background tasks ---
+# Tasks listed here are keyed by name: a request while one is already queued or running
+# is absorbed instead of starting another. Values are timeouts in seconds (None = no limit).
+DEDUPLICATED_TASKS = {
+    "refresh_queue": 60,
+    "check_stream_status": 30,
+    "browse_and_upload": None,
+    "start_stream_now": None,
+    "schedule_stream_later": None,
+    "start_playlist_now": None,
+    "schedule_playlist_later": None,
+    "apply_nginx_profile": 180,
+}
+
+# --- Queue polling ---
+# The queue is re-read right after local schedule/cancel actions and shortly after the
+# next job is due. Otherwise the polling interval doubles, up to the maximum, for as long
+# as nothing changes, and drops back to the base interval once something does.
+QUEUE_POLL_MIN = 5
+QUEUE_POLL_BASE = 30
+QUEUE_POLL_MAX = 300
+QUEUE_DUE_MARGIN = 3
+
+# --- Diagnostics ---
+DIAGNOSTICS_REFRESH_MS = 1000
+DEFAULT_PROFILE_THRESHOLD = 2.0
 
 
 class LoginWindow(tk.Toplevel):
@@ -175,28 +59,37 @@ class LoginWindow(tk.Toplevel):
         self.parent = parent
         self.callback = callback
         self.title("Login to Server")
-        self.geometry("350x230")
+        self.geometry("350x265")
         self.resizable(False, False)
         self.transient(parent)
         self.grab_set()
         frame = ttk.Frame(self, padding="20")
         frame.pack(expand=True, fill="both")
-        ttk.Label(frame, text="Server IP:").grid(row=0, column=0, sticky="w", pady=5)
+        # Servers saved with `hls_cli.py fleet add` fill in the fields below.
+        try:
+            self.servers = {server["name"]: server for server in load_inventory()}
+        except FleetError:
+            self.servers = {}
+        ttk.Label(frame, text="Saved server:").grid(row=0, column=0, sticky="w", pady=5)
+        self.saved_combo = ttk.Combobox(frame, values=list(self.servers), state="readonly" if self.servers else "disabled")
+        self.saved_combo.grid(row=0, column=1, sticky="ew")
+        self.saved_combo.bind("<<ComboboxSelected>>", self.fill_saved_server)
+        ttk.Label(frame, text="Server IP:").grid(row=1, column=0, sticky="w", pady=5)
         self.ip_entry = ttk.Entry(frame)
-        self.ip_entry.grid(row=0, column=1, sticky="ew")
-        ttk.Label(frame, text="Port:").grid(row=1, column=0, sticky="w", pady=5)
+        self.ip_entry.grid(row=1, column=1, sticky="ew")
+        ttk.Label(frame, text="Port:").grid(row=2, column=0, sticky="w", pady=5)
         self.port_entry = ttk.Entry(frame)
-        self.port_entry.grid(row=1, column=1, sticky="ew")
+        self.port_entry.grid(row=2, column=1, sticky="ew")
         self.port_entry.insert(0, "22")
-        ttk.Label(frame, text="Username:").grid(row=2, column=0, sticky="w", pady=5)
+        ttk.Label(frame, text="Username:").grid(row=3, column=0, sticky="w", pady=5)
         self.user_entry = ttk.Entry(frame)
-        self.user_entry.grid(row=2, column=1, sticky="ew")
+        self.user_entry.grid(row=3, column=1, sticky="ew")
         self.user_entry.insert(0, "root")
-        ttk.Label(frame, text="Password:").grid(row=3, column=0, sticky="w", pady=5)
+        ttk.Label(frame, text="Password:").grid(row=4, column=0, sticky="w", pady=5)
         self.pass_entry = ttk.Entry(frame, show="*")
-        self.pass_entry.grid(row=3, column=1, sticky="ew")
+        self.pass_entry.grid(row=4, column=1, sticky="ew")
         connect_btn = ttk.Button(frame, text="Connect", command=self.attempt_login)
-        connect_btn.grid(row=4, column=0, columnspan=2, pady=15)
+        connect_btn.grid(row=5, column=0, columnspan=2, pady=15)
         self.ip_entry.focus_set()
         self.bind("<Return>", lambda event: self.attempt_login())
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -204,6 +97,14 @@ class LoginWindow(tk.Toplevel):
     def on_closing(self):
         self.parent.destroy()
 
+    def fill_saved_server(self, event=None):
+        server = self.servers[self.saved_combo.get()]
+        for entry, value in ((self.ip_entry, server["host"]), (self.port_entry, server["port"]),
+                             (self.user_entry, server["user"])):
+            entry.delete(0, tk.END)
+            entry.insert(0, str(value))
+        self.pass_entry.focus_set()
+
     def attempt_login(self):
         ip = self.ip_entry.get().strip()
         port_str = self.port_entry.get().strip()
@@ -228,16 +129,31 @@ class App:
         self.root.title("Stream Manager Pro")
         self.root.geometry("800x750")
 
-        self.ssh_client = None
-        self.local_timezone = pytz.timezone('Asia/Tehran')
-        self.ui_queue = queue.Queue()
+        self.ui_queue = UIChannel(self.root)
+        self.executor = TaskExecutor()
+        METRICS.collect("executor", self.executor.stats)
+        METRICS.collect("ui", self.ui_queue.snapshot_stats)
+        self.engine = Engine(on_status=self.update_status_bar, on_notice=self.show_notice,
+                             on_channel_added=self.on_channel_added)
+        self.telemetry = None
+        self._telemetry_lock = threading.Lock()
+        # The selected channel as last seen by the Tk thread, for code running on other threads.
+        self.selected_key = DEFAULT_CHANNEL
+        self.local_timezone = self.engine.local_timezone
         self.last_uploaded_path = None
-        self.is_stream_live = False
+        self.last_uploaded_name = None
+        self.playlist = []
+        self.queue_offset = 0
+        self.queue_total = 0
+        self.queue_rows = None
+        self.queue_next_start = None
+        self.queue_poll_delay = QUEUE_POLL_BASE
+        self.queue_poll_after = None
 
         self.placeholder_label = ttk.Label(self.root, text="Please wait, loading login screen...", font=("", 14))
         self.placeholder_label.pack(expand=True)
         self.root.after(100, self.open_login_window)
-        self.process_ui_queue()
+        self.ui_queue.start()
 
     def open_login_window(self):
         LoginWindow(self.root, self.handle_login_attempt)
@@ -251,14 +167,10 @@ class App:
 
     def _try_connect(self, ip, port, user, password):
         try:
-            ssh = paramiko.SSHClient()
-            ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            ssh.connect(ip, port=port, username=user, password=password, timeout=10)
-
-            self.ssh_client = ssh
+            self.engine.connect(ip, port, user, password)
             self.ui_queue.put(self.on_login_success)
         except Exception as e:
-            self.ui_queue.put(lambda: self.on_login_failure(e))
+            self.ui_queue.put(lambda error=e: self.on_login_failure(error))
 
     def on_login_success(self):
         self.placeholder_label.destroy()
@@ -273,23 +185,121 @@ class App:
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(pady=10, padx=10, fill="both", expand=True)
         self.create_main_tab()
+        self.create_playlist_tab()
         self.create_queue_tab()
         self.create_settings_tab()
+        self.create_diagnostics_tab()
         self.status_bar = ttk.Label(self.root, text="  Connection successful. Ready.", anchor=tk.W, relief=tk.SUNKEN)
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
         self.run_in_thread(self.check_stream_status)
-        self.auto_refresh_queue()
+        self.poll_queue()
+
+    def create_diagnostics_tab(self):
+        self.diagnostics_tab = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(self.diagnostics_tab, text='  📊 Diagnostics  ')
+        metrics_frame = ttk.LabelFrame(self.diagnostics_tab, text="Operation Timings and Counters", padding="10")
+        metrics_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        cols = ('metric', 'value', 'p50', 'p95', 'p99', 'max')
+        self.metrics_tree = ttk.Treeview(metrics_frame, columns=cols, show='headings')
+        for col, text, width in (('metric', 'Metric', 260), ('value', 'Count / Value', 100), ('p50', 'p50', 80),
+                                 ('p95', 'p95', 80), ('p99', 'p99', 80), ('max', 'Max', 80)):
+            self.metrics_tree.heading(col, text=text)
+            self.metrics_tree.column(col, width=width, anchor=tk.W if col == 'metric' else tk.E)
+        self.metrics_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(metrics_frame, orient="vertical", command=self.metrics_tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill="y")
+        self.metrics_tree.configure(yscrollcommand=scrollbar.set)
+        self.metrics_model = KeyedTree(self.metrics_tree)
+        buttons_frame = ttk.Frame(self.diagnostics_tab)
+        buttons_frame.pack(fill=tk.X, pady=5)
+        ttk.Button(buttons_frame, text="💾 Export...", command=self.export_metrics).pack(side=tk.RIGHT)
+        ttk.Button(buttons_frame, text="♻️ Reset", command=METRICS.reset).pack(side=tk.RIGHT, padx=10)
+        self.profile_var = tk.BooleanVar(value=METRICS.profile_threshold is not None)
+        ttk.Checkbutton(buttons_frame, text="Profile operations slower than", variable=self.profile_var,
+                        command=self.toggle_profiling).pack(side=tk.LEFT)
+        self.profile_spinbox = ttk.Spinbox(buttons_frame, from_=0.1, to=600, increment=0.5, width=5,
+                                           command=self.toggle_profiling)
+        self.profile_spinbox.set(METRICS.profile_threshold or DEFAULT_PROFILE_THRESHOLD)
+        self.profile_spinbox.pack(side=tk.LEFT, padx=5)
+        ttk.Label(buttons_frame, text="s").pack(side=tk.LEFT)
+        self.profile_label = ttk.Label(self.diagnostics_tab, text="")
+        self.profile_label.pack(fill=tk.X)
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        # Runs on the Tk thread once a second; the table is only rebuilt while its tab is shown.
+        if self.notebook.select() == str(self.diagnostics_tab):
+            rows = []
+            for entry in METRICS.snapshot():
+                name = entry["name"]
+                label = name + "".join(f" {key}={value}" for key, value in sorted(entry["labels"].items()))
+                if entry["type"] == "gauge":
+                    values = (label, format_value(name, entry["value"]), "", "", "", "")
+                else:
+                    values = (label, entry["count"], *(format_value(name, entry[key]) for key in ("p50", "p95", "p99")),
+                              format_value(name, entry["max"]))
+                rows.append((label, values))
+            self.metrics_model.sync(rows)
+            if METRICS.last_profile:
+                self.profile_label.config(text=f"Last profile: {METRICS.last_profile}")
+        self.root.after(DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics)
+
+    def toggle_profiling(self):
+        if not self.profile_var.get():
+            METRICS.disable_profiling()
+            return
+        try:
+            METRICS.enable_profiling(float(self.profile_spinbox.get()))
+        except ValueError:
+            messagebox.showerror("Invalid Threshold", "The profiling threshold must be a number of seconds.")
+            self.profile_var.set(False)
+            return
+        self.profile_label.config(text=f"Slow operations are profiled to {METRICS.profile_dir}")
+
+    def export_metrics(self):
+        path = filedialog.asksaveasfilename(title="Export metrics", defaultextension=".prom",
+                                            filetypes=(("Prometheus text", "*.prom"), ("JSON lines", "*.jsonl")))
+        if not path: return
+        try:
+            METRICS.export(path)
+        except OSError as e:
+            messagebox.showerror("Export Failed", str(e))
+            return
+        self.update_status_bar(f"✅ Metrics exported to {path}")
 
     def update_status_bar(self, text):
-        self.ui_queue.put(lambda: self.status_bar.config(text=f"  {text}"))
+        self.ui_queue.configure(self.status_bar, text=f"  {text}")
 
     def create_main_tab(self):
         main_tab = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(main_tab, text='  ▶️ Main Control & Scheduling  ')
         status_frame = ttk.LabelFrame(main_tab, text="Status & Control", padding="10")
         status_frame.pack(fill=tk.X, pady=5)
+        channel_frame = ttk.Frame(status_frame)
+        channel_frame.pack(fill=tk.X)
+        ttk.Label(channel_frame, text="Channel (stream key):").pack(side=tk.LEFT, padx=5)
+        self.channel_combo = ttk.Combobox(channel_frame, values=sorted(self.engine.channels), width=20)
+        self.channel_combo.set(DEFAULT_CHANNEL)
+        self.channel_combo.bind("<<ComboboxSelected>>", lambda event: self.on_channel_selected())
+        self.channel_combo.bind("<FocusOut>", lambda event: self.on_channel_selected())
+        self.channel_combo.pack(side=tk.LEFT)
+        self.abr_var = tk.BooleanVar(value=False)
+        ladder = "/".join(rung["name"] for rung in ABR_LADDER)
+        ttk.Checkbutton(channel_frame, text=f"Adaptive bitrate ({ladder})", variable=self.abr_var).pack(
+            side=tk.LEFT, padx=10)
+        self.low_latency_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(channel_frame, text=f"Low latency ({LOW_LATENCY_FRAGMENT_SECONDS} s fragments)",
+                        variable=self.low_latency_var).pack(side=tk.LEFT)
+        ttk.Label(channel_frame, text="Repeat:").pack(side=tk.LEFT, padx=(10, 5))
+        self.repeat_combo = ttk.Combobox(channel_frame, values=("once",) + RECURRENCES, state="readonly", width=7)
+        self.repeat_combo.set("once")
+        self.repeat_combo.pack(side=tk.LEFT)
+        self.live_channels_label = ttk.Label(channel_frame, text="")
+        self.live_channels_label.pack(side=tk.RIGHT, padx=5)
         self.status_label = ttk.Label(status_frame, text="Connecting...", font=("", 12))
         self.status_label.pack(pady=5)
+        self.telemetry_label = ttk.Label(status_frame, text="", font=("", 10))
+        self.telemetry_label.pack()
         control_buttons_frame = ttk.Frame(status_frame)
         control_buttons_frame.pack(pady=5, fill=tk.X)
         self.check_btn = ttk.Button(control_buttons_frame, text="🔄 Check Status",
@@ -305,6 +315,14 @@ class App:
         self.upload_btn = ttk.Button(upload_frame, text="📂 Browse & Upload",
                                      command=lambda: self.run_in_thread(self.browse_and_upload))
         self.upload_btn.pack(side=tk.RIGHT)
+        ttk.Button(upload_frame, text="✖ Cancel",
+                   command=lambda: self.executor.cancel("browse_and_upload")).pack(side=tk.RIGHT, padx=5)
+        self.encode_profile_combo = ttk.Combobox(upload_frame, values=ENCODE_PROFILES, state="readonly", width=6)
+        self.encode_profile_combo.set(ENCODE_PROFILES[0])
+        self.encode_profile_combo.pack(side=tk.RIGHT, padx=(0, 10))
+        self.encode_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(upload_frame, text="Encode locally while uploading:", variable=self.encode_var).pack(
+            side=tk.RIGHT)
         self.upload_progress = ttk.Progressbar(main_tab, orient="horizontal", length=100, mode="determinate")
         self.upload_progress.pack(fill=tk.X, padx=10, pady=(0, 10))
         action_frame = ttk.LabelFrame(main_tab, text="2. Choose Action (for last uploaded video)", padding="10")
@@ -312,51 +330,111 @@ class App:
         self.start_now_btn = ttk.Button(action_frame, text="🚀 Start Streaming NOW", state=tk.DISABLED,
                                         command=lambda: self.run_in_thread(self.start_stream_now))
         self.start_now_btn.pack(pady=5, fill=tk.X)
+        self.add_to_playlist_btn = ttk.Button(action_frame, text="➕ Add to Playlist", state=tk.DISABLED,
+                                              command=self.add_to_playlist)
+        self.add_to_playlist_btn.pack(pady=5, fill=tk.X)
         schedule_subframe = ttk.Frame(action_frame)
         schedule_subframe.pack(fill=tk.X, pady=10)
         time_frame = ttk.Frame(schedule_subframe)
         time_frame.pack(fill=tk.X)
-        tehran_now = datetime.now(self.local_timezone)
-        self.minute_spinbox = ttk.Spinbox(time_frame, from_=0, to=59, width=3, format="%02.0f")
-        self.minute_spinbox.set(f"{tehran_now.minute:02}")
-        self.minute_spinbox.pack(side=tk.RIGHT)
-        ttk.Label(time_frame, text=":").pack(side=tk.RIGHT)
-        self.hour_spinbox = ttk.Spinbox(time_frame, from_=0, to=23, width=3, format="%02.0f")
-        self.hour_spinbox.set(f"{tehran_now.hour:02}")
-        self.hour_spinbox.pack(side=tk.RIGHT)
-        ttk.Label(time_frame, text="Time (Tehran):").pack(side=tk.RIGHT, padx=(0, 5))
-        self.date_entry = DateEntry(time_frame, width=12, background='darkblue', foreground='white', borderwidth=2,
-                                    date_pattern='yyyy-mm-dd')
-        self.date_entry.set_date(tehran_now)
-        self.date_entry.pack(side=tk.RIGHT, padx=10)
+        self.date_entry, self.hour_spinbox, self.minute_spinbox = self.build_time_picker(time_frame)
         self.schedule_btn = ttk.Button(schedule_subframe, text="⏰ Schedule for Later", state=tk.DISABLED,
                                        command=lambda: self.run_in_thread(self.schedule_stream_later))
         self.schedule_btn.pack(pady=5, fill=tk.X)
 
+    def build_time_picker(self, parent, on_change=None):
+        # Packs a Tehran date/hour/minute picker into `parent`, initialised to the current time.
+        from tkcalendar import DateEntry  # only needed once the main window is built
+        tehran_now = datetime.now(self.local_timezone)
+        minute_spinbox = ttk.Spinbox(parent, from_=0, to=59, width=3, format="%02.0f", command=on_change)
+        minute_spinbox.set(f"{tehran_now.minute:02}")
+        minute_spinbox.pack(side=tk.RIGHT)
+        ttk.Label(parent, text=":").pack(side=tk.RIGHT)
+        hour_spinbox = ttk.Spinbox(parent, from_=0, to=23, width=3, format="%02.0f", command=on_change)
+        hour_spinbox.set(f"{tehran_now.hour:02}")
+        hour_spinbox.pack(side=tk.RIGHT)
+        ttk.Label(parent, text="Time (Tehran):").pack(side=tk.RIGHT, padx=(0, 5))
+        date_entry = DateEntry(parent, width=12, background='darkblue', foreground='white', borderwidth=2,
+                               date_pattern='yyyy-mm-dd')
+        date_entry.set_date(tehran_now)
+        date_entry.pack(side=tk.RIGHT, padx=10)
+        if on_change:
+            date_entry.bind("<<DateEntrySelected>>", lambda event: on_change())
+            for spinbox in (hour_spinbox, minute_spinbox):
+                spinbox.bind("<FocusOut>", lambda event: on_change())
+        return date_entry, hour_spinbox, minute_spinbox
+
+    def create_playlist_tab(self):
+        playlist_tab = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(playlist_tab, text='  📼 Playlist  ')
+        rundown_frame = ttk.LabelFrame(playlist_tab, text="Rundown (played gaplessly on the selected channel)",
+                                       padding="10")
+        rundown_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        cols = ('position', 'start_time', 'duration', 'video')
+        self.playlist_tree = ttk.Treeview(rundown_frame, columns=cols, show='headings')
+        self.playlist_tree.heading('position', text='#')
+        self.playlist_tree.heading('start_time', text='Starts (Tehran)')
+        self.playlist_tree.heading('duration', text='Duration')
+        self.playlist_tree.heading('video', text='Video File')
+        self.playlist_tree.column('position', width=40, anchor=tk.CENTER)
+        self.playlist_tree.column('start_time', width=200)
+        self.playlist_tree.column('duration', width=90, anchor=tk.CENTER)
+        self.playlist_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(rundown_frame, orient="vertical", command=self.playlist_tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill="y")
+        self.playlist_tree.configure(yscrollcommand=scrollbar.set)
+        edit_frame = ttk.Frame(playlist_tab)
+        edit_frame.pack(fill=tk.X, pady=5)
+        self.playlist_total_label = ttk.Label(edit_frame, text="Playlist is empty.")
+        self.playlist_total_label.pack(side=tk.LEFT, padx=5)
+        ttk.Button(edit_frame, text="🧹 Clear", command=self.clear_playlist).pack(side=tk.RIGHT)
+        ttk.Button(edit_frame, text="✖ Remove", command=self.remove_playlist_item).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(edit_frame, text="▼ Down", command=lambda: self.move_playlist_item(1)).pack(side=tk.RIGHT)
+        ttk.Button(edit_frame, text="▲ Up", command=lambda: self.move_playlist_item(-1)).pack(side=tk.RIGHT, padx=5)
+        action_frame = ttk.LabelFrame(playlist_tab, text="Play Out", padding="10")
+        action_frame.pack(fill=tk.X, pady=5)
+        ttk.Button(action_frame, text="🚀 Play Playlist NOW",
+                   command=lambda: self.run_in_thread(self.start_playlist_now)).pack(pady=5, fill=tk.X)
+        time_frame = ttk.Frame(action_frame)
+        time_frame.pack(fill=tk.X, pady=5)
+        self.playlist_date_entry, self.playlist_hour_spinbox, self.playlist_minute_spinbox = \
+            self.build_time_picker(time_frame, on_change=self.update_rundown)
+        ttk.Button(action_frame, text="⏰ Schedule Playlist",
+                   command=lambda: self.run_in_thread(self.schedule_playlist_later)).pack(pady=5, fill=tk.X)
+
     def create_queue_tab(self):
         queue_tab = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(queue_tab, text='  🕒 Schedule Queue  ')
         queue_frame = ttk.LabelFrame(queue_tab, text="Scheduled Stream Queue", padding="10")
         queue_frame.pack(fill=tk.BOTH, expand=True, pady=5)
-        cols = ('job_id', 'server_time', 'tehran_time', 'video')
+        cols = ('job_id', 'server_time', 'tehran_time', 'video', 'channel', 'repeat')
         self.queue_tree = ttk.Treeview(queue_frame, columns=cols, show='headings')
         self.queue_tree.heading('job_id', text='Job ID')
         self.queue_tree.heading('server_time', text='Scheduled Time (Server)')
         self.queue_tree.heading('tehran_time', text='Scheduled Time (Tehran)')
         self.queue_tree.heading('video', text='Video File')
+        self.queue_tree.heading('channel', text='Channel')
+        self.queue_tree.heading('repeat', text='Repeats')
         self.queue_tree.column('job_id', width=60, anchor=tk.CENTER)
+        self.queue_tree.column('channel', width=90, anchor=tk.CENTER)
+        self.queue_tree.column('repeat', width=70, anchor=tk.CENTER)
         self.queue_tree.column('server_time', width=200)
         self.queue_tree.column('tehran_time', width=200)
         self.queue_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar = ttk.Scrollbar(queue_frame, orient="vertical", command=self.queue_tree.yview)
         scrollbar.pack(side=tk.RIGHT, fill="y")
         self.queue_tree.configure(yscrollcommand=scrollbar.set)
+        self.queue_model = KeyedTree(self.queue_tree)
         queue_buttons_frame = ttk.Frame(queue_tab)
         queue_buttons_frame.pack(fill=tk.X, pady=5)
         ttk.Button(queue_buttons_frame, text="🔄 Refresh Now",
                    command=lambda: self.run_in_thread(self.refresh_queue)).pack(side=tk.RIGHT)
         ttk.Button(queue_buttons_frame, text="🗑️ Cancel Selected Job", command=self.cancel_selected_job).pack(
             side=tk.RIGHT, padx=10)
+        ttk.Button(queue_buttons_frame, text="◀ Previous", command=lambda: self.page_queue(-1)).pack(side=tk.LEFT)
+        ttk.Button(queue_buttons_frame, text="Next ▶", command=lambda: self.page_queue(1)).pack(side=tk.LEFT, padx=5)
+        self.queue_page_label = ttk.Label(queue_buttons_frame, text="")
+        self.queue_page_label.pack(side=tk.LEFT, padx=5)
 
     def create_settings_tab(self):
         settings_tab = ttk.Frame(self.notebook, padding="10")
@@ -377,171 +455,343 @@ class App:
             side=tk.RIGHT, padx=5)
         ttk.Button(player_frame, text="💾 Set as Player Page",
                    command=lambda: self.run_in_thread(self.set_template_page, 'player')).pack(side=tk.RIGHT)
-
-    def process_ui_queue(self):
+        library_frame = ttk.LabelFrame(settings_tab, text="Server Video Library", padding="10")
+        library_frame.pack(fill=tk.X, pady=10)
+        ttk.Label(library_frame, text="Disk quota (GB):").pack(side=tk.LEFT, padx=5)
+        self.quota_spinbox = ttk.Spinbox(library_frame, from_=1, to=100000, width=8,
+                                         command=self.update_library_quota)
+        self.quota_spinbox.set(self.engine.library_quota_gb)
+        self.quota_spinbox.bind("<FocusOut>", lambda event: self.update_library_quota())
+        self.quota_spinbox.pack(side=tk.LEFT)
+        ttk.Label(library_frame, text="Least-recently-streamed videos are removed beyond this size.").pack(
+            side=tk.LEFT, padx=10)
+        tuning_frame = ttk.LabelFrame(settings_tab, text="Server Tuning (nginx profile)", padding="10")
+        tuning_frame.pack(fill=tk.X, pady=10)
+        ttk.Label(tuning_frame, text="Viewers:").pack(side=tk.LEFT, padx=5)
+        self.viewers_spinbox = ttk.Spinbox(tuning_frame, from_=1, to=1000000, increment=100, width=8)
+        self.viewers_spinbox.set(1000)
+        self.viewers_spinbox.pack(side=tk.LEFT)
+        ttk.Label(tuning_frame, text="Latency:").pack(side=tk.LEFT, padx=5)
+        self.latency_combo = ttk.Combobox(tuning_frame, values=LATENCY_TARGETS, state="readonly", width=9)
+        self.latency_combo.set(LATENCY_TARGETS[0])
+        self.latency_combo.pack(side=tk.LEFT)
+        ttk.Label(tuning_frame, text="RAM (MB):").pack(side=tk.LEFT, padx=5)
+        self.ram_spinbox = ttk.Spinbox(tuning_frame, from_=16, to=1048576, increment=128, width=8)
+        self.ram_spinbox.set(512)
+        self.ram_spinbox.pack(side=tk.LEFT)
+        ttk.Button(tuning_frame, text="🛠️ Apply Profile",
+                   command=lambda: self.run_in_thread(self.apply_nginx_profile)).pack(side=tk.RIGHT)
+
+    def show_notice(self, level, title, message):
+        show = {"info": messagebox.showinfo, "warning": messagebox.showwarning, "error": messagebox.showerror}[level]
+        self.ui_queue.put(lambda: show(title, message))
+
+    def selected_channel(self):
+        return self.engine.get_channel(self.channel_combo.get().strip() or DEFAULT_CHANNEL)
+
+    def on_channel_added(self, channel):
+        if not hasattr(self, 'channel_combo'): return
+        self.ui_queue.configure(self.channel_combo, values=sorted(self.engine.channels))
+        self.start_telemetry()
+
+    def on_channel_selected(self):
         try:
-            while True:
-                self.ui_queue.get_nowait()()
-        except queue.Empty:
-            pass
-        self.root.after(100, self.process_ui_queue)
+            self.selected_channel()
+        except ValueError as e:
+            messagebox.showerror("Invalid Channel", str(e))
+            self.channel_combo.set(DEFAULT_CHANNEL)
+        self.selected_key = self.channel_combo.get().strip() or DEFAULT_CHANNEL
+        self.show_channel_status(self.selected_key)
+
+    def show_channel_status(self, key):
+        live_channels = self.engine.live_channels
+        is_live = key in live_channels
+        status_text = f"✅ '{key}' is LIVE" if is_live else f"❌ No stream is currently playing on '{key}'."
+        self.ui_queue.configure(self.status_label, text=status_text, foreground="green" if is_live else "red")
+        self.ui_queue.configure(self.stop_btn, state=tk.NORMAL if is_live else tk.DISABLED)
+        live_text = f"Live: {', '.join(sorted(live_channels))}" if live_channels else "No live channels"
+        self.ui_queue.configure(self.live_channels_label, text=live_text)
+        if not is_live:
+            self.ui_queue.configure(self.telemetry_label, text="", foreground="")
 
     def run_in_thread(self, target_func, *args):
-        threading.Thread(target=target_func, args=args, daemon=True).start()
-
-    def execute_command(self, command):
-        try:
-            if not self.ssh_client or not self.ssh_client.get_transport().is_active():
-                raise Exception("SSH connection lost.")
-            stdin, stdout, stderr = self.ssh_client.exec_command(command)
-            err_output = stderr.read().decode().strip()
-            if err_output:
-                if "not found" not in err_output.lower():
-                    print(f"SSH Command Error: {err_output}")
-            return stdout.read().decode().strip(), err_output
-        except Exception as e:
-            self.ui_queue.put(
-                lambda: messagebox.showerror("Connection Error", f"An error occurred: {e}\nPlease log in again."))
-            self.ui_queue.put(self.root.destroy)
-            return "", str(e)
+        name = getattr(target_func, "__name__", None)
+        if name in DEDUPLICATED_TASKS:
+            return self.executor.submit(target_func, *args, key=name, timeout=DEDUPLICATED_TASKS[name])
+        return self.executor.submit(target_func, *args)
 
     def check_stream_status(self):
-        self.ui_queue.put(lambda: self.status_label.config(text="Checking status..."))
-        command = "ps aux | grep '[f]fmpeg.*rtmp://localhost/live/stream'"
-        out, err = self.execute_command(command)
-        if "SSH connection lost" in err: return
-        self.is_stream_live = bool(out)
-        status_text = "✅ Stream is LIVE" if self.is_stream_live else "❌ No stream is currently playing."
-        color = "green" if self.is_stream_live else "red"
-        self.ui_queue.put(lambda: self.status_label.config(text=status_text, foreground=color))
-        self.ui_queue.put(lambda: self.stop_btn.config(state=tk.NORMAL if self.is_stream_live else tk.DISABLED))
+        self.ui_queue.configure(self.status_label, text="Checking status...")
+        if self.engine.scan_live_channels() is None: return
+        self.show_channel_status(self.selected_key)
+        self.start_telemetry()
+
+    def start_telemetry(self):
+        # The subscription follows the progress file across streams, so it is kept open for
+        # the whole session and only re-created after the channel dies (e.g. on reconnect).
+        # Adding a channel restarts it so the new progress file is followed too. Callers on
+        # different threads take turns, so the old tail is always closed before a new one opens.
+        with self._telemetry_lock:
+            files = {channel.progress_file: key for key, channel in list(self.engine.channels.items())}
+            if self.telemetry and self.telemetry.is_running() and self.telemetry.files == files: return
+            if self.telemetry: self.telemetry.stop()
+            self.telemetry = TelemetryStream(self.engine.session, files, self.on_telemetry)
+            try:
+                self.telemetry.start()
+            except Exception as e:
+                print(f"Could not subscribe to stream telemetry: {e}")
+
+    def on_telemetry(self, key, sample):
+        # Runs on the telemetry reader thread, so no widget is read here: the selected channel
+        # comes from selected_key, which the Tk thread keeps up to date.
+        selected_key = self.selected_key
+        live_channels = self.engine.live_channels
+        if sample["ended"]:
+            live_channels.discard(key)
+            self.show_channel_status(selected_key)
+            return
+        if key not in live_channels:
+            live_channels.add(key)
+            self.show_channel_status(selected_key)
+        if key != selected_key: return
+        fmt = lambda value, spec: "N/A" if value is None else format(value, spec)
+        text = (f"{fmt(sample['fps'], '.1f')} fps  |  {fmt(sample['bitrate_kbps'], '.0f')} kbit/s  |  "
+                f"speed {fmt(sample['speed'], '.2f')}x  |  {sample['out_time']}  |  "
+                f"dropped {sample['drop_frames']} / duplicated {sample['dup_frames']}")
+        if sample["falling_behind"]:
+            self.ui_queue.configure(self.telemetry_label, text=f"⚠️ Falling behind real time  |  {text}",
+                                    foreground="orange")
+        else:
+            self.ui_queue.configure(self.telemetry_label, text=text, foreground="")
 
     def stop_stream(self):
-        if messagebox.askyesno("Confirm Hard Stop", "This will kill the stream instantly. Are you sure?"):
-            command = f"pkill -9 -f '{FFMPEG_PATH}.*rtmp://localhost/live/stream'"
-            self.execute_command(command)
-            idle_script = f"if [ -f {REMOTE_IDLE_TEMPLATE_PATH} ]; then cp {REMOTE_IDLE_TEMPLATE_PATH} {REMOTE_PLAYER_HTML_PATH}; else echo '{DEFAULT_IDLE_HTML}' > {REMOTE_PLAYER_HTML_PATH}; fi"
-            self.execute_command(idle_script)
+        channel = self.selected_channel()
+        if messagebox.askyesno("Confirm Hard Stop",
+                               f"This will kill the stream on '{channel.key}' instantly. Are you sure?"):
+            self.engine.stop_stream(channel)
+            self.ui_queue.configure(self.telemetry_label, text="", foreground="")
             self.check_stream_status()
-            self.update_status_bar("Stream stopped successfully.")
+            self.update_status_bar(f"Stream on '{channel.key}' stopped successfully.")
 
     def browse_and_upload(self):
         filepath = filedialog.askopenfilename(filetypes=[("Video Files", "*.mp4 *.mkv")])
         if not filepath: return
         filename = os.path.basename(filepath)
-        remote_path = f'"{REMOTE_VIDEO_DIR}/{filename}"'
-        self.ui_queue.put(lambda: self.file_path_label.config(text=filepath))
-        self.ui_queue.put(lambda: self.upload_progress.config(value=0))
+        self.ui_queue.configure(self.file_path_label, text=filepath)
+        self.ui_queue.configure(self.upload_progress, value=0)
 
         def progress_callback(bytes_transferred, total_bytes):
             percentage = (bytes_transferred / total_bytes) * 100
-            self.ui_queue.put(lambda: self.upload_progress.config(value=percentage))
+            self.ui_queue.configure(self.upload_progress, value=percentage)
             self.update_status_bar(f"Uploading {filename}... {int(percentage)}%")
 
+        def encode_progress(encoded_seconds, duration, encode_speed, bytes_uploaded, upload_rate):
+            percentage = min(100.0, encoded_seconds / duration * 100) if duration else 0
+            self.ui_queue.configure(self.upload_progress, value=percentage)
+            self.update_status_bar(f"Encoding {filename} at {encode_speed:.1f}x, uploaded "
+                                   f"{bytes_uploaded / 1024 ** 2:.0f} MB at {upload_rate / 1024 ** 2:.1f} MB/s... "
+                                   f"{int(percentage)}%")
+
         try:
-            sftp = self.ssh_client.open_sftp()
-            sftp.put(filepath, remote_path.strip('"'), callback=progress_callback)
-            sftp.close()
-            self.last_uploaded_path = remote_path
-            self.update_status_bar(f"✅ Upload of '{filename}' complete. Ready for action.")
-            self.ui_queue.put(lambda: self.start_now_btn.config(state=tk.NORMAL))
-            self.ui_queue.put(lambda: self.schedule_btn.config(state=tk.NORMAL))
+            if self.encode_var.get():
+                library_path = self.engine.upload_encoded(filepath, self.encode_profile_combo.get(), encode_progress)
+            else:
+                library_path = self.engine.upload(filepath, progress_callback)
+            self.engine.prepare_video(library_path, filename)
+            self.last_uploaded_path = library_path
+            self.last_uploaded_name = filename
+            self.ui_queue.configure(self.start_now_btn, state=tk.NORMAL)
+            self.ui_queue.configure(self.schedule_btn, state=tk.NORMAL)
+            self.ui_queue.configure(self.add_to_playlist_btn, state=tk.NORMAL)
         except Exception as e:
             messagebox.showerror("Upload Error", str(e))
             self.update_status_bar(f"❌ Upload Error: {e}")
 
-    def _start_or_schedule(self, remote_path, schedule_time_str=None, tehran_time_str=None):
-        remote_script_path = "/root/stream_starter.sh"
-        log_file = "/tmp/ffmpeg.log"
-        player_setup_cmd = f"if [ -f {REMOTE_PLAYER_TEMPLATE_PATH} ]; then cp {REMOTE_PLAYER_TEMPLATE_PATH} {REMOTE_PLAYER_HTML_PATH}; else echo '{DEFAULT_PLAYER_HTML}' > {REMOTE_PLAYER_HTML_PATH}; fi"
-        idle_setup_cmd = f"if [ -f {REMOTE_IDLE_TEMPLATE_PATH} ]; then cp {REMOTE_IDLE_TEMPLATE_PATH} {REMOTE_PLAYER_HTML_PATH}; else echo '{DEFAULT_IDLE_HTML}' > {REMOTE_PLAYER_HTML_PATH}; fi"
-        script_content = f"""#!/bin/bash
-echo "--- Stream script started at $(date) ---" > {log_file}
-{player_setup_cmd}
-echo "--- Starting ffmpeg... ---" >> {log_file}
-{FFMPEG_PATH} -re -i {remote_path} -c:v copy -c:a copy -f flv rtmp://localhost/live/stream >> {log_file} 2>&1
-FFMPEG_EXIT_CODE=$?
-echo "--- ffmpeg finished with code: $FFMPEG_EXIT_CODE ---" >> {log_file}
-{idle_setup_cmd}
-rm {remote_path}
-echo "--- Cleanup complete. ---" >> {log_file}
-"""
-        with self.ssh_client.open_sftp().file(remote_script_path, 'w') as f:
-            f.write(script_content)
-        self.execute_command(f"chmod +x {remote_script_path}")
-        if schedule_time_str:
-            server_tz, _ = self.execute_command("cat /etc/timezone")
-            if not server_tz: server_tz = "UTC"
-            self.execute_command(f"TZ={server_tz.strip()} at -f {remote_script_path} {schedule_time_str}")
-            msg = f"Stream scheduled successfully for {tehran_time_str} (Tehran Time)."
-            self.ui_queue.put(lambda: messagebox.showinfo("Scheduling Successful", msg))
-            self.update_status_bar(f"⏰ {msg}")
-            self.run_in_thread(self.refresh_queue)
-        else:
-            self.execute_command(f"nohup {remote_script_path} &")
-            msg = "Stream sent to server. It should be live in a few seconds."
-            self.ui_queue.put(lambda: messagebox.showinfo("Stream Started", msg))
-            self.update_status_bar(f"🚀 {msg}")
+    def ask(self, title, message):
+        # Yes/no question from a background task: asked on the UI thread, answer awaited here.
+        answer, answered = [], threading.Event()
+        self.ui_queue.put(lambda: (answer.append(messagebox.askyesno(title, message)), answered.set()))
+        answered.wait()
+        return answer[0]
+
+    def selected_repeat(self):
+        repeat = self.repeat_combo.get()
+        return repeat if repeat in RECURRENCES else ""
+
+    def _schedule(self, submit, *args):
+        # Runs an engine start/schedule call. When the job overlaps others on its channel, the
+        # user can schedule it anyway. Returns whether the job was submitted.
+        try:
+            try:
+                submit(*args)
+            except ScheduleConflict as e:
+                if not self.ask("Schedule Conflict", f"{e}\n\nSchedule it anyway?"): return False
+                submit(*args, force=True)
+        except EngineError as e:
+            self.show_notice("error", "Scheduling Error", str(e))
+            self.update_status_bar(f"❌ {e}")
+            return False
+        return True
+
+    def _start_or_schedule(self, channel, video, local_dt=None, abr=False, low_latency=False, repeat=""):
+        if not self._schedule(self.engine.start_or_schedule, channel, video, self.last_uploaded_name, local_dt, abr,
+                              low_latency, repeat): return
+        if local_dt: self.request_queue_refresh()
         self.last_uploaded_path = None
-        self.ui_queue.put(lambda: self.start_now_btn.config(state=tk.DISABLED))
-        self.ui_queue.put(lambda: self.schedule_btn.config(state=tk.DISABLED))
+        self.ui_queue.configure(self.start_now_btn, state=tk.DISABLED)
+        self.ui_queue.configure(self.schedule_btn, state=tk.DISABLED)
+        self.ui_queue.configure(self.add_to_playlist_btn, state=tk.DISABLED)
 
     def start_stream_now(self):
         if not self.last_uploaded_path: messagebox.showwarning("Error", "Please upload a video first."); return
-        self.run_in_thread(self._start_or_schedule, self.last_uploaded_path)
+        self.run_in_thread(self._start_or_schedule, self.selected_channel(), self.last_uploaded_path, None,
+                           self.abr_var.get(), self.low_latency_var.get())
+
+    def picked_time(self, date_entry, hour_spinbox, minute_spinbox):
+        naive_dt = datetime.combine(date_entry.get_date(), datetime.min.time()).replace(
+            hour=int(hour_spinbox.get()), minute=int(minute_spinbox.get()))
+        return self.engine.local_time(naive_dt)
 
     def schedule_stream_later(self):
         if not self.last_uploaded_path: messagebox.showwarning("Error", "Please upload a video first."); return
-        hour, minute, gregorian_date = self.hour_spinbox.get(), self.minute_spinbox.get(), self.date_entry.get_date()
-        server_tz_str, _ = self.execute_command("cat /etc/timezone")
-        if not server_tz_str: server_tz_str = "UTC"
-        naive_dt = datetime.combine(gregorian_date, datetime.min.time()).replace(hour=int(hour), minute=int(minute))
-        local_dt = self.local_timezone.localize(naive_dt)
-        server_tz = pytz.timezone(server_tz_str.strip())
-        server_dt = local_dt.astimezone(server_tz)
-        schedule_time_str = server_dt.strftime('%H:%M %Y-%m-%d')
-        tehran_time_str = local_dt.strftime('%H:%M on %Y-%m-%d')
-        self._start_or_schedule(self.last_uploaded_path, schedule_time_str, tehran_time_str)
-
-    def auto_refresh_queue(self):
+        local_dt = self.picked_time(self.date_entry, self.hour_spinbox, self.minute_spinbox)
+        self._start_or_schedule(self.selected_channel(), self.last_uploaded_path, local_dt, self.abr_var.get(),
+                                self.low_latency_var.get(), self.selected_repeat())
+
+    def add_to_playlist(self):
+        if not self.last_uploaded_path: messagebox.showwarning("Error", "Please upload a video first."); return
+        path = self.last_uploaded_path
+        title = self.last_uploaded_name or os.path.basename(path)
+        self.playlist.append({"path": path, "title": title})
+        self.update_rundown()
+        self.update_status_bar(f"➕ '{title}' added to the playlist ({len(self.playlist)} items).")
+        self.run_in_thread(self.probe_durations, [path])
+
+    def probe_durations(self, paths):
+        self.engine.probe_durations(paths)
+        self.ui_queue.put(self.update_rundown, key="playlist_tree")
+
+    def update_rundown(self):
+        if not hasattr(self, 'playlist_tree'): return
+        try:
+            start_dt = self.picked_time(self.playlist_date_entry, self.playlist_hour_spinbox,
+                                        self.playlist_minute_spinbox)
+        except ValueError:
+            start_dt = datetime.now(self.local_timezone)
+        entries, total = self.engine.rundown(self.playlist, start_dt)
+        selection = self.playlist_tree.focus()
+        self.playlist_tree.delete(*self.playlist_tree.get_children())
+        for position, (item, start, duration) in enumerate(entries, 1):
+            self.playlist_tree.insert("", "end", iid=str(position - 1), values=(
+                position, start.strftime('%Y-%m-%d %H:%M:%S') if start else "?",
+                str(timedelta(seconds=round(duration))) if duration is not None else "probing...", item["title"]))
+        if selection and self.playlist_tree.exists(selection):
+            self.playlist_tree.focus(selection)
+            self.playlist_tree.selection_set(selection)
+        if not entries:
+            summary = "Playlist is empty."
+        elif total is None:
+            summary = f"{len(entries)} items, total length unknown."
+        else:
+            end_dt = start_dt + timedelta(seconds=total)
+            summary = f"{len(entries)} items, {timedelta(seconds=round(total))} in total, ends {end_dt:%H:%M:%S}."
+        self.playlist_total_label.config(text=summary)
+
+    def move_playlist_item(self, step):
+        selected = self.playlist_tree.focus()
+        if not selected: return
+        index = int(selected)
+        target = index + step
+        if not 0 <= target < len(self.playlist): return
+        self.playlist[index], self.playlist[target] = self.playlist[target], self.playlist[index]
+        self.update_rundown()
+        self.playlist_tree.focus(str(target))
+        self.playlist_tree.selection_set(str(target))
+
+    def remove_playlist_item(self):
+        selected = self.playlist_tree.focus()
+        if not selected: messagebox.showwarning("No Selection", "Please select a playlist item to remove."); return
+        del self.playlist[int(selected)]
+        self.update_rundown()
+
+    def clear_playlist(self):
+        if self.playlist and messagebox.askyesno("Clear Playlist", "Remove every item from the playlist?"):
+            self.playlist = []
+            self.update_rundown()
+
+    def start_playlist_now(self):
+        if not self.playlist: messagebox.showwarning("Error", "Please add videos to the playlist first."); return
+        self.engine.start_or_schedule_playlist(self.selected_channel(), list(self.playlist), None, self.abr_var.get(),
+                                               self.low_latency_var.get())
+
+    def schedule_playlist_later(self):
+        if not self.playlist: messagebox.showwarning("Error", "Please add videos to the playlist first."); return
+        local_dt = self.picked_time(self.playlist_date_entry, self.playlist_hour_spinbox, self.playlist_minute_spinbox)
+        if self._schedule(self.engine.start_or_schedule_playlist, self.selected_channel(), list(self.playlist),
+                          local_dt, self.abr_var.get(), self.low_latency_var.get(), self.selected_repeat()):
+            self.request_queue_refresh()
+
+    def poll_queue(self):
+        # The pending poll stays as a fallback in case the refresh fails; a successful
+        # refresh replaces it with one timed from what the queue holds.
+        self.queue_poll_after = None
+        self.run_in_thread(self.refresh_queue)
+        self.schedule_queue_poll(self.queue_poll_delay)
+
+    def schedule_queue_poll(self, delay):
+        if self.queue_poll_after: self.root.after_cancel(self.queue_poll_after)
+        self.queue_poll_after = self.root.after(int(delay * 1000), self.poll_queue)
+
+    def request_queue_refresh(self):
+        self.queue_poll_delay = QUEUE_POLL_BASE
         self.run_in_thread(self.refresh_queue)
-        self.root.after(30000, self.auto_refresh_queue)
+
+    def next_queue_poll(self, rows, jobs):
+        # Seconds until the next poll: the backoff interval, cut short to just after the next start.
+        changed = rows != self.queue_rows
+        self.queue_rows = rows
+        self.queue_poll_delay = QUEUE_POLL_BASE if changed else min(self.queue_poll_delay * 2, QUEUE_POLL_MAX)
+        now = datetime.now(self.local_timezone)
+        if self.queue_offset == 0:
+            # Jobs already due (a running `at` job stays listed) do not shorten the interval.
+            self.queue_next_start = min((job[1] for job in jobs if job[1] > now), default=None)
+        if self.queue_next_start is None or self.queue_next_start <= now:
+            return self.queue_poll_delay
+        until_due = (self.queue_next_start - now).total_seconds() + QUEUE_DUE_MARGIN
+        return min(self.queue_poll_delay, max(QUEUE_POLL_MIN, until_due))
+
+    def page_queue(self, step):
+        offset = self.queue_offset + step * QUEUE_PAGE_SIZE
+        if 0 <= offset < max(self.queue_total, 1):
+            self.queue_offset = offset
+            self.run_in_thread(self.refresh_queue)
 
     def refresh_queue(self):
         if not hasattr(self, 'queue_tree'): return
-        current_selection = self.queue_tree.focus()
-        out, err = self.execute_command("atq")
-        if "SSH connection lost" in err: return
-        server_tz_str, _ = self.execute_command("cat /etc/timezone")
-        server_tz = pytz.timezone(server_tz_str.strip() if server_tz_str else "UTC")
+        snapshot = self.engine.fetch_queue_snapshot(self.queue_offset)
+        if snapshot is None: return
+        jobs, self.queue_total = snapshot
+        if not jobs and self.queue_offset:
+            # The page emptied (jobs ran or were cancelled): show the last one that still has jobs.
+            self.queue_offset = max(0, (self.queue_total - 1) // QUEUE_PAGE_SIZE * QUEUE_PAGE_SIZE)
+            return self.refresh_queue()
+        check_cancelled()
+        for job in jobs: self.engine.get_channel(job[3])
         jobs_to_display = []
-        if out:
-            for line in out.strip().split('\n'):
-                try:
-                    parts = line.split()
-                    job_id, server_time_str = parts[0], " ".join(parts[1:6])
-                    server_dt_naive = datetime.strptime(server_time_str, '%a %b %d %H:%M:%S %Y')
-                    server_dt_aware = server_tz.localize(server_dt_naive)
-                    tehran_dt = server_dt_aware.astimezone(self.local_timezone)
-                    tehran_time_str_display = tehran_dt.strftime('%A, %Y-%m-%d at %H:%M')
-                    job_content, _ = self.execute_command(f"at -c {job_id}")
-                    video_match = re.search(r'-i ("|\')(/var/videos/.+?)\1', job_content)
-                    video_name = os.path.basename(video_match.group(2)) if video_match else "Unknown"
-                    jobs_to_display.append(
-                        (job_id, server_dt_aware.strftime('%c %Z'), tehran_time_str_display, video_name))
-                except (ValueError, IndexError) as e:
-                    print(f"Could not parse job line: {line} - Error: {e}")
-                    continue
-
-        def _update_ui():
-            if hasattr(self, 'queue_tree'):
-                self.queue_tree.delete(*self.queue_tree.get_children())
-                for job in jobs_to_display: self.queue_tree.insert("", "end", values=job)
-                if current_selection and self.queue_tree.exists(current_selection):
-                    self.queue_tree.focus(current_selection)
-                    self.queue_tree.selection_set(current_selection)
-
-        self.ui_queue.put(_update_ui)
+        for job_id, server_dt_aware, video_name, channel_key, repeat in jobs:
+            tehran_dt = server_dt_aware.astimezone(self.local_timezone)
+            tehran_time_str_display = tehran_dt.strftime('%A, %Y-%m-%d at %H:%M')
+            jobs_to_display.append((str(job_id), (job_id, server_dt_aware.strftime('%c %Z'), tehran_time_str_display,
+                                                  video_name or "Unknown", channel_key, repeat or "-")))
+        if jobs:
+            page_text = f"Jobs {self.queue_offset + 1}-{self.queue_offset + len(jobs)} of {self.queue_total}"
+        else:
+            page_text = "No scheduled jobs"
+        self.ui_queue.configure(self.queue_page_label, text=page_text)
+        # Only added, changed, moved or removed rows touch the tree, so selection and scroll position stay put.
+        self.ui_queue.put(lambda: self.queue_model.sync(jobs_to_display), key="queue_tree")
+        delay = self.next_queue_poll(jobs_to_display, jobs)
+        self.ui_queue.put(lambda: self.schedule_queue_poll(delay), key="queue_poll")
 
     def cancel_selected_job(self):
         if not hasattr(self, 'queue_tree'): return
@@ -551,8 +801,27 @@ echo "--- Cleanup complete. ---" >> {log_file}
         video_name = self.queue_tree.item(selected_item)['values'][3]
         if messagebox.askyesno("Confirm Cancellation",
                                f"Are you sure you want to cancel the scheduled stream for '{video_name}' (Job ID: {job_id})?"):
-            self.run_in_thread(lambda: (self.execute_command(f"atrm {job_id}"), self.refresh_queue(),
-                                        self.update_status_bar(f"🗑️ Job {job_id} cancelled.")))
+            self.run_in_thread(lambda: (self.engine.cancel_job(job_id), self.request_queue_refresh()))
+
+    def update_library_quota(self):
+        try:
+            self.engine.library_quota_gb = max(1, int(self.quota_spinbox.get()))
+        except ValueError:
+            self.quota_spinbox.set(self.engine.library_quota_gb)
+
+    def apply_nginx_profile(self):
+        try:
+            viewers, ram_mb = int(self.viewers_spinbox.get()), int(self.ram_spinbox.get())
+        except ValueError:
+            messagebox.showwarning("Error", "Viewers and RAM must be whole numbers."); return
+        try:
+            applied, output = self.engine.apply_nginx_profile(viewers, self.latency_combo.get(), ram_mb)
+        except EngineError as e:
+            messagebox.showerror("Tuning Error", str(e)); return
+        if applied:
+            self.ui_queue.put(lambda: messagebox.showinfo("Profile Applied", output))
+        else:
+            self.ui_queue.put(lambda: messagebox.showerror("Tuning Error", output))
 
     def browse_for_template(self, template_type):
         filepath = filedialog.askopenfilename(title=f"Select HTML file for {template_type}",
@@ -566,24 +835,19 @@ echo "--- Cleanup complete. ---" >> {log_file}
     def set_template_page(self, template_type):
         if template_type == 'idle':
             local_path = self.idle_page_label.cget("text")
-            remote_path = REMOTE_IDLE_TEMPLATE_PATH
             if "No custom" in local_path: messagebox.showwarning("Error",
                                                                  "Please select an idle HTML file first."); return
         elif template_type == 'player':
             local_path = self.player_page_label.cget("text")
-            remote_path = REMOTE_PLAYER_TEMPLATE_PATH
             if "No custom" in local_path: messagebox.showwarning("Error",
                                                                  "Please select a player HTML file first."); return
         try:
-            sftp = self.ssh_client.open_sftp()
-            sftp.put(local_path, remote_path)
-            sftp.close()
+            self.engine.set_template(template_type, local_path)
             msg = f"Custom {template_type} page has been set on the server."
             messagebox.showinfo("Success", msg)
             self.update_status_bar(f"✅ {msg}")
-            if template_type == 'idle' and not self.is_stream_live:
-                self.execute_command(f"cp {REMOTE_IDLE_TEMPLATE_PATH} {REMOTE_PLAYER_HTML_PATH}")
-                messagebox.showinfo("Applied", "Idle page has been applied live.")
+            if template_type == 'idle':
+                messagebox.showinfo("Applied", "Idle page has been applied live to every idle channel.")
                 self.update_status_bar("Idle page applied live.")
         except Exception as e:
             messagebox.showerror("Upload Error", str(e))
@@ -591,6 +855,7 @@ echo "--- Cleanup complete. ---" >> {log_file}
 
 
 if __name__ == "__main__":
+    from ttkthemes import ThemedTk
     root = ThemedTk(theme="arc")
     app = App(root)
     root.mainloop()
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Bounded Task Executor
+# ==============================================================================
+# A fixed pool of worker threads for background work. Tasks submitted with a
+# key are de-duplicated while an identical task is queued or running, and can
+# be cancelled cooperatively or after a timeout. Every task ends with exactly one
+# outcome: completed, failed, cancelled or timed_out. Counters for queue depth,
+# rejected submissions and task latency are exposed through stats(), and every
+# task's queue wait and total time go into the metrics histograms by task name.
+# A failed task's exception is kept on the task and its traceback printed,
+# unless it is one of the `expected_errors` its submitter reports itself.
+# ==============================================================================
+
+
+import queue
+import threading
+import time
+import traceback
+
+from metrics import METRICS
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PENDING = 64
+WATCHDOG_INTERVAL = 0.5
+
+_local = threading.local()
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+def current_task():
+    return getattr(_local, "task", None)
+
+
+def check_cancelled():
+    # Called from long-running task code at safe points to honour cancellation.
+    task = current_task()
+    if task: task.check()
+
+
+class Task:
+    def __init__(self, func, args, key=None, timeout=None):
+        self.func = func
+        self.args = args
+        self.key = key
+        self.timeout = timeout
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.outcome = None
+        self.timed_out = False
+        self._cancel_event = threading.Event()
+        self._done_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def check(self):
+        if self.is_cancelled():
+            raise TaskCancelled(f"Task '{self.key or self.func.__name__}' was cancelled.")
+
+    def wait(self, timeout=None):
+        return self._done_event.wait(timeout)
+
+
+class TaskExecutor:
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, expected_errors=()):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.expected_errors = expected_errors
+        self._lock = threading.Lock()
+        self._active = {}
+        self._running = set()
+        self._shutdown = threading.Event()
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "timed_out": 0,
+                         "rejected_duplicates": 0, "rejected_full": 0}
+        self.latency = {"count": 0, "total": 0.0, "max": 0.0}
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        self._threads.append(threading.Thread(target=self._watchdog, daemon=True))
+        for thread in self._threads: thread.start()
+
+    def submit(self, func, *args, key=None, timeout=None):
+        # Returns the queued Task, or None when the submission was rejected.
+        with self._lock:
+            if key is not None and key in self._active:
+                self.counters["rejected_duplicates"] += 1
+                return None
+            task = Task(func, args, key, timeout)
+            try:
+                self._queue.put_nowait(task)
+            except queue.Full:
+                self.counters["rejected_full"] += 1
+                return None
+            if key is not None: self._active[key] = task
+            self.counters["submitted"] += 1
+        return task
+
+    def cancel(self, key):
+        with self._lock:
+            task = self._active.get(key)
+        if task: task.cancel()
+        return task is not None
+
+    def is_active(self, key):
+        with self._lock:
+            return key in self._active
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters, queue_depth=self._queue.qsize(), running=len(self._running))
+            count = self.latency["count"]
+            stats["latency_avg"] = self.latency["total"] / count if count else 0.0
+            stats["latency_max"] = self.latency["max"]
+        return stats
+
+    def shutdown(self):
+        self._shutdown.set()
+        with self._lock:
+            for task in self._active.values(): task.cancel()
+
+    def _worker(self):
+        while not self._shutdown.is_set():
+            try:
+                task = self._queue.get(timeout=WATCHDOG_INTERVAL)
+            except queue.Empty:
+                continue
+            with self._lock:
+                self._running.add(task)
+            task.started_at = time.monotonic()
+            _local.task = task
+            outcome = "completed"
+            try:
+                task.check()
+                task.func(*task.args)
+            except TaskCancelled:
+                outcome = "cancelled"
+            except Exception as e:
+                task.error = e
+                outcome = "failed"
+                if not isinstance(e, self.expected_errors) and not task.is_cancelled(): traceback.print_exc()
+            finally:
+                _local.task = None
+                self._finish(task, outcome)
+
+    def _finish(self, task, outcome):
+        # A cancelled task may stop by raising its own error (an upload does); it still counts as
+        # cancelled, or as timed_out when the watchdog cancelled it. A task that completed anyway did.
+        if outcome != "completed" and task.is_cancelled():
+            outcome = "timed_out" if task.timed_out else "cancelled"
+        task.outcome = outcome
+        task.finished_at = time.monotonic()
+        latency = task.finished_at - task.submitted_at
+        name = task.key or getattr(task.func, "__name__", "task")
+        METRICS.observe("task_seconds", latency, task=name, outcome=outcome)
+        if task.started_at is not None:
+            METRICS.observe("task_queue_wait_seconds", task.started_at - task.submitted_at, task=name)
+        with self._lock:
+            self._running.discard(task)
+            if task.key is not None and self._active.get(task.key) is task:
+                del self._active[task.key]
+            self.counters[outcome] += 1
+            self.latency["count"] += 1
+            self.latency["total"] += latency
+            self.latency["max"] = max(self.latency["max"], latency)
+        task._done_event.set()
+
+    def _watchdog(self):
+        # Tasks past their timeout are cancelled; they stop at their next check point.
+        while not self._shutdown.wait(WATCHDOG_INTERVAL):
+            now = time.monotonic()
+            with self._lock:
+                for task in self._running:
+                    if task.timeout and not task.is_cancelled() and now - task.started_at > task.timeout:
+                        task.timed_out = True
+                        task.cancel()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Live ffmpeg Telemetry
+# ==============================================================================
+# The start script runs ffmpeg with `-progress <file>`, which writes a block of
+# key=value lines about twice a second. TelemetryStream follows the progress
+# files of every channel over a single SSH channel, across restarts of the
+# streams, and hands each parsed block to a callback, so the GUI can show fps,
+# bitrate, speed and dropped frames as they happen without polling the
+# process table.
+# ==============================================================================
+
+
+import shlex
+import threading
+
+SPEED_WARNING_THRESHOLD = 0.97
+SLOW_SAMPLES_BEFORE_WARNING = 3
+
+
+def parse_number(value, suffix=""):
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_progress_block(fields):
+    # Converts one raw `-progress` block into typed values; "N/A" becomes None.
+    return {
+        "frame": int(parse_number(fields.get("frame", "")) or 0),
+        "fps": parse_number(fields.get("fps", "")),
+        "bitrate_kbps": parse_number(fields.get("bitrate", ""), "kbits/s"),
+        "total_size": int(parse_number(fields.get("total_size", "")) or 0),
+        "out_time": fields.get("out_time", "").split(".")[0] or "00:00:00",
+        "speed": parse_number(fields.get("speed", ""), "x"),
+        "drop_frames": int(parse_number(fields.get("drop_frames", "")) or 0),
+        "dup_frames": int(parse_number(fields.get("dup_frames", "")) or 0),
+        "ended": fields.get("progress") == "end",
+    }
+
+
+class TelemetryStream:
+    def __init__(self, session, files, callback):
+        # `files` maps each progress file to the key passed to callback(key, sample).
+        self.session = session
+        self.files = dict(files)
+        self.callback = callback
+        self.channel = None
+        self.slow_samples = {}
+        self._thread = None
+
+    def is_running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self):
+        if self.is_running(): return
+        self.channel = self.session.open_channel()
+        # -v makes tail print a "==> file <==" header whenever the output switches files.
+        paths = " ".join(shlex.quote(path) for path in self.files)
+        self.channel.exec_command(f"exec tail -v -n 0 -F {paths} 2>/dev/null")
+        self._thread = threading.Thread(target=self._read, args=(self.channel,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        channel, self.channel = self.channel, None
+        if channel:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    def _read(self, channel):
+        fields = {}
+        current = None
+        try:
+            for raw_line in channel.makefile("r"):
+                line = raw_line.strip()
+                if line.startswith("==> ") and line.endswith(" <=="):
+                    current = self.files.get(line[4:-4])
+                    fields = {}
+                    continue
+                key, sep, value = line.partition("=")
+                if not sep: continue
+                fields[key] = value
+                if key != "progress": continue
+                sample = parse_progress_block(fields)
+                fields = {}
+                if current is None: continue
+                speed = sample["speed"]
+                slow = speed is not None and speed < SPEED_WARNING_THRESHOLD
+                self.slow_samples[current] = self.slow_samples.get(current, 0) + 1 if slow else 0
+                sample["falling_behind"] = self.slow_samples[current] >= SLOW_SAMPLES_BEFORE_WARNING
+                self.callback(current, sample)
+        except Exception as e:
+            print(f"Telemetry stream closed: {e}")
+        finally:
+            if self.channel is channel: self.stop()
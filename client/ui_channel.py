@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager Desktop Client - Coalescing UI Update Channel
+# ==============================================================================
+# Worker threads post UI updates here and the Tk thread applies them. Updates
+# posted with a key (a widget option, the status bar, a progress bar) replace
+# any pending update for the same key, so only the latest value is drawn. The
+# Tk thread drains the channel in small time-budgeted slices, one per frame;
+# each slice's duration goes into the metrics histograms.
+# ==============================================================================
+
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+from metrics import METRICS
+
+FRAME_BUDGET = 0.008
+FRAME_INTERVAL_MS = 16
+IDLE_INTERVAL_MS = 50
+DEFAULT_CAPACITY = 256
+
+
+class UIChannel:
+    def __init__(self, root, capacity=DEFAULT_CAPACITY):
+        self.root = root
+        self.capacity = capacity
+        self._events = deque()
+        self._latest = OrderedDict()
+        self._lock = threading.Lock()
+        self._space = threading.Condition(self._lock)
+        self._tk_thread = threading.get_ident()
+        self.stats = {"posted": 0, "coalesced": 0, "applied": 0, "drains": 0, "busy_seconds": 0.0}
+
+    def put(self, update, key=None):
+        # Keyed updates replace a pending update with the same key. Unkeyed updates are
+        # kept in order; when the channel is full, worker threads wait for the Tk thread.
+        if threading.get_ident() == self._tk_thread and key is None:
+            with self._lock:
+                full = len(self._events) >= self.capacity
+            if full:
+                update()
+                return
+        with self._lock:
+            self.stats["posted"] += 1
+            if key is not None:
+                if key in self._latest: self.stats["coalesced"] += 1
+                self._latest[key] = update
+                self._latest.move_to_end(key)
+                return
+            while len(self._events) >= self.capacity:
+                self._space.wait()
+            self._events.append(update)
+
+    def snapshot_stats(self):
+        # Counters plus the current backlog, for the metrics collectors.
+        with self._lock:
+            return dict(self.stats, backlog=len(self._events) + len(self._latest))
+
+    def configure(self, widget, **options):
+        # Coalesces widget.config(**options) per widget and option set.
+        self.put(lambda: widget.config(**options), key=(str(widget), tuple(sorted(options))))
+
+    def start(self):
+        self._drain()
+
+    def _pop(self):
+        with self._lock:
+            if self._events:
+                update = self._events.popleft()
+                self._space.notify()
+                return update
+            if self._latest:
+                return self._latest.popitem(last=False)[1]
+        return None
+
+    def _drain(self):
+        started = time.perf_counter()
+        deadline = started + FRAME_BUDGET
+        applied = 0
+        while time.perf_counter() < deadline:
+            update = self._pop()
+            if update is None: break
+            try:
+                update()
+            except Exception as e:
+                print(f"UI update failed: {e}")
+            applied += 1
+        busy = time.perf_counter() - started
+        METRICS.observe("ui_drain_seconds", busy)
+        with self._lock:
+            pending = bool(self._events or self._latest)
+            self.stats["applied"] += applied
+            self.stats["drains"] += 1
+            self.stats["busy_seconds"] += busy
+        self.root.after(FRAME_INTERVAL_MS if pending else IDLE_INTERVAL_MS, self._drain)
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager: HLS Viewer Load Test
+# ==============================================================================
+# Simulates N HLS viewers with asyncio against a server and reports how it holds
+# up. Every viewer behaves like a player: it resolves a master playlist to its
+# highest rendition (or --bandwidth), joins a live stream three segments behind
+# the edge, reloads the playlist every target duration (half of it when nothing
+# changed) and downloads each new segment on one keep-alive connection. VOD
+# playlists (/vod/...) are played from the start, downloading up to --buffer
+# seconds ahead. Viewers join spread over --ramp seconds.
+#
+# Reported per config: throughput, request latency percentiles for playlists and
+# segments, the late-segment rate (downloads slower than the segment's duration)
+# and stalls (the simulated playhead ran out of buffered media).
+#
+# Configs run one after another with the same viewers and duration, so two
+# setups can be compared in one run; --switch runs a command before a config,
+# e.g. to install a different nginx.conf and reload:
+#
+#   python3 hls_loadtest.py --viewers 500 --duration 60 \
+#       --config no-cache http://localhost/hls/stream.m3u8 \
+#       --config tuned http://localhost/hls/stream.m3u8 \
+#       --switch no-cache "cp nginx.conf.bak /usr/local/nginx/conf/nginx.conf && systemctl reload nginx" \
+#       --switch tuned "python3 nginx_conf.py --viewers 500 --apply"
+#
+# A live stream must be running on the tested key (see latency_harness.py for a
+# synthetic one); a packaged /vod/<hash>/index.m3u8 works without one.
+# ==============================================================================
+
+
+import argparse
+import asyncio
+import math
+import resource
+import ssl
+import subprocess
+import sys
+import time
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_HOLDBACK_SEGMENTS = 3
+DEFAULT_BUFFER_SECONDS = 30
+REQUEST_TIMEOUT = 10
+USER_AGENT = "hlsmanager-loadtest/1"
+
+
+class HttpError(Exception):
+    pass
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile; None for an empty sample.
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def parse_playlist(text):
+    # Media playlist: (media sequence, target duration, [(sequence, duration, uri)], ended).
+    sequence, target, segments, duration, ended = 0, None, [], None, False
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            sequence = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-TARGETDURATION:"):
+            target = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-ENDLIST"):
+            ended = True
+        elif line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",")[0])
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append((sequence + len(segments), duration, line))
+            duration = None
+    return sequence, target, segments, ended
+
+
+def parse_master(text):
+    # Master playlist: [(bandwidth, uri)]; empty for a media playlist.
+    variants, bandwidth = [], None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            attributes = dict(item.split("=", 1) for item in line.split(":", 1)[1].split(",") if "=" in item)
+            bandwidth = int(attributes.get("BANDWIDTH", 0))
+        elif line and not line.startswith("#") and bandwidth is not None:
+            variants.append((bandwidth, line))
+            bandwidth = None
+    return variants
+
+
+class Stats:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = {"playlist": [], "segment": []}
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.segments = 0
+        self.late_segments = 0
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self.viewers_started = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def summary(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        result = {
+            "viewers": self.viewers_started,
+            "requests/s": self.requests / elapsed,
+            "throughput Mbit/s": self.bytes * 8 / elapsed / 1e6,
+            "errors": self.errors,
+            "segments": self.segments,
+            "late segments %": 100.0 * self.late_segments / self.segments if self.segments else None,
+            "stalls": self.stalls,
+            "stalled s/viewer": self.stall_seconds / self.viewers_started if self.viewers_started else None,
+        }
+        for kind, values in self.latencies.items():
+            for label, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                value = percentile(values, fraction)
+                result[f"{kind} {label} ms"] = value * 1000 if value is not None else None
+        return result
+
+
+class Connection:
+    # A minimal HTTP/1.1 keep-alive client: GET only, Content-Length, chunked or
+    # close-delimited bodies. Reconnects transparently when the server closed it.
+    def __init__(self, scheme, host, port):
+        self.scheme, self.host, self.port = scheme, host, port
+        self.reader = self.writer = None
+
+    async def _connect(self):
+        context = ssl.create_default_context() if self.scheme == "https" else None
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        for attempt in range(2):
+            fresh = self.writer is None
+            if fresh:
+                await self._connect()
+            try:
+                return await self._request(path)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # A reused connection may have been closed by the server's keepalive timeout.
+                self.close()
+                if fresh or attempt:
+                    raise
+
+    async def _request(self, path):
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nUser-Agent: {USER_AGENT}\r\n"
+                          f"Connection: keep-alive\r\n\r\n".encode())
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+        if "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                body += await self.reader.readexactly(size + 2)
+                body = body[:-2]
+                if size == 0:
+                    break
+        else:
+            body = await self.reader.read()
+            self.close()
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, body
+
+
+class Viewer:
+    def __init__(self, url, stats, deadline, args):
+        self.url = url
+        self.stats = stats
+        self.deadline = deadline
+        self.args = args
+        self.connections = {}
+        # Player model: media seconds downloaded, and the playhead's last resume point.
+        self.buffered = 0.0
+        self.played = 0.0
+        self.resumed_at = None
+
+    async def fetch(self, url, kind):
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        connection = self.connections.setdefault(origin, Connection(*origin))
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        started = time.monotonic()
+        try:
+            status, body = await asyncio.wait_for(connection.get(path), REQUEST_TIMEOUT)
+            if status != 200:
+                raise HttpError(f"HTTP {status} for {url}")
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, HttpError, ValueError):
+            connection.close()
+            self.stats.requests += 1
+            self.stats.errors += 1
+            return None, time.monotonic() - started
+        elapsed = time.monotonic() - started
+        self.stats.requests += 1
+        self.stats.bytes += len(body)
+        self.stats.latencies[kind].append(elapsed)
+        return body, elapsed
+
+    def position(self, now):
+        if self.resumed_at is None:
+            return 0.0
+        return min(self.buffered, self.played + now - self.resumed_at)
+
+    def segment_arrived(self, duration, download_time):
+        now = time.monotonic()
+        self.stats.segments += 1
+        if download_time > duration:
+            self.stats.late_segments += 1
+        if self.resumed_at is not None:
+            ran_dry_at = self.resumed_at + self.buffered - self.played
+            if ran_dry_at < now:
+                self.stats.stalls += 1
+                self.stats.stall_seconds += now - ran_dry_at
+                self.played, self.resumed_at = self.buffered, now
+        else:
+            self.resumed_at = now
+        self.buffered += duration
+
+    async def media_playlist(self):
+        body, _ = await self.fetch(self.url, "playlist")
+        if body is None:
+            return None
+        variants = parse_master(body.decode("utf-8", errors="replace"))
+        if not variants:
+            return body
+        fitting = [variant for variant in variants if not self.args.bandwidth or variant[0] <= self.args.bandwidth]
+        self.url = urljoin(self.url, (max(fitting) if fitting else min(variants))[1])
+        body, _ = await self.fetch(self.url, "playlist")
+        return body
+
+    async def run(self):
+        try:
+            body = await self.media_playlist()
+            next_sequence = None
+            while body is not None and time.monotonic() < self.deadline:
+                _, target, segments, ended = parse_playlist(body.decode("utf-8", errors="replace"))
+                if next_sequence is None and segments:
+                    next_sequence = segments[0][0] if ended else segments[max(0, len(segments) - self.args.holdback)][0]
+                changed = False
+                for sequence, duration, uri in segments:
+                    if next_sequence is None or sequence < next_sequence:
+                        continue
+                    while ended and self.buffered - self.position(time.monotonic()) > self.args.buffer:
+                        await asyncio.sleep(min(duration, 1.0))
+                    if time.monotonic() >= self.deadline:
+                        return
+                    segment, download_time = await self.fetch(urljoin(self.url, uri), "segment")
+                    if segment is not None:
+                        self.segment_arrived(duration, download_time)
+                    next_sequence, changed = sequence + 1, True
+                if ended:
+                    return
+                await asyncio.sleep((target or 2) if changed else (target or 2) / 2)
+                body, _ = await self.fetch(self.url, "playlist")
+        finally:
+            for connection in self.connections.values():
+                connection.close()
+
+
+async def run_config(name, url, args):
+    stats = Stats(name)
+    deadline = time.monotonic() + args.ramp + args.duration
+    viewers = []
+    for index in range(args.viewers):
+        viewers.append(asyncio.ensure_future(Viewer(url, stats, deadline, args).run()))
+        stats.viewers_started += 1
+        if args.ramp and index + 1 < args.viewers:
+            await asyncio.sleep(args.ramp / args.viewers)
+    await asyncio.gather(*viewers)
+    stats.finished = time.monotonic()
+    return stats
+
+
+def raise_file_limit(viewers):
+    # Every viewer holds one socket; ask for the hard limit when the soft one is too low.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != resource.RLIM_INFINITY and soft < viewers + 64:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def format_value(value):
+    if value is None:
+        return "n/a"
+    return f"{value:.0f}" if isinstance(value, int) or value >= 100 else f"{value:.2f}"
+
+
+def print_report(results):
+    summaries = [stats.summary() for stats in results]
+    width = max(12, *(len(stats.name) for stats in results))
+    print(f"{'':<20}" + "".join(f"{stats.name:>{width + 2}}" for stats in results))
+    for metric in summaries[0]:
+        print(f"{metric:<20}" + "".join(f"{format_value(summary[metric]):>{width + 2}}" for summary in summaries))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate HLS viewers against a server and compare configs.")
+    parser.add_argument("--config", nargs=2, action="append", metavar=("NAME", "URL"), required=True,
+                        help="playlist URL to test under a name (repeatable)")
+    parser.add_argument("--switch", nargs=2, action="append", default=[], metavar=("NAME", "COMMAND"),
+                        help="shell command to run before the named config")
+    parser.add_argument("--viewers", type=int, default=100, help="concurrent viewers per config")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to measure once every viewer joined")
+    parser.add_argument("--ramp", type=float, default=10, help="seconds over which viewers join")
+    parser.add_argument("--bandwidth", type=int, help="highest variant BANDWIDTH a viewer picks (default: any)")
+    parser.add_argument("--holdback", type=int, default=DEFAULT_HOLDBACK_SEGMENTS,
+                        help="segments behind the live edge at which viewers join")
+    parser.add_argument("--buffer", type=float, default=DEFAULT_BUFFER_SECONDS,
+                        help="seconds of VOD a viewer downloads ahead")
+    args = parser.parse_args(argv)
+
+    raise_file_limit(args.viewers)
+    switches = dict(args.switch)
+    results = []
+    for name, url in args.config:
+        if name in switches:
+            print(f"Switching to '{name}': {switches[name]}", file=sys.stderr)
+            subprocess.run(switches[name], shell=True, check=True)
+        print(f"Running '{name}': {args.viewers} viewers against {url} for {args.ramp + args.duration:.0f} s...",
+              file=sys.stderr)
+        results.append(asyncio.run(run_config(name, url, args)))
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
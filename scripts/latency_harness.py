@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager: Low-Latency HLS Measurement Harness
+# ==============================================================================
+# Measures, per latency profile, how far behind real time HLS viewers are. For
+# every config, ffmpeg encodes a synthetic test pattern in real time with the
+# same keyframe alignment the client uses, and the harness polls the resulting
+# live playlist. It reports, as p50/p95/p99:
+#
+#   availability  - from the capture of a segment's last frame until the segment
+#                   is listed in the playlist (encoder + segmenter delay)
+#   latency       - capture-to-playhead for a player joining at that moment and
+#                   holding back N target durations from the live edge (3 by
+#                   default, like video.js); decoding and display are not included
+#
+# By default everything runs locally: ffmpeg's own HLS muxer writes into a
+# temporary directory and frames are timestamped via EXT-X-PROGRAM-DATE-TIME.
+# With --nginx HOST the stream goes through nginx-rtmp instead ("standard" to the
+# live application, "low" to the lowlatency one) and capture times are derived
+# from the encoder start and the segment durations. --burn-in also draws the
+# wall clock into the picture, to compare a real player against a clock.
+#
+# Usage: python3 latency_harness.py --config standard --config low --duration 60
+# ==============================================================================
+
+
+import argparse
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+from nginx_conf import LATENCY_PROFILES
+
+FFMPEG_PATH = "ffmpeg"
+TEST_SOURCE = "testsrc2=size=1280x720:rate=30"
+BURN_IN_FILTER = "drawtext=text=%{localtime}:fontsize=48:fontcolor=white:box=1:boxcolor=black@0.6:x=20:y=20"
+STREAM_KEY = "latencyprobe"
+POLL_INTERVAL = 0.05
+DEFAULT_HOLDBACK_SEGMENTS = 3
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile; None for an empty sample.
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def parse_playlist(text):
+    # Returns (media sequence, target duration, [(sequence, duration, uri, program date time)]).
+    sequence, target, segments = 0, None, []
+    duration = date_time = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            sequence = int(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-TARGETDURATION:"):
+            target = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-PROGRAM-DATE-TIME:"):
+            date_time = datetime.fromisoformat(line.split(":", 1)[1].replace("Z", "+00:00")).timestamp()
+        elif line.startswith("#EXTINF:"):
+            duration = float(line[len("#EXTINF:"):].split(",")[0])
+        elif line and not line.startswith("#") and duration is not None:
+            segments.append((sequence + len(segments), duration, line, date_time))
+            duration = date_time = None
+    return sequence, target, segments
+
+
+def encoder_command(profile, output_args, burn_in):
+    gop = ["-force_key_frames", f"expr:gte(t,n_forced*{profile['fragment']})", "-sc_threshold", "0"]
+    if profile["fragment"] == LATENCY_PROFILES["low"]["fragment"]:
+        gop += ["-tune", "zerolatency"]
+    filters = ["-vf", BURN_IN_FILTER] if burn_in else []
+    return ([FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-re", "-f", "lavfi", "-i", TEST_SOURCE] + filters +
+            ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p"] + gop + output_args)
+
+
+def local_target(profile, workdir):
+    playlist = os.path.join(workdir, "index.m3u8")
+    output_args = ["-f", "hls", "-hls_time", str(profile["fragment"]),
+                   "-hls_list_size", str(math.ceil(profile["playlist"] / profile["fragment"])),
+                   "-hls_flags", "delete_segments+program_date_time",
+                   "-hls_segment_filename", os.path.join(workdir, "segment_%05d.ts"), playlist]
+
+    def read():
+        try:
+            with open(playlist, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return ""
+    return output_args, read
+
+
+def nginx_target(name, host):
+    application, directory = ("live", "/hls") if name == "standard" else ("lowlatency", "/hls/ll")
+    url = f"http://{host}{directory}/{STREAM_KEY}.m3u8"
+
+    def read():
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                return response.read().decode("utf-8", errors="replace")
+        except OSError:
+            return ""
+    return ["-f", "flv", f"rtmp://{host}/{application}/{STREAM_KEY}"], read
+
+
+def measure(name, args):
+    profile = LATENCY_PROFILES[name]
+    with tempfile.TemporaryDirectory(prefix=f"latency-{name}-") as workdir:
+        output_args, read = nginx_target(name, args.nginx) if args.nginx else local_target(profile, workdir)
+        encoder = subprocess.Popen(encoder_command(profile, output_args, args.burn_in), stdin=subprocess.DEVNULL)
+        started = time.time()
+        next_start = started
+        seen, availability, latency = {}, [], []
+        try:
+            while time.time() - started < args.duration:
+                if encoder.poll() is not None:
+                    raise SystemExit(f"ffmpeg exited with code {encoder.returncode} while measuring '{name}'.")
+                now = time.time()
+                _, target, segments = parse_playlist(read())
+                for sequence, duration, _, date_time in segments:
+                    if sequence in seen:
+                        continue
+                    # Without a program date time, segments are assumed to follow each other
+                    # seamlessly from the moment the encoder was started.
+                    start = date_time if date_time is not None else next_start
+                    next_start = start + duration
+                    seen[sequence] = (start + duration, now)
+                    availability.append(now - start - duration)
+                if segments and target and len(segments) >= args.holdback:
+                    edge = seen[segments[-1][0]][0]
+                    latency.append(now - (edge - args.holdback * target))
+                time.sleep(POLL_INTERVAL)
+        finally:
+            encoder.terminate()
+            encoder.wait()
+    return {"name": name, "fragment": profile["fragment"], "segments": len(seen),
+            "availability": availability, "latency": latency}
+
+
+def format_percentiles(values):
+    points = [percentile(values, fraction) for fraction in (0.5, 0.95, 0.99)]
+    if points[0] is None:
+        return "n/a"
+    return "/".join(f"{point:.2f}" for point in points) + " s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure HLS segment availability and viewer latency per profile.")
+    parser.add_argument("--config", action="append", choices=sorted(LATENCY_PROFILES),
+                        help="latency profile to measure (repeatable, default: all)")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to measure each config")
+    parser.add_argument("--holdback", type=int, default=DEFAULT_HOLDBACK_SEGMENTS,
+                        help="target durations a player stays behind the live edge")
+    parser.add_argument("--nginx", metavar="HOST", help="publish through nginx-rtmp on HOST instead of ffmpeg's muxer")
+    parser.add_argument("--burn-in", action="store_true", help="draw the wall clock into the video (needs drawtext)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.config or sorted(LATENCY_PROFILES):
+        print(f"Measuring '{name}' for {args.duration:.0f} s...", file=sys.stderr)
+        results.append(measure(name, args))
+    print(f"{'config':<10} {'fragment':>8} {'segments':>8}   {'availability p50/p95/p99':<26} latency p50/p95/p99")
+    for result in results:
+        print(f"{result['name']:<10} {result['fragment']:>6} s {result['segments']:>8}   "
+              f"{format_percentiles(result['availability']):<26} {format_percentiles(result['latency'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager: Profile-driven Nginx Configuration Generator
+# ==============================================================================
+# Renders nginx.conf for the streaming server from a declared audience profile
+# instead of fixed values:
+#
+#   --viewers   expected concurrent viewers (sizes worker connections and fds)
+#   --latency   "standard" (3 s fragments) or "low" (1 s fragments)
+#   --ram-mb    RAM budget for the HLS tmpfs and the open file cache
+#
+# Streams published to the "lowlatency" application always get 1 s fragments in
+# a 6 s playlist under /hls/ll/, whatever the profile's latency target is.
+#
+# Segments get immutable caching, playlists a TTL of a second or two, and the
+# live HLS directory lives on tmpfs. Player and idle pages are served with a few
+# seconds' TTL and ETags, from the precompressed .gz the client deploys next to
+# each page when nginx has the gzip_static module. With --apply the config is
+# staged and validated with `nginx -t` before anything else changes; then the
+# tmpfs is mounted (never under live streams, whose fragments it would hide),
+# the config installed (the previous one is kept as .bak) and nginx reloaded.
+# The profile is remembered, so later runs (e.g. from the desktop client) only
+# need the values that change.
+#
+# With --origin URL the server becomes a pull edge of that origin instead: it
+# ingests nothing and serves everything through a proxy cache on the tmpfs.
+# Concurrent misses for the same URL are collapsed into one origin request, and
+# the origin's Cache-Control (immutable segments, short playlist TTLs) decides
+# how long each response is kept. --origin "" turns an edge back into a
+# standalone server.
+#
+# Usage: python3 nginx_conf.py --viewers 5000 --latency standard --ram-mb 1024 --apply
+#        python3 nginx_conf.py --viewers 5000 --ram-mb 1024 --origin http://203.0.113.5 --apply
+# ==============================================================================
+
+
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+NGINX_INSTALL_PATH = "/usr/local/nginx"
+NGINX_CONF_PATH = f"{NGINX_INSTALL_PATH}/conf/nginx.conf"
+NGINX_BINARY = f"{NGINX_INSTALL_PATH}/sbin/nginx"
+PROFILE_PATH = "/root/.hlsmanager/nginx_profile.json"
+HLS_PATH = "/var/hls"
+LOW_LATENCY_HLS_PATH = f"{HLS_PATH}/ll"
+VOD_PATH = "/var/videos/hls"
+PLAYER_ROOT = "/var/www/player"
+ACME_ROOT = "/var/www/html"
+
+# Fragment length, live playlist length and playlist cache TTL, in seconds.
+LATENCY_PROFILES = {
+    "standard": {"fragment": 3, "playlist": 60, "playlist_ttl": 2},
+    "low": {"fragment": 1, "playlist": 6, "playlist_ttl": 1},
+}
+# Must match ABR_LADDER in client/hls_core.py.
+ABR_VARIANTS = [
+    ("_1080p", "BANDWIDTH=5128000,RESOLUTION=1920x1080"),
+    ("_720p", "BANDWIDTH=2928000,RESOLUTION=1280x720"),
+    ("_480p", "BANDWIDTH=1496000,RESOLUTION=854x480"),
+    ("_audio", "BANDWIDTH=64000"),
+]
+DEFAULT_PROFILE = {"viewers": 1000, "latency": "standard", "ram_mb": 512, "domain": "", "origin": ""}
+
+# A player keeps about two connections open (playlist polling and segment downloads),
+# spread over one worker per core, plus headroom for bursts when a stream starts.
+CONNECTIONS_PER_VIEWER = 2
+CONNECTION_HEADROOM = 1.25
+MIN_WORKER_CONNECTIONS = 1024
+MAX_WORKER_CONNECTIONS = 65535
+# Open file cache entries are a few hundred bytes each; 16 per MB of budget is negligible.
+FILE_CACHE_ENTRIES_PER_MB = 16
+MIN_FILE_CACHE_ENTRIES = 1024
+MAX_FILE_CACHE_ENTRIES = 65536
+SEGMENT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+HLS_TYPES = "types { application/vnd.apple.mpegurl m3u8; video/mp2t ts; }"
+CORS_HEADER = "add_header 'Access-Control-Allow-Origin' '*' always;"
+# Pages change only when a stream starts or stops; viewers (and edges) may reuse one this long.
+PAGE_TTL = 5
+# Edge proxy cache: one keys_zone MB holds about 8,000 keys; the cache may fill most of the tmpfs.
+EDGE_CACHE_PATH = f"{HLS_PATH}/edge-cache"
+EDGE_KEYS_MB_PER_GB = 16
+EDGE_CACHE_SHARE = 0.75
+EDGE_UPSTREAM_KEEPALIVE = 32
+# Local publishers (ffmpeg pushing to nginx-rtmp, the agent's packaged-stream publisher), and how
+# recently a playlist must have been written for a remote RTMP publisher to count as live.
+PUBLISHER_PATTERN = re.compile(r"ffmpeg.*rtmp://localhost/|remote_agent\.py\x00publish\x00")
+LIVE_PLAYLIST_SECONDS = 30
+
+
+def clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+def load_profile(path=PROFILE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return dict(DEFAULT_PROFILE, **json.load(f))
+    except (OSError, ValueError):
+        return dict(DEFAULT_PROFILE)
+
+
+def save_profile(profile, path=PROFILE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+
+
+def current_domain(conf_path=NGINX_CONF_PATH):
+    # Falls back to the server_name of the installed config when no domain was given.
+    try:
+        with open(conf_path, "r", encoding="utf-8") as f:
+            match = re.search(r"server_name\s+([^;\s]+)\s*;", f.read())
+        return match.group(1) if match else ""
+    except OSError:
+        return ""
+
+
+def sizing(profile, cpus=None):
+    cpus = cpus or os.cpu_count() or 1
+    connections = math.ceil(profile["viewers"] * CONNECTIONS_PER_VIEWER * CONNECTION_HEADROOM / cpus)
+    worker_connections = clamp(connections, MIN_WORKER_CONNECTIONS, MAX_WORKER_CONNECTIONS)
+    return {
+        "cpus": cpus,
+        "worker_connections": worker_connections,
+        # Every connection may also hold a file descriptor for the file it is sending.
+        "worker_rlimit_nofile": worker_connections * 2,
+        "file_cache_entries": clamp(profile["ram_mb"] * FILE_CACHE_ENTRIES_PER_MB, MIN_FILE_CACHE_ENTRIES,
+                                    MAX_FILE_CACHE_ENTRIES),
+        "tmpfs_mb": profile["ram_mb"],
+    }
+
+
+def application(name, hls_path, latency):
+    variants = " ".join(f"hls_variant {suffix} {params};" for suffix, params in ABR_VARIANTS)
+    # Fragments are named by timestamp, so a restarted stream never reuses a cached segment URL.
+    return (f"application {name} {{ live on; record off; hls on; hls_path {hls_path}; "
+            f"hls_fragment {latency['fragment']}s; hls_playlist_length {latency['playlist']}s; "
+            f"hls_fragment_naming system; {variants} }}")
+
+
+def edge_proxy(profile):
+    # Returns the http-level cache/upstream directives and the location serving everything from the origin.
+    origin = urlsplit(profile["origin"] if "://" in profile["origin"] else f"http://{profile['origin']}")
+    port = origin.port or (443 if origin.scheme == "https" else 80)
+    keys_mb = max(1, profile["ram_mb"] * EDGE_KEYS_MB_PER_GB // 1024)
+    http = (f"    upstream origin {{ server {origin.hostname}:{port}; keepalive {EDGE_UPSTREAM_KEEPALIVE}; }}\n"
+            f"    proxy_cache_path {EDGE_CACHE_PATH} levels=1:2 keys_zone=edge:{keys_mb}m "
+            f"max_size={int(profile['ram_mb'] * EDGE_CACHE_SHARE)}m inactive=10m use_temp_path=off;\n")
+    # The origin must see its own name, not the edge's: its TLS redirect and server_name match on Host,
+    # and without it a TLS origin would answer every fetch with a redirect to the edge itself.
+    host = origin.hostname if origin.port is None else f"{origin.hostname}:{origin.port}"
+    tls = f"proxy_ssl_server_name on; proxy_ssl_name {origin.hostname}; " if origin.scheme == "https" else ""
+    location = f"""        location / {{
+            proxy_pass {origin.scheme}://origin; proxy_http_version 1.1; proxy_set_header Connection "";
+            proxy_set_header Host {host}; {tls}
+            proxy_cache edge; proxy_cache_lock on; proxy_cache_lock_timeout 5s; proxy_cache_use_stale error timeout updating;
+            add_header X-Cache-Status $upstream_cache_status;
+        }}"""
+    return http, location
+
+
+def edge_url(profile):
+    # The URL edges should pull from this server: HTTPS by name when it has a certificate, since its
+    # port 80 only redirects then; "" means plain HTTP to its address is fine.
+    domain = profile["domain"]
+    if domain and os.path.isfile(f"/etc/letsencrypt/live/{domain}/fullchain.pem"):
+        return f"https://{domain}"
+    return ""
+
+
+def has_module(module, nginx_binary=NGINX_BINARY):
+    # `nginx -V` lists the configure arguments the binary was built with.
+    try:
+        result = subprocess.run([nginx_binary, "-V"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True)
+    except OSError:
+        return False
+    return f"--with-{module}" in result.stdout
+
+
+def render(profile, cpus=None, gzip_static=None):
+    if gzip_static is None:
+        gzip_static = has_module("http_gzip_static_module")
+    latency = LATENCY_PROFILES[profile["latency"]]
+    low = LATENCY_PROFILES["low"]
+    size = sizing(profile, cpus)
+    domain = profile["domain"] or "_"
+    ssl_cert = f"/etc/letsencrypt/live/{domain}/fullchain.pem"
+    rtmp = (f"rtmp {{ server {{ listen 1935; chunk_size 4096; {application('live', HLS_PATH, latency)} "
+            f"{application('lowlatency', LOW_LATENCY_HLS_PATH, low)} }} }}")
+    edge_http = ""
+    precompressed = "gzip_static on; " if gzip_static else ""
+    locations = f"""        location / {{ root {PLAYER_ROOT}; index index.html; {precompressed}add_header Cache-Control "public, max-age={PAGE_TTL}"; }}
+        location /hls {{
+            {HLS_TYPES} root /var;
+            location ~ ^/hls/ll/.+\\.m3u8$ {{ open_file_cache off; add_header Cache-Control "public, max-age={low['playlist_ttl']}"; {CORS_HEADER} }}
+            location ~ \\.m3u8$ {{ open_file_cache off; add_header Cache-Control "public, max-age={latency['playlist_ttl']}"; {CORS_HEADER} }}
+            location ~ \\.ts$ {{ add_header Cache-Control "{SEGMENT_CACHE_CONTROL}"; {CORS_HEADER} }}
+        }}
+        location /vod {{ {HLS_TYPES} alias {VOD_PATH}; add_header Cache-Control "{SEGMENT_CACHE_CONTROL}"; {CORS_HEADER} }}"""
+    if profile["origin"]:
+        # An edge ingests nothing: streams are published to the origin only.
+        rtmp = f"# Pull edge of {profile['origin']}."
+        edge_http, locations = edge_proxy(profile)
+    if os.path.isfile(ssl_cert):
+        servers = f"""    server {{ listen 80; server_name {domain}; location /.well-known/acme-challenge/ {{ root {ACME_ROOT}; }} location / {{ return 301 https://$host$request_uri; }} }}
+    server {{
+        listen 443 ssl http2;
+        server_name {domain};
+        ssl_certificate {ssl_cert};
+        ssl_certificate_key /etc/letsencrypt/live/{domain}/privkey.pem;
+        ssl_protocols TLSv1.2 TLSv1.3;
+        ssl_ciphers HIGH:!aNULL:!MD5;
+        ssl_session_cache shared:SSL:10m; ssl_session_timeout 1h;
+{locations}
+    }}"""
+    else:
+        servers = f"""    server {{
+        listen 80; server_name {domain};
+{locations}
+    }}"""
+    return f"""# Generated by nginx_conf.py for {profile['viewers']} viewers, {profile['latency']} latency, {profile['ram_mb']} MB RAM budget.
+worker_processes auto;
+worker_rlimit_nofile {size['worker_rlimit_nofile']};
+events {{ worker_connections {size['worker_connections']}; multi_accept on; }}
+{rtmp}
+http {{
+    include mime.types; default_type application/octet-stream;
+    sendfile on; tcp_nopush on; tcp_nodelay on;
+    keepalive_timeout 65; keepalive_requests 1000;
+    open_file_cache max={size['file_cache_entries']} inactive=20s; open_file_cache_valid 10s; open_file_cache_min_uses 1; open_file_cache_errors on;
+    gzip on; gzip_types application/vnd.apple.mpegurl; gzip_min_length 256; gzip_vary on;
+{edge_http}{servers}
+}}
+"""
+
+
+def active_publishers(path):
+    # Returns what is publishing into `path` right now: local publisher processes, or playlists written lately.
+    found = []
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().decode("utf-8", "replace")
+        except OSError:
+            continue
+        if PUBLISHER_PATTERN.search(cmdline):
+            found.append(f"pid {pid}: {cmdline.replace(chr(0), ' ').strip()[:80]}")
+    now = time.time()
+    for directory, _, files in os.walk(path):
+        for playlist in (os.path.join(directory, name) for name in files if name.endswith(".m3u8")):
+            try:
+                if now - os.path.getmtime(playlist) < LIVE_PLAYLIST_SECONDS: found.append(playlist)
+            except OSError:
+                continue
+    return found
+
+
+def ensure_tmpfs(path, size_mb):
+    # Mounts (or resizes) a tmpfs at `path` and records it in /etc/fstab so it survives reboots.
+    # nginx-rtmp writes fragments from its unprivileged workers, so the mount is world-writable.
+    # A new mount would hide the fragments live streams are writing, so it is refused while any run;
+    # resizing an existing tmpfs keeps its contents. fstab only changes once the mount succeeded.
+    options = f"defaults,noatime,mode=0777,size={size_mb}m"
+    with open("/proc/mounts", "r") as f:
+        mounted = any(line.split()[1:3] == [path, "tmpfs"] for line in f)
+    if not mounted:
+        publishers = active_publishers(path)
+        if publishers:
+            raise SystemExit(f"Not mounting a tmpfs on {path} while streams are live; nothing was changed. "
+                             f"Stop them and apply again.\n" + "\n".join(publishers))
+        os.makedirs(path, exist_ok=True)
+        subprocess.run(["mount", "-t", "tmpfs", "-o", options, "tmpfs", path], check=True)
+    else:
+        subprocess.run(["mount", "-o", f"remount,size={size_mb}m", path], check=True)
+    with open("/etc/fstab", "r") as f:
+        lines = [line for line in f.read().splitlines() if line.split()[1:2] != [path]]
+    lines.append(f"tmpfs {path} tmpfs {options} 0 0")
+    with open("/etc/fstab.tmp", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace("/etc/fstab.tmp", "/etc/fstab")
+
+
+def validate(config, conf_path=NGINX_CONF_PATH, nginx_binary=NGINX_BINARY):
+    # Stages the config next to the live one and returns its path once `nginx -t` accepted it.
+    staged = f"{conf_path}.new"
+    with open(staged, "w", encoding="utf-8") as f:
+        f.write(config)
+    result = subprocess.run([nginx_binary, "-t", "-c", staged], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        os.remove(staged)
+        raise SystemExit(f"nginx -t rejected the generated config; the current one was kept.\n{result.stdout}")
+    return staged
+
+
+def install(staged, conf_path=NGINX_CONF_PATH):
+    if os.path.exists(conf_path):
+        shutil.copy2(conf_path, f"{conf_path}.bak")
+    os.replace(staged, conf_path)
+    if subprocess.run(["systemctl", "is-active", "--quiet", "nginx"]).returncode == 0:
+        subprocess.run(["systemctl", "reload", "nginx"], check=True)
+        return "nginx reloaded"
+    return "nginx is not running; the config will be used on its next start"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render nginx.conf for the HLSManager streaming server.")
+    parser.add_argument("--viewers", type=int, help="expected concurrent viewers")
+    parser.add_argument("--latency", choices=sorted(LATENCY_PROFILES), help="latency target")
+    parser.add_argument("--ram-mb", type=int, help="RAM budget for HLS in MB")
+    parser.add_argument("--domain", help="server name (defaults to the saved profile or the current config)")
+    parser.add_argument("--origin", metavar="URL", help="serve as a caching pull edge of this origin ('' = standalone)")
+    parser.add_argument("--print-edge-url", action="store_true", help="print the URL edges should pull from and exit")
+    parser.add_argument("--apply", action="store_true", help="validate, install and reload instead of printing")
+    args = parser.parse_args(argv)
+
+    profile = load_profile()
+    for key in ("viewers", "latency", "ram_mb", "domain", "origin"):
+        if getattr(args, key) is not None:
+            profile[key] = getattr(args, key)
+    profile["domain"] = profile["domain"] or current_domain()
+    if args.print_edge_url:
+        print(edge_url(profile))
+        return
+    if profile["viewers"] < 1 or profile["ram_mb"] < 16:
+        parser.error("viewers must be at least 1 and the RAM budget at least 16 MB")
+    config = render(profile)
+    if not args.apply:
+        sys.stdout.write(config)
+        return
+    staged = validate(config)
+    try:
+        ensure_tmpfs(HLS_PATH, sizing(profile)["tmpfs_mb"])
+    except BaseException:
+        os.remove(staged)
+        raise
+    outcome = install(staged)
+    save_profile(profile)
+    size = sizing(profile)
+    role = f" as an edge of {profile['origin']}" if profile["origin"] else ""
+    print(f"Applied profile{role}: {profile['viewers']} viewers, {profile['latency']} latency, "
+          f"{profile['ram_mb']} MB RAM.")
+    print(f"worker_connections {size['worker_connections']} x {size['cpus']} workers, "
+          f"open_file_cache {size['file_cache_entries']}, {HLS_PATH} on a {size['tmpfs_mb']} MB tmpfs; {outcome}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,8 @@ LOG_FILE="/var/log/stream_server_setup.log"
 NGINX_INSTALL_PATH="/usr/local/nginx"
 NGINX_CONF_PATH="${NGINX_INSTALL_PATH}/conf/nginx.conf"
 NGINX_SERVICE_FILE="/etc/systemd/system/nginx.service"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+NGINX_CONF_GENERATOR="${SCRIPT_DIR}/nginx_conf.py"
 
 # --- Colors for Output ---
 C_RESET='\033[0m'
@@ -65,7 +67,7 @@ check_conflicts() {
 install_dependencies() {
     info "Updating package lists and installing dependencies..."
     apt-get update -y
-    apt-get install -y build-essential libpcre3-dev libssl-dev zlib1g-dev ffmpeg at wget unzip lsof certbot
+    apt-get install -y build-essential libpcre3-dev libssl-dev zlib1g-dev ffmpeg at wget unzip lsof certbot python3
     success "Dependencies installed."
 }
 
@@ -113,6 +115,7 @@ compile_nginx() {
         --prefix="${NGINX_INSTALL_PATH}" \
         --with-http_ssl_module \
         --with-http_v2_module \
+        --with-http_gzip_static_module \
         --add-module="${RTMP_MODULE_PATH}"
 
     make -j$(nproc) && make install
@@ -147,12 +150,15 @@ configure_and_start_nginx() {
     if [ -z "$DOMAIN_NAME" ]; then error "Domain name is required."; return 1; fi
     
     local ssl_cert_path="/etc/letsencrypt/live/${DOMAIN_NAME}/fullchain.pem"
+    # Player pages are deployed with a precompressed .gz next to them; older builds lack gzip_static.
+    local page_gzip=""
+    if "${NGINX_INSTALL_PATH}/sbin/nginx" -V 2>&1 | grep -q -- "--with-http_gzip_static_module"; then page_gzip="gzip_static on; "; fi
     if [ -f "$ssl_cert_path" ]; then
         info "SSL certificate found. Configuring Nginx for HTTPS."
         cat > "${NGINX_CONF_PATH}" <<EOF
 worker_processes auto;
 events { worker_connections 1024; }
-rtmp { server { listen 1935; chunk_size 4096; application live { live on; record off; hls on; hls_path /var/hls; hls_fragment 3s; hls_playlist_length 60s; } } }
+rtmp { server { listen 1935; chunk_size 4096; application live { live on; record off; hls on; hls_path /var/hls; hls_fragment 3s; hls_playlist_length 60s; hls_variant _1080p BANDWIDTH=5128000,RESOLUTION=1920x1080; hls_variant _720p BANDWIDTH=2928000,RESOLUTION=1280x720; hls_variant _480p BANDWIDTH=1496000,RESOLUTION=854x480; hls_variant _audio BANDWIDTH=64000; } application lowlatency { live on; record off; hls on; hls_path /var/hls/ll; hls_fragment 1s; hls_playlist_length 6s; hls_variant _1080p BANDWIDTH=5128000,RESOLUTION=1920x1080; hls_variant _720p BANDWIDTH=2928000,RESOLUTION=1280x720; hls_variant _480p BANDWIDTH=1496000,RESOLUTION=854x480; hls_variant _audio BANDWIDTH=64000; } } }
 http {
     include mime.types; default_type application/octet-stream; sendfile on; keepalive_timeout 65;
     server { listen 80; server_name ${DOMAIN_NAME}; location /.well-known/acme-challenge/ { root /var/www/html; } location / { return 301 https://\$host\$request_uri; } }
@@ -163,8 +169,9 @@ http {
         ssl_certificate_key /etc/letsencrypt/live/${DOMAIN_NAME}/privkey.pem;
         ssl_protocols TLSv1.2 TLSv1.3;
         ssl_ciphers HIGH:!aNULL:!MD5;
-        location / { root /var/www/player; index index.html; }
+        location / { root /var/www/player; index index.html; ${page_gzip}add_header Cache-Control "public, max-age=5"; }
         location /hls { types { application/vnd.apple.mpegurl m3u8; video/mp2t ts; } root /var; add_header Cache-Control no-cache; add_header 'Access-Control-Allow-Origin' '*' always; }
+        location /vod { types { application/vnd.apple.mpegurl m3u8; video/mp2t ts; } alias /var/videos/hls; add_header Cache-Control "public, max-age=31536000, immutable"; add_header 'Access-Control-Allow-Origin' '*' always; }
     }
 }
 EOF
@@ -173,13 +180,14 @@ EOF
         cat > "${NGINX_CONF_PATH}" <<EOF
 worker_processes auto;
 events { worker_connections 1024; }
-rtmp { server { listen 1935; chunk_size 4096; application live { live on; record off; hls on; hls_path /var/hls; hls_fragment 3s; hls_playlist_length 60s; } } }
+rtmp { server { listen 1935; chunk_size 4096; application live { live on; record off; hls on; hls_path /var/hls; hls_fragment 3s; hls_playlist_length 60s; hls_variant _1080p BANDWIDTH=5128000,RESOLUTION=1920x1080; hls_variant _720p BANDWIDTH=2928000,RESOLUTION=1280x720; hls_variant _480p BANDWIDTH=1496000,RESOLUTION=854x480; hls_variant _audio BANDWIDTH=64000; } application lowlatency { live on; record off; hls on; hls_path /var/hls/ll; hls_fragment 1s; hls_playlist_length 6s; hls_variant _1080p BANDWIDTH=5128000,RESOLUTION=1920x1080; hls_variant _720p BANDWIDTH=2928000,RESOLUTION=1280x720; hls_variant _480p BANDWIDTH=1496000,RESOLUTION=854x480; hls_variant _audio BANDWIDTH=64000; } } }
 http {
     include mime.types; default_type application/octet-stream; sendfile on; keepalive_timeout 65;
     server {
         listen 80; server_name ${DOMAIN_NAME};
-        location / { root /var/www/player; index index.html; }
+        location / { root /var/www/player; index index.html; ${page_gzip}add_header Cache-Control "public, max-age=5"; }
         location /hls { types { application/vnd.apple.mpegurl m3u8; video/mp2t ts; } root /var; add_header Cache-Control no-cache; add_header 'Access-Control-Allow-Origin' '*' always; }
+        location /vod { types { application/vnd.apple.mpegurl m3u8; video/mp2t ts; } alias /var/videos/hls; add_header Cache-Control "public, max-age=31536000, immutable"; add_header 'Access-Control-Allow-Origin' '*' always; }
     }
 }
 EOF
@@ -187,7 +195,7 @@ EOF
     success "Nginx configuration file created."
 
     info "Creating required directories and systemd service..."
-    mkdir -p /var/videos /var/www/player /var/hls /var/www/html
+    mkdir -p /var/videos /var/videos/hls /var/www/player /var/www/pages /var/hls /var/hls/ll /var/www/html
     cat > "${NGINX_SERVICE_FILE}" <<EOF
 [Unit]
 Description=Custom NGINX with RTMP
@@ -208,13 +216,34 @@ EOF
     success "Nginx service is configured and running."
 }
 
+tune_nginx_for_audience() {
+    if [ ! -f "${NGINX_CONF_GENERATOR}" ]; then
+        error "nginx_conf.py was not found next to this script (${NGINX_CONF_GENERATOR})."
+        return 1
+    fi
+    info "The Nginx configuration will be generated from your audience profile."
+    read -p "Expected concurrent viewers [1000]: " TUNE_VIEWERS
+    read -p "Latency target, 'standard' (3s fragments) or 'low' (1s fragments) [standard]: " TUNE_LATENCY
+    read -p "RAM budget for HLS in MB (used for a tmpfs at /var/hls) [512]: " TUNE_RAM_MB
+    local domain_args=()
+    if [ -n "${DOMAIN_NAME_FOR_CONFIG:-}" ]; then domain_args=(--domain "${DOMAIN_NAME_FOR_CONFIG}"); fi
+    if python3 "${NGINX_CONF_GENERATOR}" --viewers "${TUNE_VIEWERS:-1000}" --latency "${TUNE_LATENCY:-standard}" \
+        --ram-mb "${TUNE_RAM_MB:-512}" "${domain_args[@]}" --apply; then
+        success "Nginx has been tuned for the new profile."
+    else
+        error "The profile could not be applied. The previous configuration is still active."
+    fi
+}
+
 uninstall() {
     warning "This will stop Nginx and remove the compiled version at ${NGINX_INSTALL_PATH}."
     read -p "Are you sure? (y/n): " -n 1 -r; echo
     if [[ $REPLY =~ ^[Yy]$ ]]; then
         systemctl stop nginx || true
         systemctl disable nginx || true
-        rm -rf "${NGINX_INSTALL_PATH}" "${NGINX_SERVICE_FILE}"
+        # The stream scheduler service is installed by the client's remote agent on first use.
+        systemctl disable --now hlsmanager-scheduler 2>/dev/null || true
+        rm -rf "${NGINX_INSTALL_PATH}" "${NGINX_SERVICE_FILE}" /etc/systemd/system/hlsmanager-scheduler.service
         systemctl daemon-reload
         success "Custom Nginx has been uninstalled."
     fi
@@ -266,6 +295,7 @@ manage_server_menu() {
         echo " 3. Install/Renew SSL Certificate"
         echo " 4. Uninstall Streaming Server"
         echo " 5. View Setup Logs"
+        echo " 6. Tune Nginx for Audience (viewers, latency, RAM)"
         echo " 0. Back to Main Menu"
         echo "--------------------------"
         read -p "Enter your choice: " mgmt_choice
@@ -275,6 +305,7 @@ manage_server_menu() {
             3) manage_ssl; info "Now run option 2 to apply the new certificate."; press_enter_to_continue ;;
             4) uninstall; press_enter_to_continue ;;
             5) tail -n 50 "${LOG_FILE}"; press_enter_to_continue ;;
+            6) tune_nginx_for_audience; press_enter_to_continue ;;
             0) break ;;
             *) error "Invalid option." && sleep 1 ;;
         esac
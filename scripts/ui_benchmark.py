@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager: UI Update Benchmark
+# ==============================================================================
+# Measures how much Tk-thread time the desktop client spends on upload progress
+# per GB uploaded, with the UI update channel (client/ui_channel.py) and with
+# the plain queue of lambdas it replaced:
+#
+#   queue    every progress callback puts two lambdas (progress bar and status
+#            bar) on a queue.Queue, and the Tk thread runs all of them every 100 ms
+#   channel  every callback posts two keyed updates to a UIChannel, which keeps
+#            only the latest per widget and drains in frame-budgeted slices
+#
+# A producer thread plays the upload: it fires the client's progress callback
+# once per --chunk-kb (32 KB is how often `sftp.put` reports) at --mb-per-second.
+# Reported per design: CPU time of the Tk thread per GB (thread_time, so
+# redraws and event handling count too), updates applied, and how late the last
+# progress value reached the widgets.
+#
+# With a display the updates go to real ttk widgets in a small window. Without
+# one (or with --headless) a minimal event loop stands in for Tk and widget
+# updates only store their options, so the numbers then show the cost of the
+# queueing itself, not of redrawing.
+#
+# Usage: python3 ui_benchmark.py --gb 2 --mb-per-second 100
+# ==============================================================================
+
+
+import argparse
+import heapq
+import os
+import queue
+import sys
+import threading
+import time
+
+# The channel under test is the client's own, imported from client/ next to this directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "client"))
+
+from ui_channel import UIChannel
+
+DESIGNS = ("queue", "channel")
+QUEUE_POLL_MS = 100
+FILENAME = "lecture.mp4"
+
+
+class QueueLoop:
+    # The client's update loop before the UI channel: drain everything every 100 ms.
+    def __init__(self, root):
+        self.root = root
+        self.queue = queue.Queue()
+        self.applied = 0
+
+    def progress(self, progress_bar, status_bar, percentage):
+        self.queue.put(lambda: progress_bar.config(value=percentage))
+        self.queue.put(lambda: status_bar.config(text=f"  Uploading {FILENAME}... {int(percentage)}%"))
+
+    def start(self):
+        try:
+            while True:
+                self.queue.get_nowait()()
+                self.applied += 1
+        except queue.Empty:
+            pass
+        self.root.after(QUEUE_POLL_MS, self.start)
+
+    def idle(self):
+        return self.queue.empty()
+
+
+class ChannelLoop:
+    def __init__(self, root):
+        self.channel = UIChannel(root)
+
+    @property
+    def applied(self):
+        return self.channel.stats["applied"]
+
+    def progress(self, progress_bar, status_bar, percentage):
+        self.channel.configure(progress_bar, value=percentage)
+        self.channel.configure(status_bar, text=f"  Uploading {FILENAME}... {int(percentage)}%")
+
+    def start(self):
+        self.channel.start()
+
+    def idle(self):
+        return not self.channel.snapshot_stats()["backlog"]
+
+
+LOOPS = {"queue": QueueLoop, "channel": ChannelLoop}
+
+
+class HeadlessRoot:
+    # Just enough of Tk's event loop: timers run in order on the thread that calls mainloop().
+    def __init__(self):
+        self._timers, self._sequence, self._running = [], 0, False
+
+    def after(self, ms, func):
+        self._sequence += 1
+        heapq.heappush(self._timers, (time.monotonic() + ms / 1000, self._sequence, func))
+
+    def mainloop(self):
+        self._running = True
+        while self._running and self._timers:
+            due, _, func = heapq.heappop(self._timers)
+            delay = due - time.monotonic()
+            if delay > 0: time.sleep(delay)
+            func()
+
+    def quit(self):
+        self._running = False
+
+    def destroy(self):
+        self._timers = []
+
+
+class HeadlessWidget:
+    def __init__(self, name):
+        self.name, self.options = name, {}
+
+    def config(self, **options):
+        self.options.update(options)
+
+    def __str__(self):
+        return self.name
+
+
+def make_window(headless):
+    # Returns (root, progress bar, status bar, value getter).
+    if not headless:
+        import tkinter as tk
+        from tkinter import ttk
+        root = tk.Tk()
+        root.title("HLSManager UI benchmark")
+        progress_bar = ttk.Progressbar(root, length=400, maximum=100)
+        status_bar = ttk.Label(root, text="", anchor=tk.W)
+        progress_bar.pack(padx=10, pady=10)
+        status_bar.pack(fill=tk.X, padx=10)
+        return root, progress_bar, status_bar, lambda: float(progress_bar.cget("value"))
+    root = HeadlessRoot()
+    progress_bar, status_bar = HeadlessWidget("progress"), HeadlessWidget("status")
+    return root, progress_bar, status_bar, lambda: progress_bar.options.get("value", 0)
+
+
+def produce(loop, progress_bar, status_bar, args, done):
+    # Fires the progress callback once per chunk, paced to the target upload rate.
+    total = args.gb * 1024 ** 3
+    chunk = args.chunk_kb * 1024
+    rate = args.mb_per_second * 1024 ** 2
+    started, transferred = time.monotonic(), 0
+    while transferred < total:
+        transferred = min(total, transferred + chunk)
+        loop.progress(progress_bar, status_bar, transferred / total * 100)
+        ahead = transferred / rate - (time.monotonic() - started)
+        if ahead > 0.001: time.sleep(ahead)
+    done["at"] = time.monotonic()
+
+
+def run_design(design, args, headless):
+    root, progress_bar, status_bar, shown_value = make_window(headless)
+    loop = LOOPS[design](root)
+    done = {}
+    producer = threading.Thread(target=produce, args=(loop, progress_bar, status_bar, args, done), daemon=True)
+
+    def finish_when_shown():
+        if "at" in done and loop.idle() and shown_value() >= 100:
+            done["shown"] = time.monotonic()
+            root.quit()
+            return
+        root.after(5, finish_when_shown)
+
+    loop.start()
+    root.after(5, finish_when_shown)
+    cpu_started, wall_started = time.thread_time(), time.monotonic()
+    producer.start()
+    root.mainloop()
+    cpu = time.thread_time() - cpu_started
+    wall = time.monotonic() - wall_started
+    producer.join()
+    root.destroy()
+    return {"design": design, "cpu": cpu, "wall": wall, "applied": loop.applied, "lag": done["shown"] - done["at"]}
+
+
+def print_report(results, args, headless):
+    callbacks = args.gb * 1024 ** 3 // (args.chunk_kb * 1024)
+    mode = "headless event loop" if headless else "Tk"
+    print(f"\n{args.gb} GB at {args.mb_per_second} MB/s, {callbacks} progress callbacks "
+          f"({args.chunk_kb} KB chunks), {mode}")
+    print(f"{'design':<10}{'Tk-thread s/GB':>16}{'Tk busy %':>11}{'updates/GB':>12}{'last update lag':>17}")
+    for result in results:
+        print(f"{result['design']:<10}{result['cpu'] / args.gb:>16.3f}{result['cpu'] / result['wall'] * 100:>10.1f}%"
+              f"{result['applied'] / args.gb:>12.0f}{result['lag'] * 1000:>14.0f} ms")
+    if len(results) == 2 and results[1]["cpu"]:
+        print(f"queue vs channel Tk-thread time: {results[0]['cpu'] / results[1]['cpu']:.1f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Tk-thread time per GB uploaded for the UI update designs.")
+    parser.add_argument("--gb", type=int, default=1, help="simulated upload size in GB")
+    parser.add_argument("--mb-per-second", type=float, default=100, help="simulated upload rate")
+    parser.add_argument("--chunk-kb", type=int, default=32, help="bytes between progress callbacks, in KB")
+    parser.add_argument("--design", dest="designs", action="append", choices=DESIGNS,
+                        help="only run this design (repeatable; default: both)")
+    parser.add_argument("--headless", action="store_true", help="use the stand-in event loop even with a display")
+    args = parser.parse_args(argv)
+    if args.gb < 1 or args.mb_per_second <= 0 or args.chunk_kb < 1:
+        parser.error("--gb, --mb-per-second and --chunk-kb must be positive")
+    headless = args.headless or (os.name != "nt" and sys.platform != "darwin" and not os.environ.get("DISPLAY"))
+
+    results = []
+    for design in args.designs or DESIGNS:
+        print(f"Running '{design}'...", file=sys.stderr)
+        results.append(run_design(design, args, headless))
+    print_report(results, args, headless)
+
+
+if __name__ == "__main__":
+    main()
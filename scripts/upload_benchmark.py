@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager: SFTP Upload Throughput Benchmark
+# ==============================================================================
+# Uploads the same random test file over SSH with the client's parallel upload
+# engine (client/sftp_upload.py) and with a single blocking `sftp.put`, which
+# is how the client uploaded before, and reports the throughput of each.
+#
+#   put       one `sftp.put` on one SFTP channel
+#   parallel  ParallelUploader with --workers channels, including the journal
+#             and the server-side SHA-256 check it does on every upload
+#
+# Runs alternate between the methods so both see the same conditions; the
+# report gives the median and best MB/s per method. Against a local sshd the
+# link is not the bottleneck, so the numbers show the per-channel overhead
+# rather than the win on a real uplink: add latency to the loopback, e.g.
+# `tc qdisc add dev lo root netem delay 25ms` (and `tc qdisc del dev lo root`
+# afterwards), or point --host at a remote server.
+#
+# Usage: python3 upload_benchmark.py --host 127.0.0.1 --user root --size-mb 512 --runs 3
+# ==============================================================================
+
+
+import argparse
+import getpass
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# The engine under test is the client's own, imported from client/ next to this directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "client"))
+
+from sftp_upload import UPLOAD_CHUNK_SIZE, UPLOAD_WORKERS, ParallelUploader
+from ssh_session import SSHSession
+
+METHODS = ("put", "parallel")
+RANDOM_BLOCK_SIZE = 1024 * 1024
+
+
+def make_test_file(size_mb, directory=None):
+    # Random data, so neither SSH compression nor a smart filesystem can flatter a method.
+    handle, path = tempfile.mkstemp(prefix="hls-upload-bench-", suffix=".bin", dir=directory)
+    with os.fdopen(handle, "wb") as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(RANDOM_BLOCK_SIZE))
+    return path
+
+
+def upload_put(session, local_path, remote_path, args):
+    with session.sftp() as sftp:
+        sftp.put(local_path, remote_path)
+
+
+def upload_parallel(session, local_path, remote_path, args):
+    ParallelUploader(session, local_path, remote_path, workers=args.workers,
+                     chunk_size=args.chunk_mb * 1024 * 1024).upload()
+
+
+UPLOADERS = {"put": upload_put, "parallel": upload_parallel}
+
+
+def run(session, local_path, args):
+    size = os.path.getsize(local_path)
+    # Named apart from the local file, which is the same file when the server is this machine.
+    remote_path = f"{args.remote_dir.rstrip('/')}/{os.path.basename(local_path)}.uploaded"
+    rates = {method: [] for method in args.methods}
+    try:
+        for run_index in range(1, args.runs + 1):
+            for method in args.methods:
+                session.execute(f"rm -f '{remote_path}'")
+                started = time.perf_counter()
+                UPLOADERS[method](session, local_path, remote_path, args)
+                elapsed = time.perf_counter() - started
+                rates[method].append(size / elapsed / 1048576)
+                print(f"run {run_index}/{args.runs} {method:<8} {elapsed:7.2f} s  {rates[method][-1]:8.1f} MB/s",
+                      file=sys.stderr)
+    finally:
+        session.execute(f"rm -f '{remote_path}'")
+    return rates
+
+
+def print_report(rates, args):
+    print(f"\n{args.size_mb} MB to {args.user}@{args.host}:{args.port}, {args.runs} run(s) per method, "
+          f"parallel = {args.workers} channels x {args.chunk_mb} MB ranges")
+    print(f"{'method':<10}{'median MB/s':>14}{'best MB/s':>12}")
+    for method, values in rates.items():
+        print(f"{method:<10}{statistics.median(values):>14.1f}{max(values):>12.1f}")
+    if len(rates) == 2:
+        speedup = statistics.median(rates["parallel"]) / statistics.median(rates["put"])
+        print(f"parallel vs put: {speedup:.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the parallel SFTP upload engine with a single sftp.put.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=22)
+    parser.add_argument("--user", default=getpass.getuser())
+    parser.add_argument("--password", default=os.environ.get("HLSMANAGER_PASSWORD"),
+                        help="SSH password (default: $HLSMANAGER_PASSWORD, else prompted)")
+    parser.add_argument("--size-mb", type=int, default=256, help="size of the random test file")
+    parser.add_argument("--runs", type=int, default=3, help="uploads per method")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="SFTP channels for the parallel engine")
+    parser.add_argument("--chunk-mb", type=int, default=UPLOAD_CHUNK_SIZE // 1048576, help="range size in MB")
+    parser.add_argument("--method", dest="methods", action="append", choices=METHODS,
+                        help="only run this method (repeatable; default: both)")
+    parser.add_argument("--remote-dir", default="/tmp", help="where the test file is uploaded on the server")
+    parser.add_argument("--local-dir", help="where the local test file is created (default: the temp directory)")
+    args = parser.parse_args(argv)
+    args.methods = args.methods or list(METHODS)
+    if args.size_mb < 1 or args.runs < 1 or args.workers < 1 or args.chunk_mb < 1:
+        parser.error("--size-mb, --runs, --workers and --chunk-mb must be at least 1")
+    if args.password is None:
+        args.password = getpass.getpass(f"Password for {args.user}@{args.host}: ")
+
+    session = SSHSession(args.host, args.port, args.user, args.password)
+    session.connect()
+    print(f"Creating a {args.size_mb} MB test file...", file=sys.stderr)
+    local_path = make_test_file(args.size_mb, args.local_dir)
+    try:
+        rates = run(session, local_path, args)
+    finally:
+        os.remove(local_path)
+        session.close()
+    print_report(rates, args)
+
+
+if __name__ == "__main__":
+    main()
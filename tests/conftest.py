@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Test Configuration
+# ==============================================================================
+# The client modules import each other as top-level modules (they run from
+# client/), and so do the server scripts, so both directories go on sys.path.
+# ==============================================================================
+
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("client", "scripts"):
+    path = os.path.join(ROOT, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Local SSH Servers for Tests
+# ==============================================================================
+# Minimal in-process SSH servers (paramiko) that accept a password and run
+# exec requests with the local shell, so a fleet of several "servers" on
+# different ports can be tested on one machine without sshd or root. Every
+# command sees HLS_TEST_SERVER=<name>, so a test can tell the servers apart.
+# `commands` and `channels` record what the clients asked for.
+# ==============================================================================
+
+
+import os
+import socket
+import subprocess
+import threading
+
+import paramiko
+
+TEST_PASSWORD = "hls-test"
+_HOST_KEY = paramiko.RSAKey.generate(2048)
+
+
+class _Interface(paramiko.ServerInterface):
+    def __init__(self, server):
+        self.server = server
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if password == self.server.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        self.server.channels += 1
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        threading.Thread(target=self.server.run_command, args=(channel, command.decode()), daemon=True).start()
+        return True
+
+
+class LocalSSHServer:
+    def __init__(self, name, password=TEST_PASSWORD):
+        self.name = name
+        self.password = password
+        self.commands = []
+        self.channels = 0
+        self._listener = socket.socket()
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(8)
+        self.port = self._listener.getsockname()[1]
+        self._transports = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            transport = paramiko.Transport(sock)
+            transport.add_server_key(_HOST_KEY)
+            self._transports.append(transport)
+            try:
+                transport.start_server(server=_Interface(self))
+            except (paramiko.SSHException, EOFError):
+                continue
+
+    def run_command(self, channel, command):
+        self.commands.append(command)
+        env = dict(os.environ, HLS_TEST_SERVER=self.name)
+        result = subprocess.run(["bash", "-c", command], capture_output=True, env=env)
+        channel.sendall(result.stdout)
+        channel.sendall_stderr(result.stderr)
+        channel.send_exit_status(result.returncode)
+        channel.close()
+
+    def close(self):
+        # shutdown() wakes the blocked accept(); close() alone leaves the port accepting.
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._listener.close()
+        for transport in self._transports:
+            transport.close()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - ABR Ladder Tests
+# ==============================================================================
+# Every rung the start script publishes is a variant in the nginx master
+# playlist, and the other way round, whether or not the source has audio.
+# ==============================================================================
+
+
+import os
+import re
+
+import pytest
+
+from hls_core import Engine, EngineError
+from nginx_conf import ABR_VARIANTS
+
+RTMP_URL = "rtmp://localhost/live/physics"
+GOP = "-force_key_frames \"expr:gte(t,n_forced*3)\" -sc_threshold 0"
+VIDEOS = ["/var/videos/library/0123456789abcdef.mp4", "/var/videos/library/fedcba9876543210.mp4"]
+
+
+def engine_with_sources(audio_codec, duration=600.0):
+    engine = Engine()
+    engine.probe_video = lambda path: {"audio_codec": audio_codec, "duration": duration}
+    return engine
+
+
+def published_suffixes(outputs):
+    return [url[len(RTMP_URL):] for url in re.findall(r"-f flv (\S+)", outputs)]
+
+
+@pytest.mark.parametrize("audio_codec", ["aac", None])
+def test_abr_outputs_match_the_nginx_variants(audio_codec):
+    engine = engine_with_sources(audio_codec)
+
+    outputs = engine._abr_outputs(RTMP_URL, GOP, engine._silence_input(VIDEOS))
+
+    assert published_suffixes(outputs) == [suffix for suffix, _ in ABR_VARIANTS]
+
+
+def test_silent_sources_publish_silence_for_the_whole_session():
+    engine = engine_with_sources(None)
+
+    outputs = engine._abr_outputs(RTMP_URL, GOP, engine._silence_input(VIDEOS))
+
+    assert "-re -f lavfi -t 1200.000 -i anullsrc=r=48000:cl=stereo" in outputs
+    assert "0:a:0" not in outputs
+    assert outputs.count("-map 1:a:0") == len(ABR_VARIANTS)
+
+
+def test_sources_with_audio_need_no_silent_input():
+    engine = engine_with_sources("aac")
+
+    outputs = engine._abr_outputs(RTMP_URL, GOP, engine._silence_input(VIDEOS))
+
+    assert "anullsrc" not in outputs
+    assert "-map 0:a:0 -vn" in outputs
+
+
+def test_silent_source_without_a_duration_is_refused():
+    engine = engine_with_sources(None, duration=None)
+
+    with pytest.raises(EngineError):
+        engine._silence_input(VIDEOS)
+
+
+def test_setup_script_lists_the_same_variants():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "scripts", "setup_stream_server.sh")
+    with open(path) as f:
+        applications = re.findall(r"application \w+ \{[^}]*\}", f.read())
+
+    hls_applications = [block for block in applications if "hls_variant" in block]
+    assert hls_applications
+    for block in hls_applications:
+        assert re.findall(r"hls_variant (\S+) (\S+);", block) == ABR_VARIANTS
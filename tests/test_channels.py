@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Channel Scheduling Tests
+# ==============================================================================
+# Channels scheduled for the same minute get their own start scripts, and each
+# script only ever touches its own channel's stream, log and player page.
+# ==============================================================================
+
+
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+
+from hls_core import Engine
+from page_deploy import PageStager
+
+VIDEO = "/var/videos/library/0123456789abcdef.mp4"
+
+
+class FakeFile:
+    def __init__(self, files, path):
+        self.files, self.path = files, path
+
+    def write(self, data):
+        self.files[self.path] = self.files.get(self.path, "") + (data.decode("latin-1") if isinstance(data, bytes)
+                                                                 else data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeSFTP:
+    def __init__(self, files):
+        self.files = files
+
+    def file(self, path, mode="r"):
+        if "r" in mode: raise IOError(path)  # no custom page templates
+        return FakeFile(self.files, path)
+
+    def stat(self, path):
+        if path not in self.files: raise IOError(path)
+
+    def mkdir(self, path):
+        self.files[path] = ""
+
+    def posix_rename(self, old, new):
+        self.files[new] = self.files.pop(old)
+
+
+class FakeSession:
+    def __init__(self):
+        self.files, self.commands = {}, []
+
+    def execute(self, command, timeout=None):
+        self.commands.append(command)
+        return "", ""
+
+    @contextmanager
+    def sftp(self):
+        yield FakeSFTP(self.files)
+
+
+class FakeAgent:
+    # Keeps what add_job was given, including the script as it was when the job was stored.
+    def __init__(self, session):
+        self.session, self.jobs = session, []
+
+    def call(self, op, **args):
+        if op != "add_job": return {}
+        self.jobs.append(dict(args, content=self.session.files[args["script"]]))
+        return {"id": len(self.jobs), "conflicts": []}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def engine():
+    engine = Engine()
+    engine.session = FakeSession()
+    engine.agent = FakeAgent(engine.session)
+    engine.pages = PageStager(engine.session)
+    return engine
+
+
+def test_same_minute_on_two_channels_gets_two_scripts(engine):
+    physics, chemistry = engine.get_channel("physics"), engine.get_channel("chemistry")
+    start = engine.local_time(datetime(2026, 2, 2, 10, 0))
+
+    engine.start_or_schedule(physics, VIDEO, "Physics 1", start)
+    engine.start_or_schedule(chemistry, VIDEO, "Chemistry 1", start)
+
+    first, second = engine.agent.jobs
+    assert first["script"] != second["script"]
+    assert first["script"].startswith(physics.script_dir + "/")
+    assert second["script"].startswith(chemistry.script_dir + "/")
+    assert first["start"] == second["start"]
+    for job, channel, other in ((first, physics, chemistry), (second, chemistry, physics)):
+        assert job["channel"] == channel.key
+        assert f"# channel: {channel.key}\n" in job["content"]
+        for value in (channel.rtmp_url, channel.log_file, channel.progress_file, channel.player_html_path):
+            assert value in job["content"]
+        for value in (other.rtmp_url, other.log_file, other.progress_file, other.player_html_path):
+            assert value not in job["content"]
+
+
+def test_back_to_back_scripts_on_one_channel_never_share_a_path(engine):
+    channel = engine.get_channel("physics")
+
+    paths = {channel.new_script_path() for _ in range(1000)}
+
+    assert len(paths) == 1000
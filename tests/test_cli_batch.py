@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Command Line Batch Tests
+# ==============================================================================
+# A batch uploads every distinct source once, however many rows use it, and
+# reports failed uploads and connections per row or server in one line.
+# ==============================================================================
+
+
+import io
+import socket
+import threading
+import time
+
+import pytest
+
+import hls_cli
+from hls_core import EngineError
+
+
+class FakeEngine:
+    # Records uploads (and how many ran at once per file) and schedules.
+    def __init__(self, fail=()):
+        self.fail = fail
+        self.uploads, self.scheduled, self.running = [], [], {}
+        self.overlaps = 0
+        self._lock = threading.Lock()
+
+    def upload(self, path):
+        with self._lock:
+            self.uploads.append(path)
+            self.running[path] = self.running.get(path, 0) + 1
+            if self.running[path] > 1: self.overlaps += 1
+        time.sleep(0.05)
+        with self._lock:
+            self.running[path] -= 1
+        if path in self.fail: raise EngineError("SSH connection lost.")
+        return f"/var/videos/library/{len(self.uploads)}.mp4"
+
+    def prepare_video(self, path, filename):
+        return None
+
+    def get_channel(self, key):
+        return key
+
+    def local_time(self, naive_dt):
+        return naive_dt
+
+    def start_or_schedule(self, channel, video, title, local_dt, abr, low_latency, repeat, force=False):
+        with self._lock:
+            self.scheduled.append((channel, video, title))
+
+
+def write_manifest(tmp_path, rows):
+    lines = ["file,start,channel,title"] + [",".join(row) for row in rows]
+    manifest = tmp_path / "semester.csv"
+    manifest.write_text("\n".join(lines) + "\n")
+    return str(manifest)
+
+
+def batch_args(manifest):
+    args = hls_cli.build_parser().parse_args(["--host", "h", "batch", manifest, "--jobs", "4"])
+    args.rows = hls_cli.load_manifest(manifest)
+    args.out, args.label = io.StringIO(), ""
+    return args
+
+
+def test_each_distinct_file_is_uploaded_once(tmp_path):
+    (tmp_path / "week01.mp4").write_bytes(b"week one")
+    (tmp_path / "copy-of-week01.mp4").write_bytes(b"week one")
+    (tmp_path / "week02.mp4").write_bytes(b"week two")
+    manifest = write_manifest(tmp_path, [
+        ("week01.mp4", "2026-02-01 10:00", "physics", "Week 1"),
+        ("week01.mp4", "2026-02-01 10:00", "chemistry", "Week 1"),
+        ("./week01.mp4", "2026-02-08 10:00", "physics", "Week 1 again"),
+        ("copy-of-week01.mp4", "2026-02-15 10:00", "physics", "Week 1 copy"),
+        ("week02.mp4", "2026-02-08 10:00", "chemistry", "Week 2")])
+    engine = FakeEngine()
+
+    assert hls_cli.cmd_batch(engine, batch_args(manifest)) == 0
+
+    assert sorted(path.rsplit("/", 1)[1] for path in engine.uploads) in (["copy-of-week01.mp4", "week02.mp4"],
+                                                                         ["week01.mp4", "week02.mp4"])
+    assert engine.overlaps == 0
+    assert len(engine.scheduled) == 5
+    assert len({video for channel, video, title in engine.scheduled if title.startswith("Week 1")}) == 1
+
+
+def test_failed_upload_fails_its_rows_only(tmp_path, capsys):
+    (tmp_path / "week01.mp4").write_bytes(b"week one")
+    (tmp_path / "week02.mp4").write_bytes(b"week two")
+    manifest = write_manifest(tmp_path, [
+        ("week01.mp4", "2026-02-01 10:00", "physics", "Week 1"),
+        ("week01.mp4", "2026-02-01 10:00", "chemistry", "Week 1"),
+        ("week02.mp4", "2026-02-08 10:00", "physics", "Week 2")])
+    engine = FakeEngine(fail={str(tmp_path / "week01.mp4")})
+
+    assert hls_cli.cmd_batch(engine, batch_args(manifest)) == 1
+
+    errors = capsys.readouterr().err
+    assert "Traceback" not in errors
+    assert errors.count("failed: SSH connection lost.") == 2
+    assert [title for _, _, title in engine.scheduled] == ["Week 2"]
+
+
+def test_refused_connection_is_one_line(tmp_path, monkeypatch, capsys):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setenv("HLSMANAGER_PASSWORD", "secret")
+
+    with pytest.raises(SystemExit) as exit_info:
+        hls_cli.main(["--host", "127.0.0.1", "--port", str(port), "status"])
+
+    assert str(exit_info.value).startswith(f"Could not connect to root@127.0.0.1:{port}: ")
+    assert "Traceback" not in capsys.readouterr().err
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Lost Connection Tests
+# ==============================================================================
+# However the SSH session gives up (the server is gone, re-authentication was
+# refused, the session was closed), the engine treats it as a lost server:
+# lookups come back empty, uploads stop with ServerUnreachable, and the user
+# is told once.
+# ==============================================================================
+
+
+import pytest
+
+from hls_core import Engine, EngineError, ServerUnreachable
+from ssh_session import ConnectionLost
+
+REASONS = ["SSH connection lost: [Errno 111] Connection refused",
+           "Re-authentication failed: Authentication failed.",
+           "SSH connection lost: the session was closed."]
+
+
+class LostSession:
+    def __init__(self, reason):
+        self.reason = reason
+
+    def execute(self, command, timeout=None):
+        raise ConnectionLost(self.reason)
+
+
+@pytest.fixture(params=REASONS)
+def engine(request):
+    notices = []
+    engine = Engine(on_notice=lambda level, title, message: notices.append(level))
+    engine.session = LostSession(request.param)
+    engine.notices = notices
+    return engine
+
+
+def test_lookups_come_back_empty(engine):
+    assert engine.scan_live_channels() is None
+    assert engine.probe_video("/var/videos/library/0123456789abcdef.mp4") is None
+    assert engine.fetch_queue_snapshot() is None
+    assert engine.get_server_timezone() == "UTC"
+    assert engine.notices == ["error"] * 4
+
+
+def test_upload_stops_with_server_unreachable(engine, tmp_path):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"\0" * 1024)
+
+    with pytest.raises(ServerUnreachable) as raised:
+        engine.upload(str(video))
+
+    assert isinstance(raised.value, EngineError)
+    assert str(raised.value) == engine.session.reason
+
+
+def test_unchecked_commands_return_the_reason(engine):
+    assert engine.execute_command("true") == ("", engine.session.reason)
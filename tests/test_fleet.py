@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Fleet Fan-Out Tests
+# ==============================================================================
+# Runs a fleet of real Engines against several local SSH servers on different
+# ports (see ssh_servers.py): commands reach every server at once, results come
+# back per server, and a server that is down fails alone.
+# ==============================================================================
+
+
+import socket
+import time
+
+import pytest
+
+from fleet import Fleet
+from hls_core import Engine
+from nginx_conf import DEFAULT_PROFILE, edge_proxy
+from ssh_servers import TEST_PASSWORD, LocalSSHServer
+
+COMMAND_SECONDS = 0.5
+
+
+@pytest.fixture
+def servers():
+    started = [LocalSSHServer(name) for name in ("origin", "edge1", "edge2")]
+    yield started
+    for server in started:
+        server.close()
+
+
+def inventory(servers):
+    roles = {"origin": "origin"}
+    return [{"name": server.name, "host": "127.0.0.1", "port": server.port, "user": "root",
+             "role": roles.get(server.name, "edge"), "url": ""} for server in servers]
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_fan_out_runs_on_every_server_at_once(servers):
+    fleet = Fleet(inventory(servers), lambda server: Engine())
+    try:
+        assert fleet.connect({server.name: TEST_PASSWORD for server in servers}) == []
+
+        started = time.perf_counter()
+        results = fleet.run(lambda server, engine: engine.execute_command(
+            f"sleep {COMMAND_SECONDS}; echo $HLS_TEST_SERVER"))
+        elapsed = time.perf_counter() - started
+
+        assert [(server["name"], result, error) for server, result, error in results] == [
+            ("origin", ("origin", ""), None), ("edge1", ("edge1", ""), None), ("edge2", ("edge2", ""), None)]
+        assert elapsed < COMMAND_SECONDS * len(servers)
+    finally:
+        fleet.close()
+
+
+def test_unreachable_server_fails_alone(servers, capsys):
+    entries = inventory(servers) + [{"name": "down", "host": "127.0.0.1", "port": unused_port(), "user": "root",
+                                     "role": "standalone", "url": ""}]
+    fleet = Fleet(entries, lambda server: Engine())
+    try:
+        passwords = {entry["name"]: TEST_PASSWORD for entry in entries}
+        failed = fleet.connect(passwords)
+
+        assert [server["name"] for server, _ in failed] == ["down"]
+        assert isinstance(failed[0][1], OSError)
+        assert "Traceback" not in capsys.readouterr().err
+        results = fleet.run(lambda server, engine: engine.execute_command("echo $HLS_TEST_SERVER")[0])
+        assert [result for _, result, _ in results] == ["origin", "edge1", "edge2"]
+    finally:
+        fleet.close()
+
+
+def test_wrong_password_is_a_per_server_error(servers):
+    fleet = Fleet(inventory(servers), lambda server: Engine())
+    try:
+        passwords = {server.name: TEST_PASSWORD for server in servers}
+        passwords["edge2"] = "wrong"
+
+        failed = fleet.connect(passwords)
+
+        assert [server["name"] for server, _ in failed] == ["edge2"]
+        assert sorted(fleet.engines) == ["edge1", "origin"]
+    finally:
+        fleet.close()
+
+
+def test_reconnecting_some_servers_keeps_the_others(servers):
+    made = []
+
+    def make_engine(server):
+        made.append(Engine())
+        return made[-1]
+
+    fleet = Fleet(inventory(servers), make_engine)
+    try:
+        passwords = {server.name: TEST_PASSWORD for server in servers}
+        fleet.connect(passwords)
+        first_origin = fleet.engines["origin"]
+
+        assert fleet.connect(passwords, [fleet.origin]) == []
+
+        assert sorted(fleet.engines) == ["edge1", "edge2", "origin"]
+        assert fleet.engines["origin"] is not first_origin
+        assert first_origin.session is None
+        assert sum(engine.session is not None for engine in made) == len(servers)
+    finally:
+        fleet.close()
+
+
+def test_publishing_work_only_goes_to_the_origin(servers):
+    fleet = Fleet(inventory(servers), lambda server: Engine())
+    try:
+        fleet.connect({server.name: TEST_PASSWORD for server in servers})
+
+        results = fleet.run(lambda server, engine: engine.execute_command("echo $HLS_TEST_SERVER")[0],
+                            fleet.publishers())
+
+        assert [result for _, result, _ in results] == ["origin"]
+        assert servers[1].commands == servers[2].commands == []
+    finally:
+        fleet.close()
+
+
+def test_edges_pull_from_the_saved_origin_url():
+    entries = [{"name": "origin", "host": "10.0.0.1", "port": 22, "user": "root", "role": "origin",
+                "url": "https://stream.example.com"},
+               {"name": "edge1", "host": "10.0.0.2", "port": 22, "user": "root", "role": "edge", "url": ""}]
+    fleet = Fleet(entries, lambda server: Engine())
+
+    assert fleet.edge_origin(entries[0]) == ""
+    assert fleet.edge_origin(entries[1]) == "https://stream.example.com"
+
+
+@pytest.mark.parametrize("origin, upstream, host, sni", [
+    ("http://10.0.0.1", "server 10.0.0.1:80;", "proxy_set_header Host 10.0.0.1;", False),
+    ("https://stream.example.com", "server stream.example.com:443;", "proxy_set_header Host stream.example.com;", True),
+    ("http://origin.example.com:8080", "server origin.example.com:8080;", "proxy_set_header Host origin.example.com:8080;",
+     False),
+])
+def test_edge_config_sends_the_origin_host(origin, upstream, host, sni):
+    http, location = edge_proxy(dict(DEFAULT_PROFILE, origin=origin))
+
+    assert upstream in http
+    assert host in location
+    assert ("proxy_ssl_server_name on; proxy_ssl_name" in location) == sni
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Keyed Treeview Tests
+# ==============================================================================
+# KeyedTree against a fake Treeview that counts the Tk calls and keeps the rows
+# it was told about, so every test also checks what a real tree would show.
+# ==============================================================================
+
+
+import random
+
+import pytest
+
+from keyed_tree import KeyedTree
+
+QUEUE_SIZE = 1000
+
+
+class CountingTreeview:
+    def __init__(self):
+        self.children, self.values, self.calls = [], {}, []
+
+    def insert(self, parent, index, iid, values):
+        self.calls.append("insert")
+        self.children.insert(index, iid)
+        self.values[iid] = values
+
+    def move(self, iid, parent, index):
+        self.calls.append("move")
+        self.children.remove(iid)
+        self.children.insert(index, iid)
+
+    def item(self, iid, values):
+        self.calls.append("item")
+        self.values[iid] = values
+
+    def delete(self, *iids):
+        self.calls.append("delete")
+        for iid in iids:
+            self.children.remove(iid)
+            del self.values[iid]
+
+    def shown(self):
+        return [(iid, self.values[iid]) for iid in self.children]
+
+
+def queue(size=QUEUE_SIZE):
+    return [(f"S{job}", (f"S{job}", f"2026-02-{job % 28 + 1:02d} 10:00", f"Lecture {job}", "stream"))
+            for job in range(size)]
+
+
+@pytest.fixture
+def synced():
+    tree = CountingTreeview()
+    keyed = KeyedTree(tree)
+    rows = queue()
+    assert keyed.sync(rows) == QUEUE_SIZE
+    tree.calls.clear()
+    return tree, keyed, rows
+
+
+def sync(tree, keyed, rows):
+    operations = keyed.sync(rows)
+    assert tree.shown() == [(iid, tuple(values)) for iid, values in rows]
+    assert operations == len(tree.calls) == keyed.last_operations
+    return operations
+
+
+def test_unchanged_refresh_costs_nothing(synced):
+    tree, keyed, rows = synced
+
+    assert sync(tree, keyed, list(rows)) == 0
+
+
+@pytest.mark.parametrize("change", ["edit", "add", "remove", "move"])
+def test_single_change_costs_one_call(synced, change):
+    tree, keyed, rows = synced
+    if change == "edit":
+        rows[500] = (rows[500][0], rows[500][1][:2] + ("Renamed", "stream"))
+    elif change == "add":
+        rows.insert(500, ("S5000", ("S5000", "2026-02-01 09:00", "New lecture", "stream")))
+    elif change == "remove":
+        del rows[500]
+    else:
+        rows.insert(10, rows.pop(900))
+
+    assert sync(tree, keyed, rows) == 1
+
+
+def test_operations_follow_the_changes_not_the_queue_size(synced):
+    tree, keyed, rows = synced
+    shuffled = random.Random(7)
+    for index in shuffled.sample(range(QUEUE_SIZE), 5):
+        rows[index] = (rows[index][0], rows[index][1][:3] + ("physics",))
+    rows = rows[3:] + rows[:3]
+
+    assert sync(tree, keyed, rows) <= 5 + 3
+
+
+def test_random_refreshes_keep_the_tree_in_step(synced):
+    tree, keyed, rows = synced
+    shuffled = random.Random(1)
+    for step in range(20):
+        rows = [row for row in rows if shuffled.random() > 0.05]
+        rows.insert(shuffled.randrange(len(rows) + 1), (f"N{step}", (f"N{step}", "", "New", "stream")))
+        head = rows[:20]
+        shuffled.shuffle(head)
+        rows[:20] = head
+        sync(tree, keyed, rows)
+        tree.calls.clear()
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Metrics Export Tests
+# ==============================================================================
+# Label values reach the Prometheus text export escaped, so a task or file
+# name with quotes, backslashes or line breaks cannot break the exposition.
+# ==============================================================================
+
+
+import re
+
+from metrics import METRIC_PREFIX, Metrics
+
+# One sample line: name, label pairs with escaped values, value.
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_][a-zA-Z0-9_]*="([^"\\\n]|\\[\\"n])*",?)*\})? \S+$')
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.observe("task_seconds", 0.2, task='upload "C:\\talks\\intro.mp4"\nretry')
+
+    text = metrics.prometheus_text()
+
+    assert 'task="upload \\"C:\\\\talks\\\\intro.mp4\\"\\nretry"' in text
+    for line in text.splitlines():
+        assert line.startswith("# TYPE ") or SAMPLE.match(line), line
+
+
+def test_plain_label_values_are_unchanged():
+    metrics = Metrics()
+    metrics.observe("agent_call_seconds", 0.01, op="jobs")
+
+    text = metrics.prometheus_text()
+
+    assert f'{METRIC_PREFIX}agent_call_seconds_count{{op="jobs"}} 1' in text
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Queue Snapshot Tests
+# ==============================================================================
+# A queue refresh costs one remote round trip however many jobs are queued:
+# one SSH channel without the agent, one agent call per source with it. The
+# server is a local SSH server (see ssh_servers.py) whose PATH has stand-ins
+# for `atq` and `at -c` serving the queued start scripts.
+# ==============================================================================
+
+
+import os
+import random
+from datetime import datetime
+
+import pytest
+import pytz
+
+from hls_core import QUEUE_SNAPSHOT_TZ_CMD, REMOTE_LIBRARY_DIR, Engine
+from ssh_servers import TEST_PASSWORD, LocalSSHServer
+
+JOB_COUNT = 50
+SINGLE_SCRIPT = """#!/bin/bash
+# video: {title}
+# channel: physics
+pick() {{ R="${{1%.*}}.ready.mp4"; if [ -f "$R" ]; then echo "$R"; else echo "$1"; fi; }}
+ffmpeg -nostats -re -i "$(pick "{video}")" -c:v copy -c:a copy -f flv rtmp://localhost/live/physics
+"""
+PLAYLIST_SCRIPT = """#!/bin/bash
+# video: {title}
+# channel: physics
+cat > /tmp/hls-playlist.txt <<EOF
+ffconcat version 1.0
+file '$(pick \\"{video}\\")'
+file '$(pick \\"{library}/outro.mp4\\")'
+EOF
+ffmpeg -nostats -re -f concat -safe 0 -i /tmp/hls-playlist.txt -c:v copy -c:a copy -f flv rtmp://localhost/live/physics
+"""
+
+
+class FakeAgent:
+    def __init__(self):
+        self.calls = []
+
+    def call(self, op, **args):
+        self.calls.append(op)
+        if op == "queue":
+            return {"timezone": "UTC", "jobs": [{"id": "7", "start": 1770000000, "title": "", "channel": "",
+                                                 "video": f"{REMOTE_LIBRARY_DIR}/old.mp4"}]}
+        return {"timezone": "UTC", "total": 1,
+                "jobs": [{"id": 3, "start": 1770003600, "title": "Lecture", "channel": "physics", "recurrence": "weekly"}]}
+
+    def close(self):
+        pass
+
+
+class PagingAgent:
+    # `at` jobs and a job store, both at random start times; "jobs" pages the store like the agent.
+    def __init__(self, at_count, store_count):
+        rng = random.Random(at_count * 1000 + store_count)
+        self.at = [{"id": str(i), "start": 1770000000 + rng.randrange(100) * 60, "title": f"at {i}",
+                    "channel": "physics", "video": ""} for i in range(at_count)]
+        self.store = sorted(({"id": i, "start": 1770000000 + rng.randrange(100) * 60, "title": f"store {i}",
+                              "channel": "physics", "recurrence": ""} for i in range(store_count)),
+                            key=lambda job: (job["start"], job["id"]))
+
+    def call(self, op, offset=0, limit=0, **args):
+        if op == "queue":
+            return {"timezone": "UTC", "jobs": self.at}
+        return {"timezone": "UTC", "total": len(self.store), "jobs": self.store[offset:offset + limit]}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # Job 1 is untitled, job 2 an untitled playlist, so their titles come from the video paths.
+    jobs, bin_dir = tmp_path / "jobs", tmp_path / "bin"
+    jobs.mkdir()
+    bin_dir.mkdir()
+    atq = []
+    for job_id in range(1, JOB_COUNT + 1):
+        title = "" if job_id <= 2 else f"Lecture {job_id}"
+        script = PLAYLIST_SCRIPT if job_id == 2 else SINGLE_SCRIPT
+        (jobs / str(job_id)).write_text(script.format(title=title, video=f"{REMOTE_LIBRARY_DIR}/lecture{job_id}.mp4",
+                                                      library=REMOTE_LIBRARY_DIR))
+        atq.append(f"{job_id}\tMon Feb  2 10:{job_id:02d}:00 2026 a root")
+    (jobs / "atq").write_text("\n".join(atq) + "\n")
+    (bin_dir / "atq").write_text(f"#!/bin/bash\ncat {jobs}/atq\n")
+    (bin_dir / "at").write_text(f"#!/bin/bash\ncat {jobs}/\"$2\"\n")
+    for tool in ("atq", "at"):
+        (bin_dir / tool).chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    started = LocalSSHServer("queue")
+    yield started
+    started.close()
+
+
+@pytest.fixture
+def engine(server):
+    engine = Engine()
+    engine.connect("127.0.0.1", server.port, "root", TEST_PASSWORD)
+    engine.agent = None  # a server without the agent, unless a test gives it one
+    yield engine
+    engine.close()
+
+
+def test_shell_refresh_is_one_channel(server, engine):
+    channels = server.channels
+
+    jobs, total = engine.fetch_queue_snapshot()
+
+    assert server.channels - channels == 1
+    assert len(server.commands) == 1
+    assert total == JOB_COUNT
+    server_tz = pytz.timezone(engine.server_tz_name)
+    assert jobs[0] == ("1", server_tz.localize(datetime(2026, 2, 2, 10, 1)), "lecture1.mp4", "physics", "")
+    assert jobs[1] == ("2", server_tz.localize(datetime(2026, 2, 2, 10, 2)), "lecture2.mp4", "physics", "")
+    assert jobs[2][2] == "Lecture 3"
+
+
+def test_server_timezone_is_only_asked_for_once(server, engine):
+    channels = server.channels
+
+    for _ in range(3):
+        engine.fetch_queue_snapshot()
+
+    assert server.channels - channels == 3
+    assert [command.startswith(QUEUE_SNAPSHOT_TZ_CMD) for command in server.commands] == [True, False, False]
+
+
+def test_agent_refresh_opens_no_channels(server, engine):
+    engine.agent = FakeAgent()
+    channels = server.channels
+
+    jobs, total = engine.fetch_queue_snapshot()
+
+    assert server.channels == channels
+    assert server.commands == []
+    assert engine.agent.calls == ["queue", "jobs"]
+    assert [(job[0], job[2], job[3], job[4]) for job in jobs] == [("7", "old.mp4", "stream", ""),
+                                                                  ("S3", "Lecture", "physics", "weekly")]
+    assert total == 2
+
+
+@pytest.mark.parametrize("at_count, store_count", [(0, 23), (7, 0), (7, 23), (30, 5)])
+def test_pages_cut_one_merged_sequence(server, engine, at_count, store_count):
+    engine.agent = PagingAgent(at_count, store_count)
+    limit = 4
+    pages = [engine.fetch_queue_snapshot(offset, limit) for offset in range(0, at_count + store_count + limit, limit)]
+
+    assert {total for _, total in pages} == {at_count + store_count}
+    listed = [job for jobs, _ in pages for job in jobs]
+    assert sorted(job[0] for job in listed) == sorted([str(i) for i in range(at_count)] +
+                                                      [f"S{i}" for i in range(store_count)])
+    assert [job[1] for job in listed] == sorted(job[1] for job in listed)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Scheduler Daemon Tests
+# ==============================================================================
+# Runs a copy of the remote agent's scheduler daemon in a temporary directory
+# (its job store and run directory live next to the script) and wakes it with
+# SIGHUP, the way the agent does after adding a job.
+# ==============================================================================
+
+
+import os
+import shutil
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+
+import pytest
+
+AGENT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "client", "remote_agent.py")
+
+
+def store_ready(path):
+    # The database file appears before the daemon has created its tables.
+    if not path.exists(): return False
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'jobs'").fetchone() is not None
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition(): return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def scheduler(tmp_path):
+    shutil.copy(AGENT, tmp_path / "remote_agent.py")
+    proc = subprocess.Popen([sys.executable, str(tmp_path / "remote_agent.py"), "scheduler"])
+    assert wait_for(lambda: store_ready(tmp_path / "schedule.db"))
+    yield proc
+    proc.kill()
+    proc.wait()
+
+
+def test_repeated_sighup_never_kills_the_daemon(scheduler):
+    for _ in range(200):
+        scheduler.send_signal(signal.SIGHUP)
+
+    time.sleep(0.5)
+    assert scheduler.poll() is None
+
+
+def test_sighup_starts_a_new_due_job_at_once(scheduler, tmp_path):
+    marker = tmp_path / "started"
+    with sqlite3.connect(tmp_path / "schedule.db") as db:
+        db.execute("INSERT INTO jobs (channel, script, start, created) VALUES (?, ?, ?, ?)",
+                   ("stream", f"#!/bin/sh\ntouch {marker}\n", int(time.time()), int(time.time())))
+
+    scheduler.send_signal(signal.SIGHUP)
+
+    assert wait_for(marker.exists)
+    assert scheduler.poll() is None
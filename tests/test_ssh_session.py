@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - SSH Session Reconnection Tests
+# ==============================================================================
+# A session whose server went away backs off between reconnect attempts
+# without holding its lock, so closing it is immediate and ends the retries.
+# ==============================================================================
+
+
+import threading
+import time
+
+import pytest
+
+import ssh_session
+from ssh_servers import TEST_PASSWORD, LocalSSHServer
+from ssh_session import ConnectionLost, SSHSession
+
+BACKOFF_SECONDS = 0.5
+
+
+@pytest.fixture
+def lost_session(monkeypatch):
+    monkeypatch.setattr(ssh_session, "RECONNECT_BASE_DELAY", BACKOFF_SECONDS)
+    server = LocalSSHServer("gone")
+    session = SSHSession("127.0.0.1", server.port, "root", TEST_PASSWORD)
+    session.connect()
+    server.close()
+    deadline = time.monotonic() + 5
+    while session.is_active() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield session
+    session.close()
+
+
+def test_close_does_not_wait_for_the_backoff(lost_session):
+    errors = []
+
+    def reconnect():
+        try:
+            lost_session._reconnect()
+        except ConnectionLost as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=reconnect)
+    thread.start()
+    time.sleep(BACKOFF_SECONDS / 2)
+
+    started = time.perf_counter()
+    lost_session.close()
+    assert time.perf_counter() - started < BACKOFF_SECONDS / 2
+
+    thread.join(BACKOFF_SECONDS * 4)
+    assert not thread.is_alive()
+    assert len(errors) == 1
+    assert lost_session.client is None
+
+
+def test_lost_server_ends_in_connection_lost(lost_session, monkeypatch):
+    monkeypatch.setattr(ssh_session, "RECONNECT_BASE_DELAY", 0.01)
+
+    with pytest.raises(ConnectionLost):
+        lost_session.execute("true")
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# ==============================================================================
+#   HLSManager - Task Executor Tests
+# ==============================================================================
+# Every task ends with exactly one outcome, and the counters add up to the
+# number of tasks submitted.
+# ==============================================================================
+
+
+import threading
+import time
+
+import pytest
+
+from task_executor import TaskExecutor, check_cancelled, current_task
+
+OUTCOMES = ("completed", "failed", "cancelled", "timed_out")
+TIMEOUT = 0.2
+
+
+def until_cancelled():
+    while True:
+        check_cancelled()
+        time.sleep(0.01)
+
+
+def stops_with_own_error():
+    # Like an upload: notices cancellation and raises its own error.
+    while not current_task().is_cancelled():
+        time.sleep(0.01)
+    raise RuntimeError("Upload cancelled.")
+
+
+def ignores_cancellation():
+    time.sleep(TIMEOUT * 4)
+
+
+def fails():
+    raise ValueError("bad input")
+
+
+@pytest.fixture
+def executor():
+    executor = TaskExecutor(workers=4)
+    yield executor
+    executor.shutdown()
+
+
+def finish(executor, task):
+    assert task.wait(5)
+    stats = executor.stats()
+    assert sum(stats[outcome] for outcome in OUTCOMES) == stats["submitted"]
+    return task.outcome, {outcome: stats[outcome] for outcome in OUTCOMES if stats[outcome]}
+
+
+@pytest.mark.parametrize("func", [until_cancelled, stops_with_own_error])
+def test_timed_out_task_is_only_timed_out(executor, func):
+    task = executor.submit(func, timeout=TIMEOUT)
+
+    assert finish(executor, task) == ("timed_out", {"timed_out": 1})
+
+
+def test_task_finishing_past_its_timeout_completed(executor):
+    task = executor.submit(ignores_cancellation, timeout=TIMEOUT)
+
+    assert finish(executor, task) == ("completed", {"completed": 1})
+
+
+@pytest.mark.parametrize("func", [until_cancelled, stops_with_own_error])
+def test_cancelled_task_is_only_cancelled(executor, func):
+    task = executor.submit(func, key="upload")
+    time.sleep(0.05)
+    executor.cancel("upload")
+
+    assert finish(executor, task) == ("cancelled", {"cancelled": 1})
+
+
+def test_failed_and_completed_tasks(executor):
+    failed = executor.submit(fails)
+    completed = executor.submit(threading.Event().set)
+
+    assert finish(executor, failed)[0] == "failed"
+    assert isinstance(failed.error, ValueError)
+    assert finish(executor, completed) == ("completed", {"completed": 1, "failed": 1})
+
+
+def test_cancelled_before_start(executor):
+    blocker = threading.Event()
+    tasks = [executor.submit(blocker.wait) for _ in range(4)]
+    queued = executor.submit(time.sleep, 0, key="queued")
+    executor.cancel("queued")
+    blocker.set()
+
+    assert finish(executor, queued)[0] == "cancelled"
+    assert queued.error is None
+    for task in tasks: task.wait(5)